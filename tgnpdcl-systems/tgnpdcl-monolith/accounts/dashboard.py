@@ -0,0 +1,72 @@
+"""
+Version keys for the officer dashboard's cached fragments.
+
+dashboard/dashboard.html caches two fragments with the {% cache %} tag.
+The view hands it lazy querysets, so a cached fragment costs no query:
+
+- "Recent documents", one copy for everybody, keyed on the version under
+  DOCUMENTS_VERSION_KEY. Saving or deleting a Document bumps it (see
+  accounts.signals).
+- "Recently processed", one copy per officer, keyed on their version under
+  ACTIONS_VERSION_PREFIX and on the version under STEPS_VERSION_KEY. A new
+  ApprovalLog bumps its officer's version; saving or deleting a
+  WorkflowStep bumps the steps one (step names are shown).
+  bulk.insert_logs_from() and history archival, which insert and delete
+  logs in bulk, bump the versions of the officers concerned themselves.
+
+Other edits shown in the fragments, such as a patient name on a request,
+appear when the fragment expires after FRAGMENT_TIMEOUT.
+
+A version key that has been evicted is recreated from the clock, not from
+1, so it never comes back to a value a still-cached fragment was stored
+under.
+"""
+import time
+
+from django.core.cache import cache
+
+
+DOCUMENTS_VERSION_KEY = 'accounts:dashboard:documents:version'
+ACTIONS_VERSION_PREFIX = 'accounts:dashboard:actions:version:'
+STEPS_VERSION_KEY = 'accounts:dashboard:steps:version'
+FRAGMENT_TIMEOUT = 15 * 60
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def invalidate_recent_documents():
+    _bump(DOCUMENTS_VERSION_KEY)
+
+
+def invalidate_step_names():
+    _bump(STEPS_VERSION_KEY)
+
+
+def invalidate_recent_actions(*user_ids):
+    for user_id in user_ids:
+        _bump(f'{ACTIONS_VERSION_PREFIX}{user_id}')
+
+
+def fragment_versions(user):
+    """
+    ``{'documents': ..., 'actions': ...}``: the cache key parts of the
+    dashboard fragments ``user`` sees, read in one cache round trip.
+    """
+    keys = [DOCUMENTS_VERSION_KEY, f'{ACTIONS_VERSION_PREFIX}{user.pk}', STEPS_VERSION_KEY]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), None)
+        versions.update(cache.get_many(missing))
+    documents, actions, steps = (versions.get(key) or _new_version() for key in keys)
+    return {'documents': documents, 'actions': f'{actions}.{steps}'}
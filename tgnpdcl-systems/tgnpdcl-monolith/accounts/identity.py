@@ -0,0 +1,73 @@
+"""
+The signed-in user, loaded with their profile and hospital.
+
+Every authenticated request needs the user, ``user.profile`` (role checks,
+dashboards) and often ``profile.hospital``. load_identity() fetches all
+three in one joined query. With a shared cache (CACHE_IS_SHARED) the result
+is cached per user for ACCOUNTS_IDENTITY_CACHE_SECONDS, so most requests
+don't query for them at all. Saving or deleting a user, profile or hospital
+drops the cached entries it affects (see accounts.signals).
+
+The cached user carries the password hash and is_active, which the session
+checks rely on. A per-process cache could only be cleared in the process
+that made the change, leaving a deactivated user or a pre-password-change
+session signed in on every other one, so without a shared cache the
+identity is loaded fresh on each request.
+
+IdentityBackend makes django.contrib.auth load request.user this way, and
+IdentityMiddleware moves sessions started before it was configured onto it.
+"""
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.deprecation import MiddlewareMixin
+
+
+IDENTITY_BACKEND = 'accounts.identity.IdentityBackend'
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+
+
+def _cache_key(user_id):
+    return f'accounts:identity:{user_id}'
+
+
+def load_identity(user_id):
+    """User ``user_id`` with ``profile`` and ``profile.hospital`` loaded, or None."""
+    identities = User.objects.select_related('profile__hospital')
+    if not settings.CACHE_IS_SHARED or settings.ACCOUNTS_IDENTITY_CACHE_SECONDS <= 0:
+        return identities.filter(pk=user_id).first()
+
+    key = _cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = identities.filter(pk=user_id).first()
+        if user is None:
+            return None
+        cache.set(key, user, settings.ACCOUNTS_IDENTITY_CACHE_SECONDS)
+    return user
+
+
+def invalidate_identity(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+class IdentityBackend(ModelBackend):
+    """ModelBackend whose get_user() goes through load_identity()."""
+
+    def get_user(self, user_id):
+        user = load_identity(user_id)
+        return user if self.user_can_authenticate(user) else None
+
+
+class IdentityMiddleware(MiddlewareMixin):
+    """
+    Switches sessions signed in through plain ModelBackend to
+    IdentityBackend, before request.user is first read. Goes right after
+    AuthenticationMiddleware.
+    """
+
+    def process_request(self, request):
+        if request.session.get(BACKEND_SESSION_KEY) == MODEL_BACKEND:
+            request.session[BACKEND_SESSION_KEY] = IDENTITY_BACKEND
@@ -0,0 +1,109 @@
+"""
+Compare django_session traffic of the session engines.
+
+    python manage.py benchmark_sessions
+    python manage.py benchmark_sessions --requests 2000 --sessions 50 --change-every 10
+
+Runs the same signed-in request cycle (session and authentication
+middleware, then a view that records the last page visited) through each
+engine, and counts the queries per request. Every request sets the page,
+but only every ``--change-every``th one changes it. For accounts.sessions
+the queued write-behinds are collected and run at the end, so their
+queries are reported too. It uses the configured cache (LocMem unless
+REDIS_URL is set) and a throwaway user that is removed afterwards.
+"""
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from importlib import import_module
+
+from accounts import sessions
+
+
+ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+    'accounts.sessions',
+)
+BENCHMARK_USERNAME = 'session-benchmark'
+
+
+def session_queries(captured):
+    return sum(1 for query in captured if 'django_session' in query['sql'])
+
+
+class Command(BaseCommand):
+    help = 'Measure database queries per request for each session engine.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per engine.')
+        parser.add_argument('--sessions', type=int, default=20, help='Signed-in sessions the requests rotate over.')
+        parser.add_argument('--change-every', type=int, default=5,
+                            help='Every Nth request of a session changes its data.')
+
+    def handle(self, *args, **options):
+        User.objects.filter(username=BENCHMARK_USERNAME).delete()
+        user = User.objects.create_user(BENCHMARK_USERNAME)
+        try:
+            self.stdout.write(f'{"engine":<42} {"session q/req":>13} {"all q/req":>10} {"ms/req":>8}')
+            for engine in ENGINES:
+                self.run_engine(engine, user, options)
+        finally:
+            user.delete()
+
+    def run_engine(self, engine, user, options):
+        with override_settings(SESSION_ENGINE=engine):
+            store_class = import_module(engine).SessionStore
+            keys = []
+            for _ in range(options['sessions']):
+                store = store_class()
+                store[SESSION_KEY] = str(user.pk)
+                store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+                store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+                store.save()
+                keys.append(store.session_key)
+
+            change_every = options['change_every']
+
+            def view(request):
+                assert request.user.is_authenticated
+                request.session['last_page'] = f'/workflow/queue/?page={request.turn // change_every}'
+                return HttpResponse()
+
+            chain = SessionMiddleware(AuthenticationMiddleware(view))
+            factory = RequestFactory()
+            pending = set()
+            with mock.patch.object(sessions, 'schedule_persist', pending.add):
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as captured:
+                    for turn in range(options['requests']):
+                        request = factory.get('/workflow/queue/')
+                        request.COOKIES[settings.SESSION_COOKIE_NAME] = keys[turn % len(keys)]
+                        request.turn = turn // len(keys)
+                        chain(request)
+                elapsed = time.perf_counter() - started
+
+            total = options['requests']
+            self.stdout.write(
+                f'{engine:<42} {session_queries(captured) / total:>13.2f} '
+                f'{len(captured) / total:>10.2f} {elapsed * 1000 / total:>8.3f}'
+            )
+            if pending:
+                with CaptureQueriesContext(connection) as flushed:
+                    for session_key in pending:
+                        sessions.persist_session(session_key)
+                self.stdout.write(self.style.SUCCESS(
+                    f'{"":<4}write-behind: {len(pending)} coalesced write(s) '
+                    f'({session_queries(flushed)} session queries) for {total} requests in one write-behind window'
+                ))
+            store_class().model.objects.filter(session_key__in=keys).delete()
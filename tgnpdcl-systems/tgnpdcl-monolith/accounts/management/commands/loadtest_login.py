@@ -0,0 +1,124 @@
+"""
+Load-test the login portals under a credential-stuffing burst.
+
+    python manage.py loadtest_login
+    python manage.py loadtest_login --duration 120 --rate 50 --attackers 16 --attack-ips 4
+
+Runs the same scenario with login throttling off and then on. For
+``--duration`` seconds, attacker threads post wrong passwords for made-up
+usernames from a few addresses at ``--rate`` attempts a second (more than
+the server can hash), while one officer keeps signing in from their own.
+Every attempt goes through the real login view, so each one that reaches
+authenticate() pays for a full password hash. The report gives the
+officer's login latency and how many attack attempts were rejected before
+hashing. Creates a throwaway officer and removes it afterwards.
+"""
+import random
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from accounts.models import UserProfile
+from accounts.throttle import login_metrics
+
+
+OFFICER_USERNAME = 'loadtest-login-officer'
+OFFICER_PASSWORD = uuid.uuid4().hex
+
+
+class Command(BaseCommand):
+    help = 'Measure legitimate login latency during a credential-stuffing burst, with and without throttling.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=40, help='Seconds the attack lasts, per phase.')
+        parser.add_argument('--rate', type=float, default=20, help='Attack attempts offered per second.')
+        parser.add_argument('--attackers', type=int, default=8, help='Concurrent attacker threads.')
+        parser.add_argument('--attack-ips', type=int, default=2, help='Client addresses the attack comes from.')
+
+    def handle(self, *args, **options):
+        User.objects.filter(username=OFFICER_USERNAME).delete()
+        officer = User.objects.create_user(OFFICER_USERNAME, password=OFFICER_PASSWORD)
+        UserProfile.objects.create(user=officer, role='JPO')
+        try:
+            for enabled in (False, True):
+                with override_settings(LOGIN_THROTTLE_ENABLED=enabled):
+                    self.run_phase(enabled, options)
+        finally:
+            officer.delete()
+
+    def run_phase(self, enabled, options):
+        url = reverse('jpo_login')
+        # Fresh addresses per phase and run, so earlier buckets don't carry over
+        network = f'10.{random.randrange(256)}.{random.randrange(256)}'
+        attack_ips = [f'{network}.{host + 1}' for host in range(options['attack_ips'])]
+        officer_ip = f'{network}.200'
+        metrics_before = login_metrics()
+
+        attack_statuses = Counter()
+        lock = threading.Lock()
+
+        schedule = iter(range(10 ** 9))
+
+        def attack(worker, started, deadline):
+            client = Client(REMOTE_ADDR=attack_ips[worker % len(attack_ips)])
+            try:
+                while True:
+                    # Open loop: attempt n is due at n / rate, however slow the server is
+                    with lock:
+                        due = started + next(schedule) / options['rate']
+                    if due >= deadline or time.perf_counter() >= deadline:
+                        break
+                    time.sleep(max(due - time.perf_counter(), 0))
+                    response = client.post(url, {'username': f'stuffed-{uuid.uuid4().hex[:12]}', 'password': 'hunter2'})
+                    with lock:
+                        attack_statuses[response.status_code] += 1
+            finally:
+                connection.close()
+
+        def sign_in():
+            client = Client(REMOTE_ADDR=officer_ip)
+            started = time.perf_counter()
+            response = client.post(url, {'username': OFFICER_USERNAME, 'password': OFFICER_PASSWORD})
+            elapsed = time.perf_counter() - started
+            return elapsed, response.status_code == 302
+
+        # One quiet login first, as the baseline
+        baseline, _ = sign_in()
+
+        started = time.perf_counter()
+        deadline = started + options['duration']
+        with ThreadPoolExecutor(max_workers=options['attackers']) as pool:
+            futures = [pool.submit(attack, worker, started, deadline) for worker in range(options['attackers'])]
+            latencies = []
+            successes = 0
+            while time.perf_counter() < deadline:
+                elapsed, ok = sign_in()
+                latencies.append(elapsed)
+                successes += ok
+            for future in futures:
+                future.result()
+
+        latencies.sort()
+        metrics = login_metrics()
+        throttled = sum(
+            metrics[name] - metrics_before[name]
+            for name in ('throttled_username_ip', 'throttled_username', 'throttled_ip')
+        )
+        label = 'throttling ON' if enabled else 'throttling OFF'
+        self.stdout.write(self.style.SUCCESS(label))
+        attempts = sum(attack_statuses.values())
+        self.stdout.write(f'  attack: {attempts} attempt(s) in {time.perf_counter() - started:.0f}s, '
+                          f'{attempts - attack_statuses[429]} hashed, {attack_statuses[429]} rejected before hashing '
+                          f'(throttle counters +{throttled})')
+        self.stdout.write(f'  officer: {successes}/{len(latencies)} signed in; quiet {baseline * 1000:.0f}ms, '
+                          f'under attack median {statistics.median(latencies) * 1000:.0f}ms, '
+                          f'p90 {latencies[int(len(latencies) * 0.9)] * 1000:.0f}ms, max {latencies[-1] * 1000:.0f}ms')
@@ -0,0 +1,258 @@
+"""
+Bulk-create hospital users and officers from a CSV or XLSX sheet.
+
+    python manage.py provision_users users.csv --links links.csv --base-url https://claims.example.org
+    python manage.py provision_users users.xlsx --workers 8 --chunk-size 2000
+
+Columns (header row, any order, case-insensitive): username, role (a
+UserProfile role code, e.g. JPO or HOSPITAL), and optionally first_name,
+last_name, email, designation, department, phone, hospital_code (required
+for HOSPITAL users) and password.
+
+Hospitals are resolved from one {code: id} dictionary loaded up front.
+Users and profiles are inserted with bulk_create, ``--chunk-size`` rows
+per transaction. Usernames that already exist are skipped, never changed.
+
+Initial passwords from the password column are hashed in a pool of
+``--workers`` processes. Without a password column the accounts get an
+unusable password, and ``--links`` is required: it receives a CSV with
+one one-time set-password link per user. The links stay valid for
+PASSWORD_RESET_TIMEOUT seconds.
+"""
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from accounts.models import UserProfile
+from hospitals.models import Hospital
+
+
+USER_FIELDS = ('username', 'first_name', 'last_name', 'email')
+PROFILE_FIELDS = ('designation', 'department', 'phone')
+COLUMNS = ('role', 'hospital_code', 'password') + USER_FIELDS + PROFILE_FIELDS
+ROLES = {role for role, _ in UserProfile.ROLE_CHOICES}
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _column_name(header):
+    return _clean(header).lower().replace(' ', '_')
+
+
+def read_rows(path):
+    """Yield ``(line_number, {column: value})`` from a .csv or .xlsx file."""
+    if path.lower().endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise CommandError('openpyxl is required for .xlsx files: pip install openpyxl')
+        try:
+            workbook = load_workbook(path, read_only=True, data_only=True)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot open {path}: {exc}')
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [_column_name(cell) for cell in next(rows, ())]
+            for line_number, row in enumerate(rows, start=2):
+                if any(row):
+                    yield line_number, {name: _clean(value) for name, value in zip(header, row)}
+        finally:
+            workbook.close()
+        return
+
+    try:
+        handle = open(path, newline='', encoding='utf-8-sig')
+    except OSError as exc:
+        raise CommandError(f'Cannot open {path}: {exc}')
+    with handle:
+        reader = csv.reader(handle)
+        header = [_column_name(cell) for cell in next(reader, ())]
+        for line_number, row in enumerate(reader, start=2):
+            if any(cell.strip() for cell in row):
+                yield line_number, {name: _clean(value) for name, value in zip(header, row)}
+
+
+class Command(BaseCommand):
+    help = 'Create users and their profiles in bulk from a CSV or XLSX sheet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The .csv or .xlsx file.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Processes hashing passwords from the sheet.')
+        parser.add_argument('--links', help='Where to write the set-password links (CSV), for sheets without passwords.')
+        parser.add_argument('--base-url', default='', help='Site address the set-password links start with.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        self.hospitals = dict(Hospital.objects.values_list('code', 'pk'))
+        self.stats = {'read': 0, 'created': 0, 'existing': 0, 'invalid': 0}
+        self.dry_run = options['dry_run']
+        self.base_url = options['base_url'].rstrip('/')
+        self.hash_seconds = 0.0
+
+        rows = read_rows(options['path'])
+        first = next(rows, None)
+        if first is None:
+            raise CommandError('The sheet has no data rows.')
+        self.with_passwords = 'password' in first[1]
+        if not self.with_passwords and not options['links'] and not self.dry_run:
+            raise CommandError('The sheet has no password column: pass --links to receive set-password links.')
+        missing = [column for column in ('username', 'role') if column not in first[1]]
+        if missing:
+            raise CommandError(f"Missing column(s) in header: {', '.join(missing)}")
+
+        links_file = None
+        self.links = None
+        if options['links'] and not self.with_passwords and not self.dry_run:
+            links_file = open(options['links'], 'w', newline='', encoding='utf-8')
+            self.links = csv.writer(links_file)
+            self.links.writerow(['username', 'email', 'set_password_link'])
+
+        self.workers = max(options['workers'] or 1, 1)
+        self.pool = None
+        if self.with_passwords and not self.dry_run:
+            # Workers started with spawn need their own app registry
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup)
+        try:
+            seen = set()
+            chunk = []
+            for line_number, row in self._chain(first, rows):
+                self.stats['read'] += 1
+                data = self._validate(row, line_number, seen)
+                if data is None:
+                    continue
+                chunk.append(data)
+                if len(chunk) >= options['chunk_size']:
+                    self._flush(chunk)
+                    chunk = []
+            if chunk:
+                self._flush(chunk)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+            if links_file is not None:
+                links_file.close()
+
+        elapsed = time.perf_counter() - started
+        rate = self.stats['created'] / elapsed if elapsed else 0
+        hashing = f', {self.hash_seconds:.2f}s hashing passwords' if self.pool is not None else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{'[dry run] ' if self.dry_run else ''}"
+            f"Read {self.stats['read']} rows in {elapsed:.2f}s{hashing}: "
+            f"{self.stats['created']} created ({rate:,.0f}/sec), {self.stats['existing']} already existed, "
+            f"{self.stats['invalid']} invalid."
+        ))
+
+    def _chain(self, first, rows):
+        yield first
+        yield from rows
+
+    def _validate(self, row, line_number, seen):
+        """One sheet row as field values, or None if it is invalid."""
+        data = {column: row.get(column, '') for column in COLUMNS}
+        errors = []
+
+        username = data['username']
+        try:
+            User.username_validator(username)
+        except ValidationError:
+            errors.append(f'invalid username {username!r}')
+        if username in seen:
+            errors.append(f'username {username!r} repeated in the sheet')
+        seen.add(username)
+
+        data['role'] = data['role'].upper()
+        if data['role'] not in ROLES:
+            errors.append(f"unknown role {data['role']!r}")
+
+        data['hospital_id'] = None
+        if data['role'] == 'HOSPITAL':
+            data['hospital_id'] = self.hospitals.get(data['hospital_code'])
+            if data['hospital_id'] is None:
+                errors.append(f"unknown hospital code {data['hospital_code']!r}")
+
+        for field in USER_FIELDS:
+            max_length = User._meta.get_field(field).max_length
+            if len(data[field]) > max_length:
+                errors.append(f'{field} longer than {max_length} characters')
+        for field in PROFILE_FIELDS:
+            max_length = UserProfile._meta.get_field(field).max_length
+            if len(data[field]) > max_length:
+                errors.append(f'{field} longer than {max_length} characters')
+        if self.with_passwords and not data['password']:
+            errors.append('missing password')
+
+        if errors:
+            self.stats['invalid'] += 1
+            self.stderr.write(f"Row {line_number}: {'; '.join(errors)}")
+            return None
+        return data
+
+    def _flush(self, chunk):
+        existing = set(
+            User.objects.filter(username__in=[data['username'] for data in chunk]).values_list('username', flat=True)
+        )
+        chunk = [data for data in chunk if data['username'] not in existing]
+        self.stats['existing'] += len(existing)
+        self.stats['created'] += len(chunk)
+        if not chunk or self.dry_run:
+            return
+
+        if self.with_passwords:
+            hashing_started = time.perf_counter()
+            passwords = list(self.pool.map(
+                make_password,
+                [data['password'] for data in chunk],
+                chunksize=max(1, len(chunk) // (self.workers * 4)),
+            ))
+            self.hash_seconds += time.perf_counter() - hashing_started
+        else:
+            passwords = [make_password(None) for _ in chunk]
+
+        users = [
+            User(password=password, **{field: data[field] for field in USER_FIELDS})
+            for data, password in zip(chunk, passwords)
+        ]
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            # Not every backend returns the new ids from a bulk insert
+            ids = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'pk'))
+            for user in users:
+                user.pk = ids[user.username]
+            UserProfile.objects.bulk_create([
+                UserProfile(
+                    user_id=user.pk,
+                    role=data['role'],
+                    hospital_id=data['hospital_id'],
+                    **{field: data[field] for field in PROFILE_FIELDS},
+                )
+                for user, data in zip(users, chunk)
+            ])
+
+        if self.links is not None:
+            for user in users:
+                path = reverse('set_password', args=(
+                    urlsafe_base64_encode(force_bytes(user.pk)),
+                    default_token_generator.make_token(user),
+                ))
+                self.links.writerow([user.username, user.email, f'{self.base_url}{path}'])
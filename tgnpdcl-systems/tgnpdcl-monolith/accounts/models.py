@@ -22,6 +22,9 @@ class UserProfile(models.Model):
     designation = models.CharField(max_length=100, blank=True)
     department = models.CharField(max_length=100, blank=True)
     phone = models.CharField(max_length=15, blank=True)
+
+    # For approvers - most open requests auto-allocation may give them (blank = no limit)
+    max_open_requests = models.PositiveIntegerField(null=True, blank=True)
     
     # For Hospital role - link to hospital
     hospital = models.ForeignKey(
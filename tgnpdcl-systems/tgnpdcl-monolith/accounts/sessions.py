@@ -0,0 +1,84 @@
+"""
+Session engine that keeps sessions in the cache and writes them to the
+database behind the request.
+
+    SESSION_ENGINE = 'accounts.sessions'
+
+Reads come from the cache, as with Django's cached_db engine. The database
+is only read when an entry is missing there. A save is skipped when the
+session data is unchanged since it was loaded, even if the session was
+marked modified. A save that does change it goes to the cache at once.
+Persisting it to django_session is queued as persist_session(), run
+SESSION_WRITE_BEHIND_SECONDS later. A pending marker in the cache makes all
+the saves of a session in that window share one database write.
+
+New sessions (login, key rotation) and deletes (logout) still go to the
+database straight away. A session change can only be lost if the cache
+itself is lost before the write. The cache must be shared by every server
+process, so project.settings only enables this engine with REDIS_URL
+unless SESSION_WRITE_BEHIND says otherwise.
+"""
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+
+PENDING_PREFIX = 'accounts.sessions.pending:'
+
+
+def pending_timeout():
+    # Long enough to cover a late task; short enough that a lost one only
+    # delays the next write
+    return max(settings.SESSION_WRITE_BEHIND_SECONDS * 4, 60)
+
+
+def schedule_persist(session_key):
+    from .tasks import persist_session
+    persist_session.apply_async((session_key,), countdown=settings.SESSION_WRITE_BEHIND_SECONDS)
+
+
+def persist_session(session_key):
+    """
+    Write the cached session ``session_key`` to the database. Returns False
+    if there was nothing to write (the session ended, or expired).
+    """
+    store = SessionStore(session_key)
+    # Cleared before reading, so a save made after the read queues another write
+    store._cache.delete(PENDING_PREFIX + session_key)
+    data = store._cache.get(store.cache_key)
+    if data is None:
+        return False
+    store._session_cache = data
+    try:
+        DBStore.save(store)
+    except UpdateError:
+        return False
+    return True
+
+
+class SessionStore(CachedDBStore):
+
+    def _snapshot(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        data = super().load()
+        self._loaded_snapshot = self._snapshot(data)
+        return data
+
+    def save(self, must_create=False):
+        if must_create or self.session_key is None:
+            # New session: the database insert detects key collisions
+            super().save(must_create=must_create)
+            self._loaded_snapshot = self._snapshot(self._session)
+            return
+
+        data = self._get_session()
+        snapshot = self._snapshot(data)
+        if snapshot == getattr(self, '_loaded_snapshot', None):
+            return
+        self._cache.set(self.cache_key, data, self.get_expiry_age())
+        self._loaded_snapshot = snapshot
+        if self._cache.add(PENDING_PREFIX + self.session_key, 1, pending_timeout()):
+            schedule_persist(self.session_key)
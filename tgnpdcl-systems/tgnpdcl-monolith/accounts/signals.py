@@ -0,0 +1,55 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from documents.models import Document
+from hospitals.models import Hospital
+from workflow.models import ApprovalLog, WorkflowStep
+from .dashboard import invalidate_recent_actions, invalidate_recent_documents, invalidate_step_names
+from .identity import invalidate_identity
+from .models import UserProfile
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_identity(sender, instance, **kwargs):
+    # Now and after commit: a password change must not be checked against
+    # the cached hash, and nobody may re-cache pre-commit data
+    invalidate_identity(instance.pk)
+    transaction.on_commit(lambda: invalidate_identity(instance.pk))
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_identity(sender, instance, **kwargs):
+    invalidate_identity(instance.user_id)
+    transaction.on_commit(lambda: invalidate_identity(instance.user_id))
+
+
+@receiver(post_save, sender=Hospital)
+@receiver(pre_delete, sender=Hospital)  # Before its profiles are unlinked
+def invalidate_hospital_identities(sender, instance, **kwargs):
+    user_ids = list(UserProfile.objects.filter(hospital_id=instance.pk).values_list('user_id', flat=True))
+    if user_ids:
+        transaction.on_commit(lambda: invalidate_identity(*user_ids))
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def invalidate_dashboard_documents(sender, **kwargs):
+    transaction.on_commit(invalidate_recent_documents)
+
+
+@receiver(post_save, sender=WorkflowStep)
+@receiver(post_delete, sender=WorkflowStep)
+def invalidate_dashboard_steps(sender, **kwargs):
+    transaction.on_commit(invalidate_step_names)
+
+
+# No post_delete receiver: it would stop history archival from deleting logs
+# in bulk. workflow.archive invalidates the officers' fragments itself.
+@receiver(post_save, sender=ApprovalLog)
+def invalidate_dashboard_actions(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: invalidate_recent_actions(instance.user_id))
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from . import sessions
+
+
+@shared_task
+def persist_session(session_key):
+    """Write-behind of a changed session to the database (see accounts.sessions)."""
+    return sessions.persist_session(session_key)
@@ -0,0 +1,140 @@
+"""
+Login attempt throttling.
+
+Each login POST takes a token from three buckets in the cache before the
+form calls authenticate(), so a rejected attempt costs no password hashing:
+
+- username + client IP, the strict one: repeated guesses at one account
+  from one address;
+- username alone, looser: the same account guessed from many addresses;
+- client IP: many accounts guessed from one address.
+
+The buckets hold up to ``burst`` tokens and regain one every ``seconds``
+(LOGIN_THROTTLE_* settings). Someone posting bad passwords for an officer's
+username only empties the strict bucket for their own address, so the
+officer can still sign in from theirs unless the attack comes from enough
+addresses to drain the looser username bucket too. A successful login
+resets its username + IP bucket and gives its other tokens back, so only
+failures add up: colleagues behind one office address do not lock each
+other out.
+
+The buckets are read and written without a lock. Attempts racing at the
+same instant may each get the last token, so a burst can overshoot by
+about the number of requests served concurrently. Without a shared cache
+(CACHE_IS_SHARED) every server process keeps its own buckets, and the
+limits apply per process.
+
+Attempts and rejections are counted per portal and reason under
+METRICS_PREFIX; login_metrics() returns the counters.
+"""
+import hashlib
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserProfile
+
+
+METRICS_PREFIX = 'accounts:login-throttle:metrics:'
+METRIC_NAMES = ('attempts', 'throttled_username_ip', 'throttled_username', 'throttled_ip')
+
+ThrottleResult = namedtuple('ThrottleResult', 'allowed retry_after reason')
+
+
+def client_ip(request):
+    """
+    The client's address: REMOTE_ADDR, or with LOGIN_THROTTLE_PROXY_COUNT
+    trusted proxies in front, the X-Forwarded-For entry they added.
+    """
+    proxies = settings.LOGIN_THROTTLE_PROXY_COUNT
+    if proxies:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _bucket_key(kind, value):
+    digest = hashlib.sha256(value.encode()).hexdigest()[:32]
+    return f'accounts:login-throttle:{kind}:{digest}'
+
+
+def _refill(state, burst, seconds, now):
+    if state is None:
+        return float(burst)
+    tokens, updated_at = state
+    return min(float(burst), tokens + (now - updated_at) / seconds)
+
+
+def _buckets(request, username):
+    """``(reason, key, burst, seconds)``: username + IP, username, IP."""
+    username = username.strip().lower()
+    ip = client_ip(request)
+    return (
+        ('username_ip', _bucket_key('username-ip', f'{username}\0{ip}'), *settings.LOGIN_THROTTLE_USERNAME_IP),
+        ('username', _bucket_key('username', username), *settings.LOGIN_THROTTLE_USERNAME),
+        ('ip', _bucket_key('ip', ip), *settings.LOGIN_THROTTLE_IP),
+    )
+
+
+def _count(name, portal):
+    for key in (f'{METRICS_PREFIX}{name}', f'{METRICS_PREFIX}{name}:{portal}'):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def take_login_attempt(request, username, portal):
+    """
+    Take a token for a login attempt on ``portal``. Returns a
+    ThrottleResult; when not ``allowed``, do not authenticate.
+    """
+    if not settings.LOGIN_THROTTLE_ENABLED:
+        return ThrottleResult(True, 0, None)
+
+    _count('attempts', portal)
+    now = time.time()
+    buckets = _buckets(request, username)
+    states = cache.get_many([key for _, key, _, _ in buckets])
+    updates = {}
+    for reason, key, burst, seconds in buckets:
+        tokens = _refill(states.get(key), burst, seconds, now)
+        if tokens < 1:
+            _count(f'throttled_{reason}', portal)
+            return ThrottleResult(False, int((1 - tokens) * seconds) + 1, reason)
+        updates[key] = (tokens - 1, now)
+
+    for reason, key, burst, seconds in buckets:
+        cache.set(key, updates[key], int(burst * seconds) + 1)
+    return ThrottleResult(True, 0, None)
+
+
+def login_succeeded(request, username):
+    """
+    Reset the username + IP bucket and give the attempt's username and IP
+    tokens back.
+    """
+    if not settings.LOGIN_THROTTLE_ENABLED:
+        return
+    now = time.time()
+    (_, strict_key, _, _), *shared = _buckets(request, username)
+    cache.delete(strict_key)
+    # Given back rather than reset: a login must not wipe out the failures
+    # others have run up against the same username or address
+    states = cache.get_many([key for _, key, _, _ in shared])
+    for _, key, burst, seconds in shared:
+        if key in states:
+            tokens = min(float(burst), _refill(states[key], burst, seconds, now) + 1)
+            cache.set(key, (tokens, now), int(burst * seconds) + 1)
+
+
+def login_metrics():
+    """``{counter: value}`` for every portal, plus the totals."""
+    portals = [role for role, _ in UserProfile.ROLE_CHOICES]
+    names = [f'{METRICS_PREFIX}{name}' for name in METRIC_NAMES]
+    names += [f'{METRICS_PREFIX}{name}:{portal}' for name in METRIC_NAMES for portal in portals]
+    values = cache.get_many(names)
+    return {name[len(METRICS_PREFIX):]: values.get(name, 0) for name in names}
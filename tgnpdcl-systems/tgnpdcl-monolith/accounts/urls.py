@@ -1,4 +1,5 @@
-from django.urls import path
+from django.contrib.auth import views as auth_views
+from django.urls import path, reverse_lazy
 from . import views
 
 urlpatterns = [
@@ -17,7 +18,14 @@ urlpatterns = [
     path('login/customer-admin/', views.customer_admin_login, name='customer_admin_login'),
     path('register/', views.register, name='register'),
     
+    # One-time links issued by the provision_users command
+    path('set-password/<uidb64>/<token>/', auth_views.PasswordResetConfirmView.as_view(
+        template_name='accounts/set_password.html',
+        success_url=reverse_lazy('login_selector'),
+    ), name='set_password'),
+    
     # Dashboard and logout
     path('dashboard/', views.dashboard, name='dashboard'),
     path('logout/', views.logout_view, name='logout'),
+    path('metrics/login-throttle/', views.login_throttle_metrics, name='login_throttle_metrics'),
 ]
@@ -2,11 +2,14 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 
+from .dashboard import FRAGMENT_TIMEOUT, fragment_versions
 from .forms import RoleBasedLoginForm, UserRegistrationForm
 from .models import UserProfile
 from .decorators import role_required
+from .throttle import login_metrics, login_succeeded, take_login_attempt
 from documents.models import Document
 from workflow.models import ApprovalLog
 
@@ -89,13 +92,24 @@ def role_login_view(request, role_key):
     
     config = ROLE_CONFIG[role_key]
     
+    status = 200
     if request.method == 'POST':
-        form = RoleBasedLoginForm(request, data=request.POST, expected_role=role_key)
-        if form.is_valid():
-            user = form.get_user()
-            login(request, user)
-            messages.success(request, f'Welcome, {user.get_full_name() or user.username}!')
-            return redirect('dashboard')
+        username = request.POST.get('username', '')
+        # Checked before the form runs authenticate(), so a rejected
+        # attempt costs no password hashing
+        throttle = take_login_attempt(request, username, role_key)
+        if throttle.allowed:
+            form = RoleBasedLoginForm(request, data=request.POST, expected_role=role_key)
+            if form.is_valid():
+                user = form.get_user()
+                login(request, user)
+                login_succeeded(request, username)
+                messages.success(request, f'Welcome, {user.get_full_name() or user.username}!')
+                return redirect('dashboard')
+        else:
+            form = RoleBasedLoginForm(request, initial={'username': username}, expected_role=role_key)
+            messages.error(request, f'Too many login attempts. Please try again in {throttle.retry_after} seconds.')
+            status = 429
     else:
         form = RoleBasedLoginForm(request, expected_role=role_key)
     
@@ -103,7 +117,7 @@ def role_login_view(request, role_key):
         'form': form,
         'config': config,
         'role_key': role_key,
-    })
+    }, status=status)
 
 
 # Individual login views for each role
@@ -155,16 +169,27 @@ def dashboard(request):
     # Get recently processed requests by this user
     processed_logs = ApprovalLog.objects.filter(user=request.user).select_related('request', 'step').order_by('-timestamp')[:5]
     
+    # Both querysets stay lazy: the template only runs them when its cached
+    # fragment is missing (see accounts/dashboard.py)
     context = {
         'profile': profile,
         'role_config': role_config,
         'documents': documents,
         'processed_logs': processed_logs,
+        'fragment_versions': fragment_versions(request.user),
+        'fragment_timeout': FRAGMENT_TIMEOUT,
     }
     
     return render(request, 'dashboard/dashboard.html', context)
 
 
+@login_required
+@role_required('CUSTOMER_ADMIN')
+def login_throttle_metrics(request):
+    """Login attempts and throttled attempts per portal, as JSON."""
+    return JsonResponse(login_metrics())
+
+
 @login_required
 def logout_view(request):
     """Logout and redirect to login selector."""
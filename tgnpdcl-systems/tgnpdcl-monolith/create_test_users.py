@@ -7,20 +7,26 @@ from workflow.models import WorkflowStep, SanctionLimit
 print("Creating test data...")
 
 # Create Workflow Steps
+# (order, name, role, can_reject, can_approve_final)
 workflow_steps = [
-    (1, 'JPO Review', 'JPO'),
-    (2, 'APO Review', 'APO'),
-    (3, 'DPO Review', 'DPO'),
-    (4, 'FA & CAO Review', 'FA_CAO'),
-    (5, 'DE Technical Review', 'DE'),
-    (6, 'SE Final Review', 'SE_CGM'),
-    (7, 'CGM Approval', 'SE_CGM'),
+    (1, 'JPO Review', 'JPO', False, False),
+    (2, 'APO Review', 'APO', False, False),
+    (3, 'DPO Review', 'DPO', False, False),
+    (4, 'FA & CAO Review', 'FA_CAO', False, False),
+    (5, 'DE Technical Review', 'DE', False, False),
+    (6, 'SE Final Review', 'SE_CGM', True, False),
+    (7, 'CGM Approval', 'SE_CGM', True, True),
 ]
 
-for order, name, role in workflow_steps:
+for order, name, role, can_reject, can_approve_final in workflow_steps:
     WorkflowStep.objects.get_or_create(
         order=order,
-        defaults={'name': name, 'role_name': role}
+        defaults={
+            'name': name,
+            'role_name': role,
+            'can_reject': can_reject,
+            'can_approve_final': can_approve_final,
+        }
     )
 print("✅ Workflow Steps initialized")
 
@@ -1,4 +1,6 @@
 # from django.contrib import admin
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
 # from .models import Hospital, Service, Bill, LineItem, BillDocument
 
 
@@ -41,9 +43,11 @@ from django.contrib import admin
 from .models import (
     Hospital,
     Service,
+    ServiceRate,
     Scheme,
     Bill,
     LineItem,
+    DocumentBlob,
     BillDocument,
     WorkflowHistory,
     SanctionOrder
@@ -57,12 +61,26 @@ class HospitalAdmin(admin.ModelAdmin):
     search_fields = ('name', 'code', 'district')
 
 
+class ServiceRateInline(admin.TabularInline):
+    model = ServiceRate
+    extra = 0
+
+
 @admin.register(Service)
 class ServiceAdmin(admin.ModelAdmin):
     list_display = ('name', 'is_active')
     list_filter = ('is_active',)
     search_fields = ('name',)
 
+    inlines = [ServiceRateInline]
+
+
+@admin.register(ServiceRate)
+class ServiceRateAdmin(admin.ModelAdmin):
+    list_display = ('service', 'tier', 'rate', 'effective_from')
+    list_filter = ('tier', 'effective_from')
+    search_fields = ('service__name',)
+
 
 @admin.register(Scheme)
 class SchemeAdmin(admin.ModelAdmin):
@@ -100,10 +118,40 @@ class BillAdmin(admin.ModelAdmin):
 
     list_filter = ('status', 'hospital', 'scheme')
     search_fields = ('patient_name', 'employee_id', 'claim_id')
-    readonly_fields = ('claim_id', 'created_at', 'submitted_at')
+    readonly_fields = ('claim_id', 'created_at', 'submitted_at', 'archived_workflow_history')
 
     inlines = [LineItemInline, BillDocumentInline, WorkflowHistoryInline]
 
+    @admin.display(description='Archived workflow history')
+    def archived_workflow_history(self, obj):
+        # The inline only shows hot rows; archived ones come from the archive file
+        from workflow.archive import bill_history
+        from workflow.models import ArchivedHistory
+        if obj.pk is None or not ArchivedHistory.objects.filter(request__bill=obj).exists():
+            return '-'
+        rows = format_html_join('', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>', (
+            (
+                f'{timezone.localtime(entry.action_at):%Y-%m-%d %H:%M}',
+                entry.action_by.username,
+                entry.role,
+                entry.get_action_display(),
+                entry.remarks,
+            )
+            for entry in bill_history(obj)
+        ))
+        return format_html(
+            '<table><thead><tr><th>When</th><th>By</th><th>Role</th><th>Action</th>'
+            '<th>Remarks</th></tr></thead><tbody>{}</tbody></table>',
+            rows,
+        )
+
+
+@admin.register(DocumentBlob)
+class DocumentBlobAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'size', 'ref_count', 'created_at', 'adopted_at')
+    search_fields = ('sha256',)
+    readonly_fields = ('sha256', 'file', 'size', 'ref_count', 'created_at')
+
 
 @admin.register(SanctionOrder)
 class SanctionOrderAdmin(admin.ModelAdmin):
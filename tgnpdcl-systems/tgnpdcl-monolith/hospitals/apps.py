@@ -5,3 +5,6 @@ class HospitalsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hospitals'
     verbose_name = 'Hospitals'
+
+    def ready(self):
+        from . import signals  # noqa: F401
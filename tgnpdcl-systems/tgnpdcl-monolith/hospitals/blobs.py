@@ -0,0 +1,157 @@
+"""
+Content-addressed storage for claim documents.
+
+Hospitals attach the same ID cards, CC cards and discharge summaries to many
+claims. Each distinct file content is stored once as a DocumentBlob keyed by
+its SHA-256 and every BillDocument carrying that content points at the blob.
+
+The upload handler writes incoming bytes under a fresh name and calls
+adopt_upload() once the hash is known: if the content is already stored the
+new copy is deleted and the existing blob reused. Adopting a blob stamps its
+adopted_at, which keeps garbage collection away from it until the claim
+referencing it has had time to be saved; a refused submission deletes the
+blobs it created with discard_upload(). Browsers that can hash locally ask
+blob_exists first and skip uploading known files altogether.
+"""
+import os
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, ProtectedError
+from django.utils import timezone
+
+from .models import BillDocument, DocumentBlob
+from .renditions import delete_renditions
+
+
+def blob_upload_name(filename):
+    """Storage name for a new blob; the extension is kept for content-type sniffing."""
+    extension = os.path.splitext(filename)[1].lower()[:10]
+    upload_to = DocumentBlob._meta.get_field('file').upload_to
+    return f'{upload_to}{uuid.uuid4().hex}{extension}'
+
+
+def adopt_upload(storage, name, sha256, size):
+    """
+    Register freshly written content as a blob.
+
+    Returns ``(blob, created)``. When a blob with the same hash already
+    exists the just-written copy at ``name`` is deleted.
+    """
+    while True:
+        blob = DocumentBlob.objects.filter(sha256=sha256).first()
+        if blob is None:
+            try:
+                with transaction.atomic():
+                    return DocumentBlob.objects.create(sha256=sha256, file=name, size=size), True
+            except IntegrityError:
+                # Another upload of the same content won the race
+                continue
+        # Only drop our copy once the existing blob is safe from collection;
+        # if it was collected in the meantime, store ours instead
+        if reserve_blob(blob):
+            storage.delete(name)
+            return blob, False
+
+
+def reserve_blob(blob):
+    """
+    Keep ``blob`` from garbage collection for the grace period while a
+    BillDocument pointing at it is being saved. Returns False if the blob
+    has already been collected.
+    """
+    blob.adopted_at = timezone.now()
+    return bool(DocumentBlob.objects.filter(pk=blob.pk).update(adopted_at=blob.adopted_at))
+
+
+def discard_upload(blob):
+    """
+    Delete a blob adopt_upload() just created for a submission that was
+    then refused. It is kept if anything has referenced or adopted it since.
+    Returns True if it was deleted.
+    """
+    try:
+        with transaction.atomic():
+            unused = list(DocumentBlob.objects.select_for_update().filter(
+                pk=blob.pk, ref_count=0, adopted_at=blob.adopted_at,
+            ).values_list('pk', flat=True))
+            deleted, _ = DocumentBlob.objects.filter(pk__in=unused).delete() if unused else (0, None)
+    except ProtectedError:
+        return False  # ref_count has drifted; recount_refs() will fix it
+    if deleted:
+        blob.file.storage.delete(blob.file.name)
+    return bool(deleted)
+
+
+def find_hospital_blob(hospital, sha256):
+    """
+    The blob with this hash, if ``hospital`` has already uploaded it.
+
+    Lookups are scoped to the hospital's own documents so that knowing a hash
+    never grants access to another hospital's files.
+    """
+    return DocumentBlob.objects.filter(
+        sha256=sha256,
+        documents__bill__hospital=hospital,
+    ).first()
+
+
+def increment_refs(blob_id):
+    DocumentBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') + 1)
+
+
+def decrement_refs(blob_id):
+    DocumentBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+
+
+def recount_refs():
+    """Rebuild every ref_count from the actual BillDocument references."""
+    counts = dict(
+        BillDocument.objects.filter(blob__isnull=False)
+        .values_list('blob')
+        .annotate(total=Count('id'))
+    )
+    stale = []
+    for blob in DocumentBlob.objects.only('id', 'ref_count').iterator():
+        actual = counts.get(blob.id, 0)
+        if blob.ref_count != actual:
+            blob.ref_count = actual
+            stale.append(blob)
+    DocumentBlob.objects.bulk_update(stale, ['ref_count'], batch_size=500)
+    return len(stale)
+
+
+def collect_garbage(grace=timedelta(hours=1), dry_run=False):
+    """
+    Delete blobs nobody references any more.
+
+    Blobs adopted less than ``grace`` ago are kept: an upload adopts its
+    blob before the BillDocument pointing at it is saved. Returns
+    ``(count, bytes)``.
+    """
+    cutoff = timezone.now() - grace
+    candidates = DocumentBlob.objects.filter(ref_count=0, adopted_at__lt=cutoff)
+
+    removed = freed = 0
+    for blob in candidates.iterator():
+        if dry_run:
+            removed += 1
+            freed += blob.size
+            continue
+        try:
+            with transaction.atomic():
+                # Re-check under a row lock in case a reference or an
+                # adoption appeared; reserve_blob() waits for the lock
+                unused = list(DocumentBlob.objects.select_for_update().filter(
+                    pk=blob.pk, ref_count=0, adopted_at__lt=cutoff,
+                ).values_list('pk', flat=True))
+                deleted, _ = DocumentBlob.objects.filter(pk__in=unused).delete() if unused else (0, None)
+        except ProtectedError:
+            continue  # ref_count has drifted; recount_refs() will fix it
+        if deleted:
+            blob.file.storage.delete(blob.file.name)
+            delete_renditions(blob)
+            removed += 1
+            freed += blob.size
+    return removed, freed
@@ -34,6 +34,7 @@
 
 
 from django import forms
+from .blobs import find_hospital_blob, reserve_blob
 from .models import Bill, BillDocument
 
 
@@ -107,11 +108,70 @@ class BillForm(forms.ModelForm):
         }
 
 
+class BillFilterForm(forms.Form):
+    """
+    Status / date filters for the hospital bill list.
+    """
+
+    status = forms.ChoiceField(
+        choices=(('', 'All Statuses'),) + Bill.STATUS_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+
+
+class LineItemRowForm(forms.Form):
+    """
+    Validates one row of a line-item batch (see hospitals.line_items).
+    """
+
+    hospital_service_name = forms.CharField(max_length=255)
+    description = forms.CharField(required=False)
+    claimed_rate = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    claimed_quantity = forms.IntegerField(min_value=1)
+    service = forms.IntegerField(required=False, min_value=1)
+    comments = forms.CharField(required=False)
+
+
+class LineItemBatchForm(forms.Form):
+    """
+    Paste itemised bill lines as CSV:
+    service name, rate, quantity[, description[, service id]]
+    """
+
+    items_csv = forms.CharField(
+        label='Line Items (CSV)',
+        widget=forms.Textarea(attrs={
+            'class': 'form-control',
+            'rows': 15,
+            'placeholder': 'Paracetamol 500mg, 2.50, 30, Strip of 10',
+        })
+    )
+
+
 class BillDocumentForm(forms.ModelForm):
     """
     Annexure-C – Upload Mandatory / Optional Documents
+
+    Either a file is uploaded, or ``known_sha256`` names content the hospital
+    has uploaded before (filled in by the page after hashing the file in the
+    browser), in which case the existing blob is reused and nothing is sent.
     """
 
+    known_sha256 = forms.RegexField(
+        regex=r'^[0-9a-f]{64}$',
+        required=False,
+        widget=forms.HiddenInput(attrs={'class': 'known-sha256'})
+    )
+
     class Meta:
         model = BillDocument
         fields = [
@@ -123,3 +183,24 @@ class BillDocumentForm(forms.ModelForm):
             'document_type': forms.Select(attrs={'class': 'form-control'}),
             'file': forms.FileInput(attrs={'class': 'form-control'}),
         }
+
+    def __init__(self, *args, hospital=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hospital = hospital
+        self.fields['file'].required = False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        known_sha256 = cleaned_data.get('known_sha256')
+
+        if cleaned_data.get('file'):
+            cleaned_data['blob'] = cleaned_data['file'].blob
+        elif known_sha256:
+            blob = find_hospital_blob(self.hospital, known_sha256)
+            if blob is None or not reserve_blob(blob):
+                raise forms.ValidationError('Previously uploaded file not found; please attach it again.')
+            cleaned_data['blob'] = blob
+        elif 'file' not in self.errors:
+            self.add_error('file', 'Please attach a file.')
+
+        return cleaned_data
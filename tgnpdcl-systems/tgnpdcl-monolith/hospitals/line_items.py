@@ -0,0 +1,162 @@
+"""
+Batch entry of bill line items.
+
+Itemised pharmacy bills run to hundreds of lines, so instead of one
+LineItem.save() per row a batch is validated in a single pass, written with
+one bulk INSERT, and the bill's gross totals are recomputed with one
+aggregate UPDATE, all in one transaction.
+"""
+import csv
+import io
+
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from workflow.limits import reevaluate_limits
+from workflow.models import SanctionRequest
+from .forms import LineItemRowForm
+from .models import Bill, LineItem, Service
+from .stats import update_bills
+
+
+# Column order for pasted / uploaded CSV batches
+CSV_COLUMNS = ('hospital_service_name', 'claimed_rate', 'claimed_quantity', 'description', 'service')
+
+# Bills in these states can no longer take new line items
+LOCKED_STATUSES = ('APPROVED', 'REJECTED')
+
+
+class LineItemBatchError(Exception):
+    """Raised with ``errors`` mapping 1-based row numbers to field errors."""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} invalid line item row(s)')
+        self.errors = errors
+
+
+def parse_csv(text):
+    """Turn pasted CSV (optionally with a header row) into row dicts."""
+    rows = []
+    for values in csv.reader(io.StringIO(text.strip())):
+        if not any(value.strip() for value in values):
+            continue
+        if not rows and values and values[0].strip().lower() == CSV_COLUMNS[0]:
+            continue  # header
+        rows.append(dict(zip(CSV_COLUMNS, (value.strip() for value in values))))
+    return rows
+
+
+def build_line_items(bill, rows):
+    """
+    Validate ``rows`` and return unsaved LineItem objects for ``bill``.
+
+    Every row is checked before anything is written; referenced services are
+    resolved with a single query.
+    """
+    errors = {}
+    # (row number, cleaned data) so later checks report the original row
+    cleaned_rows = []
+    for number, row in enumerate(rows, start=1):
+        form = LineItemRowForm(row)
+        if form.is_valid():
+            cleaned_rows.append((number, form.cleaned_data))
+        else:
+            errors[number] = form.errors.get_json_data()
+
+    service_ids = {row['service'] for _, row in cleaned_rows if row.get('service')}
+    services = Service.objects.filter(is_active=True).in_bulk(service_ids)
+    for number, row in cleaned_rows:
+        if row.get('service') and row['service'] not in services:
+            errors.setdefault(number, {})['service'] = [
+                {'message': 'Unknown or inactive service.', 'code': 'invalid'}
+            ]
+
+    if not rows:
+        errors[0] = {'__all__': [{'message': 'No line items supplied.', 'code': 'required'}]}
+    if errors:
+        raise LineItemBatchError(errors)
+
+    items = []
+    for _, row in cleaned_rows:
+        item = LineItem(
+            bill=bill,
+            service=services.get(row.get('service')),
+            hospital_service_name=row['hospital_service_name'],
+            description=row.get('description') or '',
+            claimed_rate=row['claimed_rate'],
+            claimed_quantity=row['claimed_quantity'],
+            comments=row.get('comments') or '',
+        )
+        # bulk_create skips LineItem.save(), so derive the amounts here
+        item.claimed_amount = item.claimed_rate * item.claimed_quantity
+        items.append(item)
+    return items
+
+
+def add_line_items(bill, rows):
+    """
+    Validate and insert a batch of line items, then refresh the bill totals.
+
+    The bill row is locked while its status is checked, so a claim decided
+    at the same moment (workflow.transitions) cannot take new items.
+    """
+    items = build_line_items(bill, rows)
+    with transaction.atomic():
+        # Same lock order as workflow.transitions: the request, then the bill
+        SanctionRequest.objects.select_for_update().filter(bill_id=bill.pk).exists()
+        status = Bill.objects.select_for_update().filter(pk=bill.pk).values_list('status', flat=True).get()
+        if status in LOCKED_STATUSES:
+            raise LineItemBatchError({0: {'__all__': [{
+                'message': f'Line items cannot be added to a {dict(Bill.STATUS_CHOICES)[status]} bill.',
+                'code': 'locked',
+            }]}})
+        LineItem.objects.bulk_create(items, batch_size=500)
+        recompute_bill_totals([bill.pk])
+    return items
+
+
+def recompute_bill_totals(bill_ids):
+    """
+    Set gross_claimed_amount / gross_approved_amount of ``bill_ids`` from
+    their line items with one aggregate UPDATE.
+
+    Open sanction requests follow the new claimed amount and are re-flagged
+    against their sanction limits, and claim statistics receive the
+    difference. Must run inside a transaction.
+    """
+    bill_ids = list(bill_ids)
+    if not bill_ids:
+        return
+
+    def item_total(field):
+        subquery = (
+            LineItem.objects.filter(bill=OuterRef('pk'))
+            .order_by()
+            .values('bill')
+            .annotate(total=Sum(field))
+            .values('total')
+        )
+        return Coalesce(
+            Subquery(subquery),
+            Value(0),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        )
+
+    update_bills(
+        Bill.objects.filter(pk__in=bill_ids),
+        gross_claimed_amount=item_total('claimed_amount'),
+        gross_approved_amount=item_total('approved_amount'),
+    )
+
+    open_requests = SanctionRequest.objects.filter(
+        bill_id__in=bill_ids,
+        status__in=['PENDING', 'IN_PROGRESS', 'CLARIFICATION'],
+    )
+    open_requests.update(
+        claimed_amount=Subquery(
+            Bill.objects.filter(pk=OuterRef('bill_id')).values('gross_claimed_amount')[:1]
+        )
+    )
+    # update() skips SanctionRequest.save(), which keeps the limit flag current
+    reevaluate_limits(open_requests)
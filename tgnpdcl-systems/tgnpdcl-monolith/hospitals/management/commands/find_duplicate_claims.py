@@ -0,0 +1,55 @@
+"""
+Fingerprint the existing claim history and report duplicate claims.
+
+    python manage.py find_duplicate_claims
+    python manage.py find_duplicate_claims --hospital NP00019 --skip-backfill
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hospitals.duplicates import backfill_fingerprints, duplicate_groups
+from hospitals.models import Hospital
+
+
+class Command(BaseCommand):
+    help = 'Backfill claim fingerprints and list claims submitted more than once.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hospital', metavar='CODE', help='Only report this hospital.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Bills per backfill batch (default 1000).')
+        parser.add_argument(
+            '--skip-backfill',
+            action='store_true',
+            help='Trust the stored fingerprints instead of recomputing them first.',
+        )
+
+    def handle(self, *args, **options):
+        hospital = None
+        if options['hospital']:
+            try:
+                hospital = Hospital.objects.get(code=options['hospital'])
+            except Hospital.DoesNotExist:
+                raise CommandError(f"No hospital with code {options['hospital']}")
+
+        started = time.perf_counter()
+        if not options['skip_backfill']:
+            updated = backfill_fingerprints(chunk_size=options['chunk_size'])
+            self.stdout.write(f'Fingerprinted {updated} claim(s) in {time.perf_counter() - started:.2f}s.')
+
+        groups = duplicate_groups(hospital)
+        for bills in groups:
+            first = bills[0]
+            self.stdout.write(
+                f'\n{first.hospital.code} employee {first.employee_id} IP {first.ip_number} '
+                f'({first.admission_date} to {first.discharge_date}):'
+            )
+            for bill in bills:
+                self.stdout.write(f'  {bill.claim_id}  {bill.status:<12} created {bill.created_at:%Y-%m-%d %H:%M}')
+
+        extra = sum(len(bills) - 1 for bills in groups)
+        style = self.style.WARNING if groups else self.style.SUCCESS
+        self.stdout.write(style(
+            f'\n{len(groups)} duplicated admission(s), {extra} extra claim(s) '
+            f'({time.perf_counter() - started:.2f}s).'
+        ))
@@ -0,0 +1,44 @@
+"""
+Remove stored document blobs that no BillDocument references any more.
+
+    python manage.py gc_document_blobs
+    python manage.py gc_document_blobs --recount --grace-minutes 30 --dry-run
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from hospitals.blobs import collect_garbage, recount_refs
+
+
+class Command(BaseCommand):
+    help = 'Garbage-collect unreferenced claim document blobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes',
+            type=int,
+            default=60,
+            help='Keep unreferenced blobs adopted more recently than this (in-flight submissions).',
+        )
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Rebuild reference counts from BillDocument rows first.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report only; delete nothing.')
+
+    def handle(self, *args, **options):
+        if options['recount'] and not options['dry_run']:
+            fixed = recount_refs()
+            self.stdout.write(f'Corrected {fixed} reference count(s).')
+
+        removed, freed = collect_garbage(
+            grace=timedelta(minutes=options['grace_minutes']),
+            dry_run=options['dry_run'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{'[dry run] ' if options['dry_run'] else ''}"
+            f"Removed {removed} blob(s), {filesizeformat(freed)} freed."
+        ))
@@ -0,0 +1,203 @@
+"""
+Bulk upsert of empanelled hospitals from the CC HOSP MASTER workbook.
+
+    python manage.py import_hospital_master
+    python manage.py import_hospital_master "path/to/CC HOSP MASTER.xlsx" --chunk-size 1000
+
+The workbook is read in openpyxl's streaming read-only mode and processed in
+chunks: each chunk costs one SELECT for the existing codes, one bulk INSERT
+and one bulk UPDATE. Rows whose content hash matches Hospital.import_hash are
+skipped without a write.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from hospitals.models import Hospital
+
+
+# Workbook header -> Hospital field
+COLUMN_MAP = {
+    'Hospital Code': 'code',
+    'Hospital Name': 'name',
+    'Hospital PAN No': 'pan_number',
+    'GST NO': 'gst_number',
+    'CIN NO': 'cin_number',
+    'District': 'district',
+}
+
+ADDRESS_COLUMNS = (
+    'Hospital Address1',
+    'Hospital Address2',
+    'City',
+    'State',
+    'Pin code',
+)
+
+# Fields written by the importer (and covered by the row hash)
+IMPORT_FIELDS = (
+    'name',
+    'pan_number',
+    'gst_number',
+    'cin_number',
+    'district',
+    'address',
+)
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return ' '.join(str(value).split())
+
+
+def row_hash(data):
+    """Stable SHA-256 over the imported field values."""
+    payload = '\x1f'.join(data[field] for field in IMPORT_FIELDS)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class Command(BaseCommand):
+    help = 'Import / update hospitals from the CC HOSP MASTER spreadsheet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=str(settings.BASE_DIR / 'CC HOSP MASTER.xlsx'),
+            help='Path to the .xlsx master (defaults to the copy in the project root).',
+        )
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument(
+            '--tier',
+            default='TIER1',
+            choices=[choice[0] for choice in Hospital.TIER_CHOICES],
+            help='Tier assigned to newly created hospitals (existing tiers are kept).',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing.')
+
+    def handle(self, *args, **options):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise CommandError('openpyxl is required: pip install openpyxl')
+
+        try:
+            workbook = load_workbook(options['path'], read_only=True, data_only=True)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot open {options['path']}: {exc}")
+
+        self.tier = options['tier']
+        self.dry_run = options['dry_run']
+        self.stats = {'read': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'invalid': 0}
+        started = time.perf_counter()
+
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                raise CommandError('The workbook is empty.')
+            columns = self._column_positions(header)
+
+            chunk = {}
+            for line_number, row in enumerate(rows, start=2):
+                self.stats['read'] += 1
+                data = self._validate(row, columns, line_number)
+                if data is None:
+                    continue
+                # A code repeated within a chunk: the later row wins
+                chunk[data['code']] = data
+                if len(chunk) >= options['chunk_size']:
+                    self._flush(chunk)
+                    chunk = {}
+            if chunk:
+                self._flush(chunk)
+        finally:
+            workbook.close()
+
+        elapsed = time.perf_counter() - started
+        rate = self.stats['read'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{'[dry run] ' if self.dry_run else ''}"
+            f"Read {self.stats['read']} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec): "
+            f"{self.stats['created']} created, {self.stats['updated']} updated, "
+            f"{self.stats['unchanged']} unchanged, {self.stats['invalid']} invalid."
+        ))
+
+    def _column_positions(self, header):
+        names = [_clean(cell) for cell in header]
+        missing = [
+            column for column in list(COLUMN_MAP) + list(ADDRESS_COLUMNS)
+            if column not in names
+        ]
+        if missing:
+            raise CommandError(f"Missing column(s) in header: {', '.join(missing)}")
+        return {name: index for index, name in enumerate(names)}
+
+    def _validate(self, row, columns, line_number):
+        """Normalise one sheet row into Hospital field values, or None if invalid."""
+        def cell(column):
+            index = columns[column]
+            return _clean(row[index]) if index < len(row) else ''
+
+        if not any(row):
+            self.stats['read'] -= 1  # trailing blank rows are not data
+            return None
+
+        data = {field: cell(column) for column, field in COLUMN_MAP.items()}
+        data['address'] = ', '.join(filter(None, (cell(column) for column in ADDRESS_COLUMNS)))
+
+        errors = []
+        if not data['code']:
+            errors.append('missing Hospital Code')
+        if not data['name']:
+            errors.append('missing Hospital Name')
+        for field, value in data.items():
+            max_length = getattr(Hospital._meta.get_field(field), 'max_length', None)
+            if max_length and len(value) > max_length:
+                errors.append(f'{field} longer than {max_length} characters')
+
+        if errors:
+            self.stats['invalid'] += 1
+            self.stderr.write(f"Row {line_number}: {'; '.join(errors)}")
+            return None
+
+        data['import_hash'] = row_hash(data)
+        return data
+
+    def _flush(self, chunk):
+        existing = {
+            hospital.code: hospital
+            for hospital in Hospital.objects.filter(code__in=list(chunk)).only(
+                'id', 'code', 'import_hash', *IMPORT_FIELDS
+            )
+        }
+
+        to_create = []
+        to_update = []
+        for code, data in chunk.items():
+            hospital = existing.get(code)
+            if hospital is None:
+                to_create.append(Hospital(tier=self.tier, **data))
+            elif hospital.import_hash == data['import_hash']:
+                self.stats['unchanged'] += 1
+            else:
+                for field in IMPORT_FIELDS + ('import_hash',):
+                    setattr(hospital, field, data[field])
+                to_update.append(hospital)
+
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
+        if self.dry_run:
+            return
+
+        with transaction.atomic():
+            if to_create:
+                Hospital.objects.bulk_create(to_create)
+            if to_update:
+                Hospital.objects.bulk_update(to_update, IMPORT_FIELDS + ('import_hash',))
@@ -0,0 +1,38 @@
+"""
+Queue background document processing for claims that have not finished it,
+e.g. after a worker outage or for claims submitted before the pipeline.
+
+    python manage.py process_claim_documents
+    python manage.py process_claim_documents --retry-failed
+"""
+from django.core.management.base import BaseCommand
+
+from hospitals.models import Bill, DocumentBlob
+from hospitals.tasks import process_claim_documents
+
+
+class Command(BaseCommand):
+    help = 'Queue document post-processing for claims still pending it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Also re-check claims (and their blobs) whose processing failed.',
+        )
+
+    def handle(self, *args, **options):
+        statuses = ['PENDING', 'PROCESSING']
+        if options['retry_failed']:
+            statuses.append('FAILED')
+            DocumentBlob.objects.filter(
+                processing_status='FAILED',
+                documents__bill__processing_status='FAILED',
+            ).update(processing_status='PENDING')
+
+        bill_ids = Bill.objects.exclude(status='DRAFT').filter(processing_status__in=statuses).values_list('pk', flat=True)
+        queued = 0
+        for bill_id in bill_ids.iterator():
+            process_claim_documents.delay(bill_id)
+            queued += 1
+        self.stdout.write(self.style.SUCCESS(f'Queued {queued} claim(s) for document processing.'))
@@ -0,0 +1,33 @@
+"""
+Recompute the ClaimStatistics table from the Bill table.
+
+    python manage.py rebuild_claim_stats
+    python manage.py rebuild_claim_stats --hospital NP00019
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hospitals import stats
+from hospitals.models import Hospital
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-hospital / per-scheme claim statistics from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hospital', metavar='CODE', help='Only rebuild this hospital.')
+
+    def handle(self, *args, **options):
+        hospital = None
+        if options['hospital']:
+            try:
+                hospital = Hospital.objects.get(code=options['hospital'])
+            except Hospital.DoesNotExist:
+                raise CommandError(f"No hospital with code {options['hospital']}")
+
+        started = time.perf_counter()
+        rows = stats.rebuild(hospital)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rows} statistics row(s) in {time.perf_counter() - started:.2f}s.'
+        ))
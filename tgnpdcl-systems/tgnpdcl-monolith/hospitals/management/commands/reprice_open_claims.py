@@ -0,0 +1,30 @@
+"""
+Re-apply the current rate card to every claim still under processing.
+Run after revising ServiceRate entries.
+
+    python manage.py reprice_open_claims
+    python manage.py reprice_open_claims --chunk-size 1000
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from hospitals import rates
+
+
+class Command(BaseCommand):
+    help = 'Re-price line items of all open claims from the current rate card.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Bills per transaction (default 500).')
+
+    def handle(self, *args, **options):
+        card = rates.get_rate_card()
+        self.stdout.write(f'Rate card v{card.version}: {len(card)} service/tier rate(s).')
+
+        started = time.perf_counter()
+        bills, items = rates.reprice_open_claims(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {bills} open claim(s), re-priced {items} line item(s) '
+            f'in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitals', '0002_bill_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hospital',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
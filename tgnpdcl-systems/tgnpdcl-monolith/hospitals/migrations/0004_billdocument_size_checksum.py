@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitals', '0003_hospital_import_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billdocument',
+            name='file_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='billdocument',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitals', '0005_document_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('bill_count', models.IntegerField(default=0)),
+                ('claimed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('approved_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='claim_statistics', to='hospitals.hospital')),
+                ('scheme', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='claim_statistics', to='hospitals.scheme')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='claimstatistics',
+            constraint=models.UniqueConstraint(fields=('hospital', 'scheme', 'status'), name='claim_stats_unique_key'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitals', '0006_claim_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateCardVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='lineitem',
+            name='rate_card_priced',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ServiceRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tier', models.CharField(choices=[('TIER1', 'Tier-I'), ('TIER2', 'Tier-II'), ('TIER3', 'Tier-III')], max_length=10)),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('effective_from', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rates', to='hospitals.service')),
+            ],
+            options={
+                'ordering': ['service', 'tier', '-effective_from'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='servicerate',
+            constraint=models.UniqueConstraint(fields=('service', 'tier', 'effective_from'), name='service_rate_unique_revision'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:47
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitals', '0009_document_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentblob',
+            name='adopted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -140,7 +140,7 @@
 
 
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 import uuid
@@ -176,6 +176,10 @@ class Hospital(models.Model):
     valid_upto = models.DateField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
 
+    # SHA-256 of the master-sheet row this record was last imported from,
+    # so re-imports can skip unchanged rows (see import_hospital_master)
+    import_hash = models.CharField(max_length=64, blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -196,6 +200,49 @@ class Service(models.Model):
         return self.name
 
 
+class ServiceRate(models.Model):
+    """
+    Ceiling rate for a service at a hospital tier, from ``effective_from``
+    until the next revision. Looked up through hospitals.rates.
+    """
+
+    service = models.ForeignKey(
+        Service,
+        related_name='rates',
+        on_delete=models.CASCADE
+    )
+    tier = models.CharField(max_length=10, choices=Hospital.TIER_CHOICES)
+    rate = models.DecimalField(max_digits=10, decimal_places=2)
+    effective_from = models.DateField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['service', 'tier', '-effective_from']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['service', 'tier', 'effective_from'],
+                name='service_rate_unique_revision'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.service} / {self.tier} from {self.effective_from}: {self.rate}"
+
+
+class RateCardVersion(models.Model):
+    """
+    Single row bumped on every ServiceRate change, so each process can tell
+    whether its compiled rate card is stale with one cheap query.
+    """
+
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Rate card v{self.version}"
+
+
 class Scheme(models.Model):
     name = models.CharField(max_length=255)
     code = models.CharField(max_length=50, unique=True)
@@ -219,6 +266,13 @@ class Bill(models.Model):
         ('REJECTED', 'Rejected'),
     )
 
+    PROCESSING_STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('PROCESSING', 'Processing'),
+        ('DONE', 'Processed'),
+        ('FAILED', 'Failed'),
+    )
+
     EMPLOYEE_TYPE_CHOICES = (
         ('EMPLOYEE', 'Employee'),
         ('PENSIONER', 'Pensioner'),
@@ -295,9 +349,66 @@ class Bill(models.Model):
 
     submitted_at = models.DateTimeField(null=True, blank=True)
 
+    # Normalised hash of hospital / patient / admission (see hospitals.duplicates)
+    fingerprint = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
+
+    # Background document processing of the claim as a whole (see hospitals.tasks)
+    processing_status = models.CharField(
+        max_length=10,
+        choices=PROCESSING_STATUS_CHOICES,
+        default='PENDING'
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of a hospital's claims (see hospitals.pagination)
+            models.Index(
+                fields=['hospital', '-created_at', '-id'],
+                name='bill_hosp_created_idx'
+            ),
+            models.Index(
+                fields=['hospital', 'status', '-created_at', '-id'],
+                name='bill_hosp_status_created_idx'
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what ClaimStatistics currently counts for this bill so
+        # save() can apply just the difference.
+        from .stats import STATE_FIELDS, bill_state
+        if all(field in instance.__dict__ for field in STATE_FIELDS):
+            instance._stats_state = bill_state(instance)
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .duplicates import FINGERPRINT_FIELDS, claim_fingerprint
+        from .stats import bill_state, load_bill_state, record_changes, saved_state
+
+        self.fingerprint = claim_fingerprint(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(FINGERPRINT_FIELDS):
+            kwargs['update_fields'] = {*update_fields, 'fingerprint'}
+
+        with transaction.atomic():
+            if self._state.adding:
+                old_state = None
+            elif hasattr(self, '_stats_state'):
+                old_state = self._stats_state
+            else:
+                old_state = load_bill_state(self.pk)
+            super().save(*args, **kwargs)
+            if old_state is not None and kwargs.get('update_fields') is not None:
+                new_state = saved_state(self, old_state, kwargs['update_fields'])
+            else:
+                new_state = bill_state(self)
+            record_changes([(old_state, new_state)])
+        self._stats_state = new_state
+
     def submit_claim(self):
         self.status = 'SUBMITTED'
         self.submitted_at = timezone.now()
@@ -307,6 +418,43 @@ class Bill(models.Model):
         return f"Claim {self.claim_id}"
 
 
+class ClaimStatistics(models.Model):
+    """
+    Running claim totals for one (hospital, scheme, status).
+
+    Maintained incrementally by Bill.save()/delete() in the same transaction
+    as the bill change (see hospitals.stats); rebuild_claim_stats recomputes
+    the table from scratch.
+    """
+
+    hospital = models.ForeignKey(
+        Hospital,
+        on_delete=models.CASCADE,
+        related_name='claim_statistics'
+    )
+    scheme = models.ForeignKey(
+        Scheme,
+        on_delete=models.CASCADE,
+        related_name='claim_statistics'
+    )
+    status = models.CharField(max_length=20)
+
+    bill_count = models.IntegerField(default=0)
+    claimed_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    approved_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hospital', 'scheme', 'status'],
+                name='claim_stats_unique_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.hospital_id}/{self.scheme_id}/{self.status}: {self.bill_count}"
+
+
 class LineItem(models.Model):
 
     bill = models.ForeignKey(
@@ -348,6 +496,9 @@ class LineItem(models.Model):
 
     comments = models.TextField(blank=True)
 
+    # True while approved_rate is the rate card's figure rather than an officer's
+    rate_card_priced = models.BooleanField(default=False)
+
     def save(self, *args, **kwargs):
         self.claimed_amount = self.claimed_rate * self.claimed_quantity
         if self.approved_rate is not None and self.approved_quantity is not None:
@@ -358,6 +509,46 @@ class LineItem(models.Model):
         return self.hospital_service_name
 
 
+class DocumentBlob(models.Model):
+    """
+    One stored copy of a document's bytes, addressed by SHA-256.
+
+    BillDocument rows that upload identical content share a blob;
+    ref_count tracks how many point at it and unreferenced blobs are
+    removed by the gc_document_blobs command.
+    """
+
+    PROCESSING_STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('DONE', 'Processed'),
+        ('FAILED', 'Failed'),
+    )
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to='medical_bills/blobs/')
+    size = models.PositiveBigIntegerField(default=0)  # In bytes
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last time an upload or form claimed this blob; garbage collection
+    # leaves it alone for a grace period after that (see hospitals.blobs)
+    adopted_at = models.DateTimeField(default=timezone.now)
+
+    # Filled in after submission by hospitals.tasks (see hospitals.processing)
+    processing_status = models.CharField(
+        max_length=10,
+        choices=PROCESSING_STATUS_CHOICES,
+        default='PENDING'
+    )
+    mime_type = models.CharField(max_length=100, blank=True)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    metadata = models.JSONField(default=dict, blank=True)
+    processing_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.sha256
+
+
 class BillDocument(models.Model):
 
     DOCUMENT_TYPE_CHOICES = (
@@ -379,6 +570,15 @@ class BillDocument(models.Model):
 
     document_type = models.CharField(max_length=30, choices=DOCUMENT_TYPE_CHOICES)
     file = models.FileField(upload_to='medical_bills/')
+    blob = models.ForeignKey(
+        DocumentBlob,
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name='documents'
+    )
+    file_size = models.PositiveBigIntegerField(default=0)  # In bytes
+    sha256 = models.CharField(max_length=64, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -0,0 +1,83 @@
+"""
+Keyset (cursor) pagination over a (timestamp, id) sort key.
+
+OFFSET pagination gets slower the deeper you page because the database still
+walks every skipped row. Seeking on the last seen (timestamp, id) pair lets an
+index on the same columns jump straight to the next page, and fetching one
+extra row tells us whether there is a next page without a COUNT(*).
+"""
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class KeysetPage:
+    """One page of results plus the cursor for the page after it."""
+
+    def __init__(self, object_list, next_cursor, has_more):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.has_more = has_more
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def encode_cursor(value, pk):
+    """Encode a (timestamp, id) pair as an opaque URL-safe token."""
+    raw = f"{value.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor token; returns None for missing or malformed input."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        timestamp = parse_datetime(value)
+        if timestamp is None:
+            return None
+        return timestamp, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def paginate_keyset(queryset, cursor=None, page_size=25, field='created_at', descending=True):
+    """
+    Return the page of ``queryset`` that follows ``cursor``.
+
+    The queryset is ordered by ``(field, id)`` here, so callers should have a
+    composite index whose trailing columns match that order.
+    """
+    if descending:
+        queryset = queryset.order_by(f'-{field}', '-id')
+    else:
+        queryset = queryset.order_by(field, 'id')
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        value, pk = position
+        op = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': pk})
+        )
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+
+    return KeysetPage(rows, next_cursor, has_more)
@@ -0,0 +1,160 @@
+"""
+Post-submission inspection of claim documents.
+
+Runs in the background (see hospitals.tasks) once per DocumentBlob, so
+content shared by many claims is inspected only once. A single streaming
+pass over the stored file verifies the SHA-256 recorded at upload, sniffs
+the real content type from its leading bytes and counts PDF pages; images
+are then opened with Pillow for their dimensions and frame count, and
+preview renditions are generated (hospitals.renditions).
+"""
+import hashlib
+import re
+
+from django.utils import timezone
+
+from .renditions import generate_renditions
+
+
+CHUNK_SIZE = 256 * 1024
+
+# (leading bytes, MIME type); checked in order
+SIGNATURES = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'BM', 'image/bmp'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),
+)
+
+_PDF_PAGE = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+_PDF_PAGE_TREE_COUNT = re.compile(rb'/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b', re.S)
+_PDF_ENCRYPT = re.compile(rb'/Encrypt\b')
+# Longest token the regexes above must see whole across a chunk boundary
+_OVERLAP = 64
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class ImageRejected(Exception):
+    """Pillow refused to decode the image: it would decompress to too many pixels."""
+
+
+def sniff_mime_type(head):
+    for signature, mime_type in SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head.lstrip()[:1] in (b'{', b'[') or _looks_like_text(head):
+        return 'text/plain'
+    return 'application/octet-stream'
+
+
+def _looks_like_text(head):
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError:
+        return False
+    return bool(head) and b'\x00' not in head
+
+
+def inspect_blob(blob):
+    """
+    Read ``blob`` once and return its findings as a dict of DocumentBlob
+    field values. Raises ChecksumMismatch if the stored bytes no longer
+    match the hash taken at upload, ImageRejected for a decompression bomb.
+    """
+    digest = hashlib.sha256()
+    head = b''
+    tail = b''
+    pdf_pages = 0
+    tree_count = 0
+    encrypted = False
+    size = 0
+
+    with blob.file.storage.open(blob.file.name, 'rb') as stored:
+        while True:
+            chunk = stored.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+            if len(head) < 4096:
+                head += chunk[:4096 - len(head)]
+
+            if head.startswith(b'%PDF-'):
+                # Matches wholly inside the carried-over tail were counted last time
+                window = tail + chunk
+                pdf_pages += sum(1 for match in _PDF_PAGE.finditer(window) if match.end() > len(tail))
+                for match in _PDF_PAGE_TREE_COUNT.finditer(window):
+                    tree_count = max(tree_count, int(match.group(1) or match.group(2)))
+                encrypted = encrypted or bool(_PDF_ENCRYPT.search(window))
+                tail = window[-_OVERLAP:]
+
+    if digest.hexdigest() != blob.sha256:
+        raise ChecksumMismatch(f'Stored content hashes to {digest.hexdigest()}, expected {blob.sha256}')
+
+    mime_type = sniff_mime_type(head)
+    metadata = {'size': size}
+    page_count = None
+
+    if mime_type == 'application/pdf':
+        version = re.match(rb'%PDF-(\d\.\d)', head)
+        metadata['pdf_version'] = version.group(1).decode() if version else ''
+        metadata['encrypted'] = encrypted
+        # Compressed object streams hide individual /Page objects, so fall
+        # back to the page tree's /Count
+        page_count = pdf_pages or tree_count or None
+    elif mime_type.startswith('image/'):
+        metadata.update(_image_metadata(blob))
+        page_count = metadata.get('frames', 1)
+
+    return {
+        'mime_type': mime_type,
+        'page_count': page_count,
+        'metadata': metadata,
+    }
+
+
+def _image_metadata(blob):
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with blob.file.storage.open(blob.file.name, 'rb') as stored, Image.open(stored) as image:
+            return {
+                'format': image.format,
+                'width': image.width,
+                'height': image.height,
+                'frames': getattr(image, 'n_frames', 1),
+            }
+    except Image.DecompressionBombError as exc:
+        raise ImageRejected(str(exc))
+    except (UnidentifiedImageError, OSError) as exc:
+        return {'image_error': str(exc)}
+
+
+def process_blob(blob):
+    """Inspect ``blob`` and store the outcome on it. Returns the new status."""
+    try:
+        findings = inspect_blob(blob)
+    except (ChecksumMismatch, ImageRejected) as exc:
+        blob.processing_status = 'FAILED'
+        blob.processing_error = str(exc)
+    else:
+        for field, value in findings.items():
+            setattr(blob, field, value)
+        blob.metadata['renditions'] = generate_renditions(blob)
+        blob.processing_status = 'DONE'
+        blob.processing_error = ''
+
+    blob.processed_at = timezone.now()
+    blob.save(update_fields=[
+        'processing_status', 'processing_error', 'processed_at', 'mime_type', 'page_count', 'metadata',
+    ])
+    return blob.processing_status
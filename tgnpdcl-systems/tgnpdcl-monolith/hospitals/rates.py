@@ -0,0 +1,184 @@
+"""
+Tier-based rate card used to price line items automatically.
+
+ServiceRate rows are compiled into an immutable RateCard held per process.
+Every change to the rates bumps RateCardVersion, and get_rate_card() compares
+that stamp (one single-row query) with the version it compiled, rebuilding
+only when they differ. Pricing a claim or re-pricing every open claim then
+needs no per-item rate queries.
+
+The rate card gives a ceiling: the approved rate is the lower of the claimed
+rate and the card rate in force on the date of admission.
+"""
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from types import MappingProxyType
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from .line_items import recompute_bill_totals
+from .models import Bill, LineItem, RateCardVersion, ServiceRate
+from .stats import NOT_PENDING_STATUSES
+
+
+PRICED_FIELDS = ['approved_rate', 'approved_quantity', 'approved_amount', 'rate_card_priced']
+
+
+class RateCard:
+    """Read-only (service, tier) -> dated rates lookup."""
+
+    __slots__ = ('version', '_rates')
+
+    def __init__(self, version, rows):
+        revisions = defaultdict(list)
+        for service_id, tier, effective_from, rate in rows:
+            revisions[(service_id, tier)].append((effective_from, rate))
+
+        rates = {}
+        for key, entries in revisions.items():
+            entries.sort()
+            rates[key] = (
+                tuple(effective_from for effective_from, _ in entries),
+                tuple(rate for _, rate in entries),
+            )
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, '_rates', MappingProxyType(rates))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('RateCard is immutable')
+
+    def __len__(self):
+        return len(self._rates)
+
+    def rate_for(self, service_id, tier, on_date):
+        """The rate in force on ``on_date``, or None if the card has none."""
+        entry = self._rates.get((service_id, tier))
+        if entry is None:
+            return None
+        dates, rates = entry
+        index = bisect_right(dates, on_date)
+        return rates[index - 1] if index else None
+
+
+_compiled = None
+_compile_lock = threading.Lock()
+
+
+def current_version():
+    return RateCardVersion.objects.values_list('version', flat=True).first() or 0
+
+
+def bump_version():
+    """Mark every compiled rate card stale. Call in the transaction that changes rates."""
+    if RateCardVersion.objects.update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            RateCardVersion.objects.create(version=1)
+    except IntegrityError:
+        RateCardVersion.objects.update(version=F('version') + 1)
+
+
+def get_rate_card():
+    """The compiled rate card, rebuilt only if the rates changed since last time."""
+    global _compiled
+    version = current_version()
+    card = _compiled
+    if card is not None and card.version == version:
+        return card
+
+    with _compile_lock:
+        card = _compiled
+        if card is None or card.version != version:
+            rows = ServiceRate.objects.values_list('service_id', 'tier', 'effective_from', 'rate')
+            card = _compiled = RateCard(version, rows)
+    return card
+
+
+def _price_item(item, tier, on_date, card, overwrite):
+    """Apply the card rate to ``item`` in memory; True if anything changed."""
+    if item.service_id is None:
+        return False
+    if item.approved_rate is not None and not item.rate_card_priced and not overwrite:
+        return False  # An officer has set this rate
+
+    card_rate = card.rate_for(item.service_id, tier, on_date)
+    if card_rate is None:
+        return False
+
+    rate = min(item.claimed_rate, card_rate)
+    quantity = item.approved_quantity if item.approved_quantity is not None else item.claimed_quantity
+    amount = rate * quantity
+    if (item.approved_rate, item.approved_quantity, item.approved_amount, item.rate_card_priced) == \
+            (rate, quantity, amount, True):
+        return False
+
+    item.approved_rate = rate
+    item.approved_quantity = quantity
+    item.approved_amount = amount
+    item.rate_card_priced = True
+    return True
+
+
+def _price_bills(bills, card, overwrite=False):
+    """
+    Price the line items of ``bills`` (id -> (tier, admission_date)) with one
+    read, one bulk UPDATE and one totals UPDATE. Returns the items changed.
+    """
+    items = LineItem.objects.filter(bill_id__in=list(bills), service__isnull=False)
+    if not overwrite:
+        items = items.filter(Q(approved_rate__isnull=True) | Q(rate_card_priced=True))
+
+    changed = []
+    for item in items.only('id', 'bill_id', 'service_id', 'claimed_rate', 'claimed_quantity', *PRICED_FIELDS):
+        tier, admission_date = bills[item.bill_id]
+        if _price_item(item, tier, admission_date, card, overwrite):
+            changed.append(item)
+
+    if changed:
+        with transaction.atomic():
+            LineItem.objects.bulk_update(changed, PRICED_FIELDS, batch_size=500)
+            recompute_bill_totals({item.bill_id for item in changed})
+    return len(changed)
+
+
+def price_claim(bill, overwrite=False):
+    """
+    Pre-fill approved rates / amounts for every line item of ``bill``.
+
+    Rates an officer entered by hand are kept unless ``overwrite`` is set.
+    Returns the number of line items changed.
+    """
+    return _price_bills(
+        {bill.pk: (bill.hospital.tier, bill.admission_date)},
+        get_rate_card(),
+        overwrite=overwrite,
+    )
+
+
+def reprice_open_claims(chunk_size=500):
+    """
+    Re-apply the current rate card to every claim still under processing.
+
+    Bills are handled ``chunk_size`` at a time; each chunk commits on its own.
+    Returns ``(bills_seen, items_changed)``.
+    """
+    card = get_rate_card()
+    open_bills = (
+        Bill.objects.exclude(status__in=NOT_PENDING_STATUSES)
+        .order_by('pk')
+        .values_list('pk', 'hospital__tier', 'admission_date')
+    )
+
+    seen = changed = 0
+    last_pk = 0
+    while True:
+        chunk = list(open_bills.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+        seen += len(chunk)
+        changed += _price_bills({pk: (tier, admitted) for pk, tier, admitted in chunk}, card)
+    return seen, changed
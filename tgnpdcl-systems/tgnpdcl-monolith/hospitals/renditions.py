@@ -0,0 +1,143 @@
+"""
+Downscaled preview renditions of claim documents.
+
+Scanned bills are usually multi-megabyte phone photos; reviewers get a
+WebP (JPEG where Pillow lacks WebP) rendition instead. Renditions belong to
+the DocumentBlob, so shared content is rendered once, and live at a
+deterministic name beside it:
+
+    medical_bills/blobs/renditions/<sha256>_<size>.webp
+
+They are generated by the post-processing pipeline and, if one is missing
+later, on first request. The cache remembers which renditions exist so that
+serving one does not need a storage round trip.
+"""
+import io
+import posixpath
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+
+
+# Rendition name -> longest edge in pixels
+RENDITION_SIZES = {
+    'thumb': 320,
+    'preview': 1600,
+}
+
+QUALITY = 80
+CACHE_TIMEOUT = 24 * 60 * 60
+LOCK_TIMEOUT = 60
+
+
+def _output_format():
+    from PIL import features
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+def rendition_name(blob, size):
+    directory = posixpath.dirname(blob.file.name)
+    return f'{directory}/renditions/{blob.sha256}_{size}.{_output_format()[1]}'
+
+
+def can_render(blob):
+    return blob.mime_type.startswith('image/') or (blob.mime_type == 'application/pdf' and _pdf_renderer() is not None)
+
+
+def _pdf_renderer():
+    try:
+        import fitz  # PyMuPDF, optional
+    except ImportError:
+        return None
+    return fitz
+
+
+def _first_page_image(blob):
+    from PIL import Image
+
+    fitz = _pdf_renderer()
+    with blob.file.storage.open(blob.file.name, 'rb') as stored:
+        with fitz.open(stream=stored.read(), filetype='pdf') as pdf:
+            pixmap = pdf[0].get_pixmap(dpi=110)
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+
+def render(blob, size):
+    """Encoded rendition bytes for ``blob`` at ``size``, or None if it cannot be rendered."""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    edge = RENDITION_SIZES[size]
+    image_format, _ = _output_format()
+    try:
+        if blob.mime_type == 'application/pdf':
+            if _pdf_renderer() is None:
+                return None
+            image = _first_page_image(blob)
+        elif blob.mime_type.startswith('image/'):
+            with blob.file.storage.open(blob.file.name, 'rb') as stored:
+                image = Image.open(stored)
+                # Let the JPEG decoder downscale while decoding large photos
+                image.draft('RGB', (edge, edge))
+                image = ImageOps.exif_transpose(image)
+                image.load()
+        else:
+            return None
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, RuntimeError):
+        return None
+
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.thumbnail((edge, edge))
+
+    output = io.BytesIO()
+    image.save(output, image_format, quality=QUALITY)
+    return output.getvalue()
+
+
+def _cache_key(blob, size):
+    return f'rendition:{blob.sha256}:{size}'
+
+
+def get_rendition(blob, size):
+    """
+    Storage name of the ``size`` rendition of ``blob``, generating it if
+    missing. Returns None if the document cannot be rendered.
+    """
+    key = _cache_key(blob, size)
+    name = cache.get(key)
+    if name:
+        return name
+
+    storage = blob.file.storage
+    name = rendition_name(blob, size)
+    if not storage.exists(name):
+        # Concurrent requests for the same missing rendition render it once
+        if not cache.add(f'{key}:lock', 1, LOCK_TIMEOUT):
+            return None
+        try:
+            content = render(blob, size)
+            if content is None:
+                return None
+            if not storage.exists(name):
+                storage.save(name, ContentFile(content))
+        finally:
+            cache.delete(f'{key}:lock')
+
+    cache.set(key, name, CACHE_TIMEOUT)
+    return name
+
+
+def generate_renditions(blob):
+    """Render every size of ``blob``; returns the sizes now available."""
+    if not can_render(blob):
+        return []
+    return [size for size in RENDITION_SIZES if get_rendition(blob, size)]
+
+
+def delete_renditions(blob):
+    storage = blob.file.storage
+    for size in RENDITION_SIZES:
+        name = rendition_name(blob, size)
+        if storage.exists(name):
+            storage.delete(name)
+        cache.delete(_cache_key(blob, size))
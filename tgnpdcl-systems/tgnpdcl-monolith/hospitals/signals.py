@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import blobs, rates, stats
+from .models import Bill, BillDocument, ServiceRate
+
+
+@receiver(post_save, sender=BillDocument)
+def count_blob_reference(sender, instance, created, **kwargs):
+    if created and instance.blob_id:
+        blobs.increment_refs(instance.blob_id)
+
+
+@receiver(post_delete, sender=BillDocument)
+def release_blob_reference(sender, instance, **kwargs):
+    # Cascaded deletes (e.g. a Bill being removed) also arrive here
+    if instance.blob_id:
+        blobs.decrement_refs(instance.blob_id)
+
+
+@receiver(post_delete, sender=Bill)
+def uncount_deleted_bill(sender, instance, **kwargs):
+    # Runs inside the deletion's transaction, including queryset deletes
+    old_state = getattr(instance, '_stats_state', None) or stats.bill_state(instance)
+    stats.record_changes([(old_state, None)])
+
+
+@receiver(post_save, sender=ServiceRate)
+@receiver(post_delete, sender=ServiceRate)
+def invalidate_rate_card(sender, **kwargs):
+    rates.bump_version()
@@ -0,0 +1,180 @@
+"""
+Incrementally maintained claim statistics.
+
+ClaimStatistics keeps one row per (hospital, scheme, status) with the bill
+count and claimed / approved sums. Every change to a bill is described as an
+(old_state, new_state) pair; record_changes() folds any number of pairs into
+per-row deltas and applies them with one UPDATE per touched row, so single
+saves and bulk workflow operations share the same code path. Callers must
+already be inside the transaction that changes the bills.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import Bill, ClaimStatistics
+
+
+# Bill fields that feed the statistics, in bill_state() order
+STATE_FIELDS = ('hospital_id', 'scheme_id', 'status', 'gross_claimed_amount', 'gross_approved_amount')
+
+# Claims that are neither drafts nor decided count towards the pending amount
+NOT_PENDING_STATUSES = ('DRAFT', 'APPROVED', 'REJECTED')
+
+ZERO = Decimal('0')
+
+
+def bill_state(bill):
+    """The tuple of values ClaimStatistics counts for ``bill``."""
+    return tuple(getattr(bill, field) for field in STATE_FIELDS)
+
+
+def saved_state(bill, previous, update_fields):
+    """
+    bill_state() as stored by ``bill.save(update_fields=...)``: the listed
+    fields come from ``bill``, the others keep their ``previous`` values,
+    whatever has been assigned to them in memory.
+    """
+    saved = {Bill._meta.get_field(name).attname for name in update_fields}
+    return tuple(
+        getattr(bill, field) if field in saved else value
+        for field, value in zip(STATE_FIELDS, previous)
+    )
+
+
+def load_bill_state(pk):
+    """bill_state() read from the database (None if the bill does not exist)."""
+    row = Bill.objects.filter(pk=pk).values_list(*STATE_FIELDS).first()
+    return tuple(row) if row else None
+
+
+def record_changes(changes):
+    """
+    Apply ``(old_state, new_state)`` pairs to ClaimStatistics.
+
+    Either side may be None for a created or deleted bill.
+    """
+    deltas = defaultdict(lambda: [0, ZERO, ZERO])
+    for old_state, new_state in changes:
+        if old_state == new_state:
+            continue
+        for state, sign in ((old_state, -1), (new_state, 1)):
+            if state is None:
+                continue
+            hospital_id, scheme_id, status, claimed, approved = state
+            delta = deltas[(hospital_id, scheme_id, status)]
+            delta[0] += sign
+            delta[1] += sign * Decimal(claimed or 0)
+            delta[2] += sign * Decimal(approved or 0)
+
+    for key, (count, claimed, approved) in deltas.items():
+        if count or claimed or approved:
+            _apply_delta(key, count, claimed, approved)
+
+
+def update_bills(bills, **values):
+    """
+    ``bills.update(**values)`` that also feeds ClaimStatistics, for bulk
+    changes that bypass Bill.save(). Must run inside a transaction.
+    """
+    # Locked so nothing changes the bills between this read and the UPDATE
+    before = {row[0]: row[1:] for row in bills.select_for_update(of=('self',)).values_list('pk', *STATE_FIELDS)}
+    if not before:
+        return 0
+    updated = Bill.objects.filter(pk__in=list(before)).update(**values)
+    after = {row[0]: row[1:] for row in Bill.objects.filter(pk__in=list(before)).values_list('pk', *STATE_FIELDS)}
+    record_changes((before[pk], after.get(pk)) for pk in before)
+    return updated
+
+
+def _apply_delta(key, count, claimed, approved):
+    hospital_id, scheme_id, status = key
+    rows = ClaimStatistics.objects.filter(hospital_id=hospital_id, scheme_id=scheme_id, status=status)
+    updated = rows.update(
+        bill_count=F('bill_count') + count,
+        claimed_amount=F('claimed_amount') + claimed,
+        approved_amount=F('approved_amount') + approved,
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            ClaimStatistics.objects.create(
+                hospital_id=hospital_id,
+                scheme_id=scheme_id,
+                status=status,
+                bill_count=count,
+                claimed_amount=claimed,
+                approved_amount=approved,
+            )
+    except IntegrityError:
+        # A concurrent transaction created the row first
+        _apply_delta(key, count, claimed, approved)
+
+
+def rebuild(hospital=None):
+    """Recompute ClaimStatistics from Bill (for all hospitals or one)."""
+    bills = Bill.objects.all()
+    existing = ClaimStatistics.objects.all()
+    if hospital is not None:
+        bills = bills.filter(hospital=hospital)
+        existing = existing.filter(hospital=hospital)
+
+    totals = (
+        bills.order_by()
+        .values('hospital_id', 'scheme_id', 'status')
+        .annotate(
+            bill_count=Count('id'),
+            claimed_amount=Sum('gross_claimed_amount'),
+            approved_amount=Sum('gross_approved_amount'),
+        )
+    )
+
+    with transaction.atomic():
+        existing.delete()
+        rows = ClaimStatistics.objects.bulk_create(
+            [ClaimStatistics(**row) for row in totals],
+            batch_size=500,
+        )
+    return len(rows)
+
+
+def hospital_summary(hospital):
+    """Dashboard totals for one hospital, read from its few statistics rows."""
+    summary = {
+        'bill_count': 0,
+        'claimed_amount': ZERO,
+        'approved_amount': ZERO,
+        'pending_amount': ZERO,
+        'by_status': defaultdict(int),
+        'by_scheme': {},
+    }
+
+    rows = ClaimStatistics.objects.filter(hospital=hospital, bill_count__gt=0).select_related('scheme')
+    for row in rows:
+        summary['bill_count'] += row.bill_count
+        summary['claimed_amount'] += row.claimed_amount
+        summary['approved_amount'] += row.approved_amount
+        if row.status not in NOT_PENDING_STATUSES:
+            summary['pending_amount'] += row.claimed_amount
+        summary['by_status'][row.status] += row.bill_count
+
+        scheme = summary['by_scheme'].setdefault(row.scheme_id, {
+            'scheme': row.scheme,
+            'bill_count': 0,
+            'claimed_amount': ZERO,
+            'approved_amount': ZERO,
+        })
+        scheme['bill_count'] += row.bill_count
+        scheme['claimed_amount'] += row.claimed_amount
+        scheme['approved_amount'] += row.approved_amount
+
+    status_labels = dict(Bill.STATUS_CHOICES)
+    summary['by_status'] = [
+        {'status': status, 'label': status_labels.get(status, status.replace('_', ' ').title()), 'count': count}
+        for status, count in sorted(summary['by_status'].items())
+    ]
+    summary['by_scheme'] = list(summary['by_scheme'].values())
+    return summary
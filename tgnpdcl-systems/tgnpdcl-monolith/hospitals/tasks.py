@@ -0,0 +1,40 @@
+"""
+Background post-processing of submitted claims.
+
+submit_bill queues process_claim_documents once the claim has committed;
+the response does not wait for storage reads. Each distinct blob is
+inspected once (hospitals.processing) and the claim's processing_status
+summarises its documents: DONE when all passed, FAILED if any did not.
+"""
+from celery import shared_task
+from django.db import transaction
+
+from .models import Bill, DocumentBlob
+from .processing import process_blob
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(OSError,),  # Transient storage errors
+    retry_backoff=True,
+    max_retries=5,
+)
+def process_claim_documents(self, bill_id):
+    bills = Bill.objects.filter(pk=bill_id)
+    if not bills.update(processing_status='PROCESSING'):
+        return None  # Bill was deleted before the task ran
+
+    blobs = DocumentBlob.objects.filter(documents__bill_id=bill_id).distinct()
+    for blob in blobs.filter(processing_status='PENDING'):
+        process_blob(blob)
+
+    failed = blobs.filter(processing_status='FAILED').exists()
+    status = 'FAILED' if failed else 'DONE'
+    # queryset.update() leaves ClaimStatistics alone; processing_status is not counted
+    bills.update(processing_status=status)
+    return status
+
+
+def queue_claim_processing(bill):
+    """Queue document processing for ``bill`` once the current transaction commits."""
+    transaction.on_commit(lambda: process_claim_documents.delay(bill.pk))
@@ -0,0 +1,188 @@
+"""
+Upload handler that streams claim documents straight into the file storage.
+
+Django's default handlers spool every uploaded part to memory or a temp file
+and the storage backend then copies it a second time when the model is
+saved. StreamingStorageUploadHandler writes each chunk to its final storage
+name as it arrives off the socket, hashing and counting bytes on the way, so
+a document is read and written exactly once. Size limits are checked per
+chunk, so an oversized claim is refused before it has been fully received.
+Finished files are handed to hospitals.blobs, which drops the copy when the
+same content is already stored.
+
+CSRF middleware would parse the body before the view could install the
+handler, so views using it are csrf_exempt and call
+refuse_cross_site_upload() first and CsrfViewMiddleware.process_view() once
+the handler is in place.
+"""
+import hashlib
+import os
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+from django.template.defaultfilters import filesizeformat
+from django.urls import get_callable
+from django.utils.http import is_same_domain
+
+from .blobs import adopt_upload, blob_upload_name, discard_upload
+
+
+def refuse_cross_site_upload(request):
+    """
+    The CSRF checks that need no request body: the CSRF cookie must be set
+    and an Origin header, when the browser sends one, must name this site or
+    one of CSRF_TRUSTED_ORIGINS. Returns the CSRF failure response, or None.
+
+    Browsers send Origin with every cross-site POST, so a forged submission
+    is refused before any of its documents are written. The token in the
+    body is still checked once the body has been parsed.
+    """
+    if request.method != 'POST':
+        return None
+    reason = None
+    origin = request.META.get('HTTP_ORIGIN')
+    if not request.COOKIES.get(settings.CSRF_COOKIE_NAME):
+        reason = 'CSRF cookie not set.'
+    elif origin is not None and not _origin_allowed(request, origin):
+        reason = f'Origin checking failed - {origin} does not match any trusted origins.'
+    if reason is None:
+        return None
+    return get_callable(settings.CSRF_FAILURE_VIEW)(request, reason=reason)
+
+
+def _origin_allowed(request, origin):
+    if origin == f'{request.scheme}://{request.get_host()}':
+        return True
+    parsed = urlsplit(origin)
+    for trusted in settings.CSRF_TRUSTED_ORIGINS:
+        trusted = urlsplit(trusted)
+        # '*.example.com' trusts every subdomain, as in CsrfViewMiddleware
+        pattern = trusted.netloc[1:] if trusted.netloc.startswith('*.') else trusted.netloc
+        if parsed.scheme == trusted.scheme and is_same_domain(parsed.netloc, pattern):
+            return True
+    return False
+
+
+class StoredUpload(UploadedFile):
+    """
+    An upload that has already been written to storage.
+
+    Link ``blob`` to the document and assign ``stored_name`` (not the object
+    itself) to the model's FileField so the field does not save the content
+    a second time.
+    """
+
+    def __init__(self, name, blob, content_type, charset=None, content_type_extra=None):
+        super().__init__(None, name, content_type, blob.size, charset, content_type_extra)
+        self.blob = blob
+        self.stored_name = blob.file.name
+        self.sha256 = blob.sha256
+
+    def open(self, mode='rb'):
+        raise ValueError('StoredUpload has no local copy; open it through the storage backend.')
+
+
+class StreamingStorageUploadHandler(FileUploadHandler):
+    """
+    Stream every file part of the request into ``field.storage``.
+
+    Limits come from BILL_DOCUMENT_MAX_FILE_SIZE (per file) and
+    BILL_DOCUMENT_MAX_CLAIM_SIZE (all files in the request). Problems are
+    collected in ``errors`` for the view to report. When the submission is
+    then refused the view calls discard_uploads() to delete the blobs this
+    request created; anything it leaves behind is collected by
+    gc_document_blobs once the grace period has passed.
+    """
+
+    def __init__(self, request, field):
+        super().__init__(request)
+        self.field = field
+        self.storage = field.storage
+        self.max_file_size = settings.BILL_DOCUMENT_MAX_FILE_SIZE
+        self.max_claim_size = settings.BILL_DOCUMENT_MAX_CLAIM_SIZE
+        self.errors = []
+        self.claim_bytes = 0
+        self.oversized = False
+        self.created_blobs = {}
+        self._stream = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Content-Length covers the whole body (form fields included), so a
+        # body well past the claim limit is refused at its first file part,
+        # before any file data has been written.
+        self.oversized = bool(content_length and content_length > self.max_claim_size + 1024 * 1024)
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if self.oversized:
+            self.errors.append(
+                f'Total upload size exceeds the {filesizeformat(self.max_claim_size)} limit per claim.'
+            )
+            raise StopUpload(connection_reset=False)
+        self.file_size = 0
+        self.hasher = hashlib.sha256()
+
+        name = self.storage.get_available_name(blob_upload_name(file_name))
+        try:
+            os.makedirs(os.path.dirname(self.storage.path(name)), exist_ok=True)
+        except NotImplementedError:
+            pass  # remote storages have no local directories to create
+        self.stored_name = name
+        self._stream = self.storage.open(name, 'wb')
+
+    def receive_data_chunk(self, raw_data, start):
+        self.file_size += len(raw_data)
+        self.claim_bytes += len(raw_data)
+
+        if self.claim_bytes > self.max_claim_size:
+            self._abort_current()
+            self.errors.append(
+                f'Total upload size exceeds the {filesizeformat(self.max_claim_size)} limit per claim.'
+            )
+            raise StopUpload(connection_reset=False)
+
+        if self.file_size > self.max_file_size:
+            self._abort_current()
+            self.errors.append(
+                f'{self.file_name} is larger than the {filesizeformat(self.max_file_size)} limit per file.'
+            )
+            raise SkipFile()
+
+        self.hasher.update(raw_data)
+        self._stream.write(raw_data)
+        # Nothing left for later handlers: this one is the final destination.
+        return None
+
+    def file_complete(self, file_size):
+        if self._stream is None:
+            return None
+        self._stream.close()
+        self._stream = None
+        blob, created = adopt_upload(self.storage, self.stored_name, self.hasher.hexdigest(), self.file_size)
+        if created or blob.pk in self.created_blobs:
+            # Keep the latest adoption stamp: discard_upload() compares it
+            self.created_blobs[blob.pk] = blob
+        return StoredUpload(
+            name=self.file_name,
+            blob=blob,
+            content_type=self.content_type,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+
+    def upload_interrupted(self):
+        self._abort_current()
+
+    def discard_uploads(self):
+        """Delete the blobs this request created, for a refused submission."""
+        for blob in self.created_blobs.values():
+            discard_upload(blob)
+        self.created_blobs = {}
+
+    def _abort_current(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+            self.storage.delete(self.stored_name)
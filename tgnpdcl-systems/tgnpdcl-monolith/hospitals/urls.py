@@ -6,6 +6,9 @@ app_name = 'hospitals'
 urlpatterns = [
     path('', views.hospital_dashboard, name='dashboard'),
     path('submit-bill/', views.submit_bill, name='submit_bill'),
+    path('documents/blob-exists/', views.document_blob_exists, name='document_blob_exists'),
+    path('documents/<int:document_id>/preview/<slug:size>/', views.document_preview, name='document_preview'),
     path('bills/', views.bill_list, name='bill_list'),
     path('bills/<int:bill_id>/', views.bill_detail, name='bill_detail'),
+    path('bills/<int:bill_id>/line-items/', views.bill_line_items, name='bill_line_items'),
 ]
@@ -1,12 +1,33 @@
+import json
+from datetime import datetime, time, timedelta
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
 from django.forms import modelformset_factory
+from django.http import Http404, JsonResponse
+from django.utils import timezone
+from django.utils.http import urlencode
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
 
 from accounts.decorators import role_required, hospital_required
-from .models import Hospital, Bill, BillDocument, Service, Scheme
-from .forms import BillForm, BillDocumentForm
-from workflow.models import SanctionRequest, WorkflowStep
+from .blobs import find_hospital_blob
+from .duplicates import find_duplicate_claim
+from .models import Hospital, Bill, BillDocument, DocumentBlob, Service, Scheme
+from .forms import BillForm, BillDocumentForm, BillFilterForm, LineItemBatchForm
+from .line_items import LineItemBatchError, add_line_items, parse_csv
+from .pagination import paginate_keyset
+from .renditions import RENDITION_SIZES, get_rendition
+from .stats import hospital_summary
+from .tasks import queue_claim_processing
+from .uploads import StreamingStorageUploadHandler, refuse_cross_site_upload
+from workflow.models import SanctionRequest
+from workflow.steps import get_step_graph
+
+
+BILL_LIST_PAGE_SIZE = 25
 
 
 @login_required
@@ -19,18 +40,37 @@ def hospital_dashboard(request):
         messages.error(request, 'No hospital assigned to your account.')
         return redirect('dashboard')
     
-    bills = Bill.objects.filter(hospital=hospital).order_by('-created_at')[:20]
+    bills = Bill.objects.filter(hospital=hospital).select_related('scheme').order_by('-created_at', '-id')[:20]
     
     return render(request, 'hospitals/dashboard.html', {
         'hospital': hospital,
         'bills': bills,
+        'summary': hospital_summary(hospital),
     })
 
 
+@csrf_exempt
 @login_required
 @hospital_required
 def submit_bill(request):
     """View to handle new bill submission with documents."""
+    # Upload handlers must be swapped in before anything reads request.POST,
+    # which is why CSRF is checked here instead of by middleware: the checks
+    # that need no body first, so a forged post writes nothing to storage,
+    # then the full check, which reads the token from the parsed body.
+    refused = refuse_cross_site_upload(request)
+    if refused is not None:
+        return refused
+    upload_handler = StreamingStorageUploadHandler(request, DocumentBlob._meta.get_field('file'))
+    request.upload_handlers = [upload_handler]
+    refused = CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {})
+    if refused is not None:
+        upload_handler.discard_uploads()
+        return refused
+    return _submit_bill(request, upload_handler)
+
+
+def _submit_bill(request, upload_handler):
     hospital = request.user.profile.hospital
     
     # Create a formset for multiple document uploads
@@ -45,42 +85,74 @@ def submit_bill(request):
     
     if request.method == 'POST':
         bill_form = BillForm(request.POST)
-        formset = DocumentFormSet(request.POST, request.FILES, queryset=BillDocument.objects.none())
+        formset = DocumentFormSet(
+            request.POST,
+            request.FILES,
+            queryset=BillDocument.objects.none(),
+            form_kwargs={'hospital': hospital},
+        )
         
-        if bill_form.is_valid() and formset.is_valid():
-            bill = bill_form.save(commit=False)
-            bill.hospital = hospital
-            bill.created_by = request.user
-            bill.status = 'SUBMITTED'
-            bill.save()
-            
-            # Save documents
-            for form in formset:
-                if form.cleaned_data.get('file'):
-                    doc = form.save(commit=False)
-                    doc.bill = bill
-                    doc.original_filename = doc.file.name
-                    doc.save()
-            
-            # Create SanctionRequest to enter workflow
-            first_step = WorkflowStep.objects.order_by('order').first()
-            SanctionRequest.objects.create(
-                bill=bill,
-                hospital_name=hospital.name,
-                patient_name=bill.patient_name,
-                claimed_amount=bill.gross_total,
-                current_step=first_step,
-                status='PENDING'
-            )
-            
-            messages.success(request, 'Bill submitted successfully and entered the approval workflow!')
-            return redirect('hospitals:dashboard')
+        duplicate = None
+        if not upload_handler.errors and bill_form.is_valid() and formset.is_valid():
+            with transaction.atomic():
+                bill = bill_form.save(commit=False)
+                bill.hospital = hospital
+                bill.created_by = request.user
+                bill.status = 'SUBMITTED'
+
+                # Serialise this hospital's submissions so two copies of one
+                # claim posted together cannot both pass the duplicate check
+                Hospital.objects.select_for_update().filter(pk=hospital.pk).exists()
+                duplicate = find_duplicate_claim(bill)
+
+                if duplicate is None:
+                    bill.save()
+
+                    # Save documents. Content is already in storage as a shared
+                    # blob (see hospitals.blobs), so only its name is assigned.
+                    for form in formset:
+                        blob = form.cleaned_data.get('blob')
+                        if blob:
+                            doc = form.save(commit=False)
+                            doc.bill = bill
+                            doc.blob = blob
+                            doc.file = blob.file.name
+                            doc.file_size = blob.size
+                            doc.sha256 = blob.sha256
+                            doc.save()
+
+                    # Create SanctionRequest to enter workflow
+                    first_step = get_step_graph().first_step()
+                    SanctionRequest.objects.create(
+                        bill=bill,
+                        hospital_name=hospital.name,
+                        patient_name=bill.patient_name,
+                        claimed_amount=bill.gross_claimed_amount,
+                        current_step=first_step,
+                        status='PENDING'
+                    )
+                    queue_claim_processing(bill)
+
+            if duplicate is None:
+                messages.success(request, 'Bill submitted successfully and entered the approval workflow!')
+                return redirect('hospitals:dashboard')
+
+        # Nothing will reference this submission's documents
+        upload_handler.discard_uploads()
+        if duplicate is not None:
+            bill_form.add_error(None, (
+                f'This admission was already claimed on {duplicate.created_at:%d %b %Y} '
+                f'(claim {duplicate.claim_id}, {duplicate.get_status_display()}).'
+            ))
+            messages.error(request, 'Duplicate claim: this admission has already been submitted.')
         else:
+            for error in upload_handler.errors:
+                messages.error(request, error)
             messages.error(request, 'Please correct the errors below.')
     else:
         bill_form = BillForm()
         bill_form.fields['scheme'].queryset = Scheme.objects.filter(is_active=True)
-        formset = DocumentFormSet(queryset=BillDocument.objects.none())
+        formset = DocumentFormSet(queryset=BillDocument.objects.none(), form_kwargs={'hospital': hospital})
         
     return render(request, 'hospitals/submit_bill.html', {
         'bill_form': bill_form,
@@ -89,6 +161,37 @@ def submit_bill(request):
     })
 
 
+@login_required
+@hospital_required
+def document_blob_exists(request):
+    """Tell the submit page whether this hospital has already uploaded a file."""
+    hospital = request.user.profile.hospital
+    sha256 = request.GET.get('sha256', '').lower()
+    return JsonResponse({'exists': bool(sha256) and find_hospital_blob(hospital, sha256) is not None})
+
+
+@login_required
+def document_preview(request, document_id, size):
+    """Redirect to a downscaled rendition of a claim document."""
+    if size not in RENDITION_SIZES:
+        raise Http404('Unknown rendition size.')
+
+    document = get_object_or_404(BillDocument.objects.select_related('blob', 'bill'), id=document_id)
+
+    try:
+        profile = request.user.profile
+    except AttributeError:
+        raise Http404('No such document.')
+    if profile.role == 'HOSPITAL' and profile.hospital_id != document.bill.hospital_id:
+        raise Http404('No such document.')
+
+    name = get_rendition(document.blob, size) if document.blob_id else None
+    if name is None:
+        # Not renderable (or being rendered right now): fall back to the original
+        return redirect(document.file.url)
+    return redirect(document.file.storage.url(name))
+
+
 @login_required
 @hospital_required
 def bill_list(request):
@@ -99,11 +202,41 @@ def bill_list(request):
         messages.error(request, 'No hospital assigned to your account.')
         return redirect('dashboard')
     
-    bills = Bill.objects.filter(hospital=hospital).order_by('-created_at')
+    bills = Bill.objects.filter(hospital=hospital).select_related('scheme')
+    
+    # Filters are expressed as plain (hospital, status, created_at) predicates
+    # so they stay on the composite indexes declared on Bill.Meta.
+    filter_form = BillFilterForm(request.GET or None)
+    filters = {}
+    if filter_form.is_valid():
+        filters = {k: v for k, v in filter_form.cleaned_data.items() if v}
+        if filters.get('status'):
+            bills = bills.filter(status=filters['status'])
+        if filters.get('date_from'):
+            start = datetime.combine(filters['date_from'], time.min)
+            bills = bills.filter(created_at__gte=timezone.make_aware(start))
+        if filters.get('date_to'):
+            end = datetime.combine(filters['date_to'] + timedelta(days=1), time.min)
+            bills = bills.filter(created_at__lt=timezone.make_aware(end))
+    
+    page = paginate_keyset(
+        bills,
+        cursor=request.GET.get('cursor'),
+        page_size=BILL_LIST_PAGE_SIZE,
+    )
+    
+    next_query = None
+    if page.has_more:
+        next_query = urlencode({**filters, 'cursor': page.next_cursor})
     
     return render(request, 'hospitals/bill_list.html', {
         'hospital': hospital,
-        'bills': bills,
+        'bills': page,
+        'filter_form': filter_form,
+        'has_more': page.has_more,
+        'next_query': next_query,
+        'filter_query': urlencode(filters),
+        'is_first_page': not request.GET.get('cursor'),
     })
 
 
@@ -119,9 +252,65 @@ def bill_detail(request, bill_id):
             messages.error(request, 'Access denied.')
             return redirect('dashboard')
     
-    documents = bill.documents.all()
+    documents = bill.documents.select_related('blob')
     
     return render(request, 'hospitals/bill_detail.html', {
         'bill': bill,
         'documents': documents,
+        'line_items': bill.line_items.order_by('id'),
+    })
+
+
+@login_required
+@hospital_required
+def bill_line_items(request, bill_id):
+    """
+    Add a batch of line items to a bill.
+
+    Accepts either the CSV form on the page or a JSON body of the form
+    ``{"items": [{"hospital_service_name": ..., "claimed_rate": ...,
+    "claimed_quantity": ..., "description": ..., "service": ...}, ...]}``.
+    """
+    bill = get_object_or_404(Bill, id=bill_id, hospital=request.user.profile.hospital)
+    wants_json = request.content_type == 'application/json'
+    form = LineItemBatchForm(request.POST or None)
+    
+    if request.method == 'POST':
+        rows = None
+        if wants_json:
+            try:
+                rows = json.loads(request.body).get('items')
+            except (ValueError, AttributeError):
+                pass
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                return JsonResponse({'error': 'Expected {"items": [...]}'}, status=400)
+        elif form.is_valid():
+            rows = parse_csv(form.cleaned_data['items_csv'])
+        
+        if rows is not None:
+            try:
+                items = add_line_items(bill, rows)
+            except LineItemBatchError as exc:
+                if wants_json:
+                    return JsonResponse({'errors': exc.errors}, status=400)
+                for number, fields in sorted(exc.errors.items()):
+                    for field, errors in fields.items():
+                        prefix = f'Row {number}: ' if number else ''
+                        field_label = '' if field == '__all__' else f'{field}: '
+                        for error in errors:
+                            messages.error(request, f"{prefix}{field_label}{error['message']}")
+            else:
+                bill.refresh_from_db(fields=['gross_claimed_amount', 'gross_approved_amount'])
+                if wants_json:
+                    return JsonResponse({
+                        'created': len(items),
+                        'gross_claimed_amount': str(bill.gross_claimed_amount),
+                        'gross_approved_amount': str(bill.gross_approved_amount),
+                    }, status=201)
+                messages.success(request, f'{len(items)} line item(s) added.')
+                return redirect('hospitals:bill_detail', bill_id=bill.id)
+    
+    return render(request, 'hospitals/line_items.html', {
+        'bill': bill,
+        'form': form,
     })
@@ -0,0 +1,12 @@
+"""
+ASGI config for TGNPDCL Monolithic Application.
+
+Needed for the live queue updates (workflow.feed), which hold a connection
+open per browser; e.g.
+    gunicorn project.asgi:application -k uvicorn.workers.UvicornWorker
+"""
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+application = get_asgi_application()
@@ -0,0 +1,17 @@
+"""
+Celery application for background work in the monolith.
+
+Configured from Django settings (CELERY_*). Without CELERY_BROKER_URL tasks
+run eagerly in-process, so local development needs no Redis or worker:
+
+    celery -A project worker -l info
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+app = Celery('tgnpdcl')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
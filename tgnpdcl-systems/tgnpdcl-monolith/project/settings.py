@@ -35,10 +35,37 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.identity.IdentityMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# request.user comes with its profile and hospital, cached briefly when
+# CACHE_IS_SHARED (see accounts/identity.py)
+AUTHENTICATION_BACKENDS = ['accounts.identity.IdentityBackend']
+ACCOUNTS_IDENTITY_CACHE_SECONDS = int(os.environ.get('ACCOUNTS_IDENTITY_CACHE_SECONDS', 60))
+
+# Login attempts: token buckets of (burst, seconds per token) per username and
+# client IP, per username and per client IP, checked before any password
+# hashing (see accounts/throttle.py). The buckets live in the cache: unless
+# CACHE_IS_SHARED, each server process keeps its own and the limits apply
+# per process. Behind a reverse proxy, set how many proxies add
+# X-Forwarded-For entries.
+LOGIN_THROTTLE_ENABLED = os.environ.get('LOGIN_THROTTLE_ENABLED', 'True') == 'True'
+LOGIN_THROTTLE_USERNAME_IP = (
+    int(os.environ.get('LOGIN_THROTTLE_USERNAME_IP_BURST', 5)),
+    float(os.environ.get('LOGIN_THROTTLE_USERNAME_IP_SECONDS', 60)),
+)
+LOGIN_THROTTLE_USERNAME = (
+    int(os.environ.get('LOGIN_THROTTLE_USERNAME_BURST', 30)),
+    float(os.environ.get('LOGIN_THROTTLE_USERNAME_SECONDS', 20)),
+)
+LOGIN_THROTTLE_IP = (
+    int(os.environ.get('LOGIN_THROTTLE_IP_BURST', 30)),
+    float(os.environ.get('LOGIN_THROTTLE_IP_SECONDS', 2)),
+)
+LOGIN_THROTTLE_PROXY_COUNT = int(os.environ.get('LOGIN_THROTTLE_PROXY_COUNT', 0))
+
 ROOT_URLCONF = 'project.urls'
 
 TEMPLATES = [
@@ -58,6 +85,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'project.wsgi.application'
+ASGI_APPLICATION = 'project.asgi.application'
 
 # Database
 # Prefer Oracle if connection details are provided, otherwise fallback to DATABASE_URL or SQLite
@@ -106,6 +134,90 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Claim document upload limits (bytes), enforced while the upload streams in
+BILL_DOCUMENT_MAX_FILE_SIZE = int(os.environ.get('BILL_DOCUMENT_MAX_FILE_SIZE', 20 * 1024 * 1024))
+BILL_DOCUMENT_MAX_CLAIM_SIZE = int(os.environ.get('BILL_DOCUMENT_MAX_CLAIM_SIZE', 200 * 1024 * 1024))
+
+# Cache. Counters and compiled lookups are invalidated through version keys,
+# so multi-process deployments should point REDIS_URL at a shared Redis.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+# Whether every server process sees the same cache: true with REDIS_URL, or
+# set CACHE_IS_SHARED=True for a single-process deployment. Caches that
+# security checks rely on (signed-in identities, login throttling) are only
+# used when it is.
+CACHE_IS_SHARED = os.environ.get('CACHE_IS_SHARED', str(bool(REDIS_URL))) == 'True'
+
+# Sessions: kept in the cache and written to the database this many seconds
+# behind the request (see accounts/sessions.py). All processes must share the
+# cache, so by default only with REDIS_URL.
+if os.environ.get('SESSION_WRITE_BEHIND', str(bool(REDIS_URL))) == 'True':
+    SESSION_ENGINE = 'accounts.sessions'
+SESSION_WRITE_BEHIND_SECONDS = int(os.environ.get('SESSION_WRITE_BEHIND_SECONDS', 30))
+
+# Background tasks (see project/celery.py). With no broker configured tasks
+# run eagerly in the calling process; docker-compose provides Redis.
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'memory://')
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND') or None
+CELERY_TASK_ALWAYS_EAGER = os.environ.get(
+    'CELERY_TASK_ALWAYS_EAGER', str(CELERY_BROKER_URL == 'memory://')
+) == 'True'
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'auto-allocate-sanction-requests': {
+        'task': 'workflow.tasks.auto_allocate_requests',
+        'schedule': int(os.environ.get('WORKFLOW_AUTO_ALLOCATE_SECONDS', 300)),
+    },
+    'refresh-dwell-rollups': {
+        'task': 'workflow.tasks.refresh_dwell_rollups',
+        'schedule': int(os.environ.get('WORKFLOW_DWELL_REFRESH_SECONDS', 900)),
+    },
+    'archive-closed-history': {
+        'task': 'workflow.tasks.archive_closed_history',
+        'schedule': int(os.environ.get('WORKFLOW_ARCHIVE_SECONDS', 24 * 60 * 60)),
+    },
+    'prune-queue-events': {
+        'task': 'workflow.tasks.prune_queue_events',
+        'schedule': 60 * 60,
+    },
+}
+
+# Auto-allocation of sanction requests (see workflow/allocation.py)
+WORKFLOW_ALLOCATION_USERNAME = os.environ.get('WORKFLOW_ALLOCATION_USERNAME', 'auto-allocation')
+WORKFLOW_ALLOCATION_DEFAULT_CAP = int(os.environ['WORKFLOW_ALLOCATION_DEFAULT_CAP']) \
+    if os.environ.get('WORKFLOW_ALLOCATION_DEFAULT_CAP') else None
+
+# Time a claim may sit at one workflow step before it counts as an SLA breach
+# (see workflow/analytics.py)
+WORKFLOW_STEP_SLA_HOURS = int(os.environ.get('WORKFLOW_STEP_SLA_HOURS', 72))
+
+# Closed requests' approval history moves to compressed archive files after
+# this many days (see workflow/archive.py)
+WORKFLOW_ARCHIVE_AFTER_DAYS = int(os.environ.get('WORKFLOW_ARCHIVE_AFTER_DAYS', 365))
+
+# Live queue updates: each server process polls the QueueEvent feed this
+# often and streams new events to its open queue pages; an event id skipped
+# by a transaction that has not committed yet is waited for this many
+# seconds; events are kept this many hours for reconnecting browsers (see
+# workflow/feed.py)
+WORKFLOW_FEED_POLL_SECONDS = float(os.environ.get('WORKFLOW_FEED_POLL_SECONDS', 2))
+WORKFLOW_FEED_GAP_SECONDS = float(os.environ.get('WORKFLOW_FEED_GAP_SECONDS', 60))
+WORKFLOW_FEED_RETENTION_HOURS = int(os.environ.get('WORKFLOW_FEED_RETENTION_HOURS', 24))
+
 # AWS S3 Configuration
 AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import WorkflowStep, SanctionLimit, SanctionRequest, ApprovalLog
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+from .models import WorkflowStep, SanctionLimit, SanctionRequest, ApprovalLog, ArchivedHistory
 
 
 @admin.register(WorkflowStep)
@@ -23,8 +25,46 @@ class ApprovalLogInline(admin.TabularInline):
 
 @admin.register(SanctionRequest)
 class SanctionRequestAdmin(admin.ModelAdmin):
-    list_display = ('id', 'bill', 'hospital_name', 'claimed_amount', 'sanctioned_amount', 'status', 'current_step')
-    list_filter = ('status', 'current_step', 'created_at')
+    list_display = ('id', 'bill', 'hospital_name', 'claimed_amount', 'sanctioned_amount', 'status', 'current_step', 'is_limit_exceeded')
+    list_filter = ('status', 'current_step', 'limit_type', 'is_limit_exceeded', 'created_at')
     search_fields = ('hospital_name', 'patient_name')
     inlines = [ApprovalLogInline]
     raw_id_fields = ('bill',)
+    readonly_fields = ('archived_history_location', 'archived_approval_log')
+    
+    @admin.display(description='Archived history')
+    def archived_history_location(self, obj):
+        archived = ArchivedHistory.objects.filter(request=obj).first()
+        if archived is None:
+            return '-'
+        return f'{archived.approval_logs} log entries in {archived.archive} (archived {archived.archived_at:%Y-%m-%d})'
+    
+    @admin.display(description='Archived approval log')
+    def archived_approval_log(self, obj):
+        # The inline only shows hot rows; archived ones come from the archive file
+        from .archive import request_history
+        if obj.pk is None or not ArchivedHistory.objects.filter(request=obj).exists():
+            return '-'
+        rows = format_html_join('', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>', (
+            (
+                f'{timezone.localtime(log.timestamp):%Y-%m-%d %H:%M}',
+                log.step.name if log.step else '-',
+                log.user.get_full_name() or log.user.username,
+                log.get_action_display(),
+                log.approved_amount_at_stage if log.approved_amount_at_stage is not None else '-',
+                log.comments,
+            )
+            for log in reversed(request_history(obj))
+        ))
+        return format_html(
+            '<table><thead><tr><th>When</th><th>Step</th><th>Officer</th><th>Action</th>'
+            '<th>Amount</th><th>Comments</th></tr></thead><tbody>{}</tbody></table>',
+            rows,
+        )
+
+
+@admin.register(ArchivedHistory)
+class ArchivedHistoryAdmin(admin.ModelAdmin):
+    list_display = ('request', 'archive', 'approval_logs', 'history_entries', 'archived_at')
+    search_fields = ('archive',)
+    raw_id_fields = ('request',)
@@ -0,0 +1,184 @@
+"""
+Least-loaded auto-allocation of unassigned sanction requests.
+
+Every unassigned open request, oldest first, goes to the officer whose role
+matches its step and who currently has the fewest open requests. Officers
+are kept in a min-heap on (open load, user id) per role, so each assignment
+costs O(log officers). An officer whose load reaches their cap
+(UserProfile.max_open_requests, else WORKFLOW_ALLOCATION_DEFAULT_CAP) drops
+out of the heap; requests left over when a role has nobody available stay
+unassigned for the next run.
+
+The plan is applied with one UPDATE and one INSERT ... SELECT of ApprovalLog
+rows, whatever the number of requests.
+"""
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, Count, F, TextField, Value, When
+from django.db.models.functions import Concat
+
+from .bulk import insert_events_from, insert_logs_from
+from .models import SanctionRequest
+from .queue import OPEN_STATUSES, invalidate_counts, open_requests
+from .steps import get_step_graph
+
+
+class AllocationResult:
+    def __init__(self, assignments, skipped, officers):
+        self.assignments = assignments  # [(request_id, step_id, user_id)]
+        self.skipped = skipped  # Requests nobody could take
+        self.officers = officers  # {user_id: username}
+        self.applied = 0
+
+    @property
+    def assigned(self):
+        return len(self.assignments)
+
+    def per_officer(self):
+        totals = defaultdict(int)
+        for _, _, user_id in self.assignments:
+            totals[self.officers[user_id]] += 1
+        return dict(sorted(totals.items()))
+
+
+def allocation_user():
+    """The account auto-allocation is logged under when no one triggered it."""
+    user, created = User.objects.get_or_create(
+        username=settings.WORKFLOW_ALLOCATION_USERNAME,
+        defaults={'is_active': False, 'first_name': 'Auto-allocation'},
+    )
+    if created:
+        user.set_unusable_password()
+        user.save(update_fields=['password'])
+    return user
+
+
+def plan_allocation(steps=None, default_cap=None):
+    """
+    Work out assignments without writing anything.
+
+    Reads the candidate officers, their current open loads and the
+    unassigned requests: three queries in all (steps come from the compiled
+    step graph).
+    """
+    if steps is None:
+        steps = get_step_graph().active_steps
+    step_roles = {step.pk: step.role_name for step in steps}
+    if default_cap is None:
+        default_cap = settings.WORKFLOW_ALLOCATION_DEFAULT_CAP
+
+    officers = {}
+    caps = {}
+    by_role = defaultdict(list)
+    candidates = User.objects.filter(
+        is_active=True,
+        profile__role__in=set(step_roles.values()),
+    ).values_list('pk', 'username', 'profile__role', 'profile__max_open_requests')
+    for user_id, username, role, cap in candidates:
+        officers[user_id] = username
+        caps[user_id] = cap if cap is not None else default_cap
+        by_role[role].append(user_id)
+
+    loads = dict(
+        open_requests()
+        .filter(assigned_to__in=list(officers))
+        .order_by()
+        .values_list('assigned_to')
+        .annotate(total=Count('id'))
+    )
+
+    heaps = {}
+    for role, user_ids in by_role.items():
+        heap = [
+            (loads.get(user_id, 0), user_id)
+            for user_id in user_ids
+            if caps[user_id] is None or loads.get(user_id, 0) < caps[user_id]
+        ]
+        heapq.heapify(heap)
+        heaps[role] = heap
+
+    pending = (
+        open_requests()
+        .filter(assigned_to__isnull=True, current_step__in=list(step_roles))
+        .order_by('created_at', 'id')
+        .values_list('pk', 'current_step_id')
+    )
+
+    assignments = []
+    skipped = 0
+    for request_id, step_id in pending.iterator(chunk_size=2000):
+        heap = heaps.get(step_roles[step_id])
+        if not heap:
+            skipped += 1
+            continue
+        load, user_id = heap[0]
+        assignments.append((request_id, step_id, user_id))
+        load += 1
+        if caps[user_id] is not None and load >= caps[user_id]:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (load, user_id))
+
+    return AllocationResult(assignments, skipped, officers)
+
+
+@transaction.atomic
+def apply_allocation(result, actor):
+    """Write ``result``'s assignments: one UPDATE, one bulk INSERT of logs."""
+    if not result.assignments:
+        return 0
+
+    by_officer = defaultdict(list)
+    for request_id, _, user_id in result.assignments:
+        by_officer[user_id].append(request_id)
+
+    request_ids = [request_id for request_id, _, _ in result.assignments]
+    # Only requests still unassigned and open are taken, so a manual
+    # assignment made since planning is left alone
+    claimed = set(
+        SanctionRequest.objects.select_for_update(skip_locked=True)
+        .filter(pk__in=request_ids, assigned_to__isnull=True, status__in=OPEN_STATUSES)
+        .values_list('pk', flat=True)
+    )
+    if not claimed:
+        return 0
+
+    SanctionRequest.objects.filter(pk__in=claimed).update(
+        assigned_to=Case(*[
+            When(pk__in=taken, then=user_id)
+            for user_id, taken in (
+                (user_id, [pk for pk in ids if pk in claimed]) for user_id, ids in by_officer.items()
+            )
+            if taken
+        ]),
+    )
+
+    # The log rows are built by the database from the updated requests
+    # (INSERT ... SELECT), so 10k assignments cost one statement and no
+    # model instances
+    insert_logs_from(
+        SanctionRequest.objects.filter(pk__in=claimed),
+        actor=actor,
+        action='ALLOCATE',
+        comments=Concat(
+            Value('Task auto-allocated to '),
+            F('assigned_to__username'),
+            Value(' (least open load).'),
+            output_field=TextField(),
+        ),
+    )
+    insert_events_from(SanctionRequest.objects.filter(pk__in=claimed))
+
+    transaction.on_commit(invalidate_counts)
+    return len(claimed)
+
+
+def allocate_unassigned(actor=None, steps=None, default_cap=None):
+    """Plan and apply an allocation round; returns the AllocationResult."""
+    result = plan_allocation(steps=steps, default_cap=default_cap)
+    result.applied = apply_allocation(result, actor or allocation_user())
+    return result
@@ -0,0 +1,177 @@
+"""
+Dwell time per workflow step, from the ApprovalLog trail.
+
+A request's dwell at a step is the time from its arrival there (the previous
+step-changing log entry, or the request's creation for the first one) to the
+action that moved it on or decided it, credited to the officer who took it.
+Allocations and clarification entries leave the request where it is and are
+not samples. dwell_samples() gets that with a LAG() window over each
+request's step-changing entries, so nothing is diffed in Python.
+
+Samples are folded into StepDwellRollup: one row per day and step, overall
+and per officer and per hospital, with percentiles and SLA breaches.
+refresh_rollups() works incrementally from the last log id it processed. A
+new log only changes the figures of the day it falls on, so only days from
+the earliest new log onwards are rebuilt. That range also starts no later
+than the previous high-water log's day, which picks up logs whose
+transaction committed out of id order.
+"""
+import math
+from collections import defaultdict, namedtuple
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Min, Sum
+from django.db.models.functions import Lag
+from django.db.models.expressions import Window
+from django.utils import timezone
+
+from .models import ApprovalLog, DwellRollupState, StepDwellRollup
+
+
+DwellSample = namedtuple('DwellSample', 'day step_id officer_id hospital_id seconds')
+
+# Actions that end a request's stay at a step
+STEP_ACTIONS = ('FORWARD', 'REJECT_RECOMMENDED', 'APPROVE', 'REJECT')
+
+PERCENTILES = (50, 90, 95)
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def sla_seconds():
+    return settings.WORKFLOW_STEP_SLA_HOURS * 3600
+
+
+def dwell_samples(since):
+    """Yield a DwellSample for every step left or decided at or after ``since``."""
+    step_logs = ApprovalLog.objects.filter(action__in=STEP_ACTIONS)
+    touched = step_logs.filter(timestamp__gte=since).values('request_id')
+    rows = (
+        step_logs.filter(request_id__in=touched)
+        .annotate(previous_at=Window(
+            expression=Lag('timestamp'),
+            partition_by=[F('request_id')],
+            order_by=[F('timestamp').asc(), F('pk').asc()],
+        ))
+        .order_by()
+        .values_list('timestamp', 'previous_at', 'request__created_at', 'step_id', 'user_id', 'request__bill__hospital_id')
+    )
+    for logged_at, previous_at, created_at, step_id, officer_id, hospital_id in rows.iterator(chunk_size=2000):
+        # Earlier entries only serve as the LAG() source for later ones
+        if logged_at < since:
+            continue
+        arrived_at = previous_at or created_at
+        yield DwellSample(
+            timezone.localdate(logged_at),
+            step_id,
+            officer_id,
+            hospital_id,
+            max((logged_at - arrived_at).total_seconds(), 0.0),
+        )
+
+
+def percentile(ordered, q):
+    """Linear-interpolated ``q``th percentile of the sorted list ``ordered``."""
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def build_rollups(samples):
+    """Unsaved StepDwellRollup rows for ``samples``."""
+    groups = defaultdict(list)
+    for sample in samples:
+        groups[(sample.day, sample.step_id, 'STEP', None, None)].append(sample.seconds)
+        groups[(sample.day, sample.step_id, 'OFFICER', sample.officer_id, None)].append(sample.seconds)
+        if sample.hospital_id is not None:
+            groups[(sample.day, sample.step_id, 'HOSPITAL', None, sample.hospital_id)].append(sample.seconds)
+
+    limit = sla_seconds()
+    rollups = []
+    for (day, step_id, dimension, officer_id, hospital_id), values in groups.items():
+        values.sort()
+        p50, p90, p95 = (percentile(values, q) for q in PERCENTILES)
+        rollups.append(StepDwellRollup(
+            day=day,
+            step_id=step_id,
+            dimension=dimension,
+            officer_id=officer_id,
+            hospital_id=hospital_id,
+            samples=len(values),
+            total_seconds=sum(values),
+            p50_seconds=p50,
+            p90_seconds=p90,
+            p95_seconds=p95,
+            max_seconds=values[-1],
+            sla_breaches=sum(1 for value in values if value > limit),
+        ))
+    return rollups
+
+
+def refresh_rollups(rebuild=False):
+    """
+    Fold log entries made since the last run into the rollups; with
+    ``rebuild``, recompute everything. Returns the number of days rebuilt.
+    """
+    with transaction.atomic():
+        state = DwellRollupState.objects.select_for_update().first() or DwellRollupState.objects.create()
+        last_log_id = 0 if rebuild else state.last_log_id
+
+        new_logs = ApprovalLog.objects.filter(pk__gt=last_log_id)
+        bounds = new_logs.aggregate(newest=Max('pk'), earliest=Min('timestamp'))
+        if bounds['newest'] is None:
+            return 0
+
+        start_day = timezone.localdate(bounds['earliest'])
+        previous = ApprovalLog.objects.filter(pk=last_log_id).values_list('timestamp', flat=True).first()
+        if previous is not None:
+            start_day = min(start_day, timezone.localdate(previous))
+
+        rollups = build_rollups(dwell_samples(_start_of(start_day)))
+        stale = StepDwellRollup.objects.all() if rebuild else StepDwellRollup.objects.filter(day__gte=start_day)
+        stale.delete()
+        StepDwellRollup.objects.bulk_create(rollups, batch_size=1000)
+
+        state.last_log_id = bounds['newest']
+        state.save()
+    return (timezone.localdate() - start_day).days + 1
+
+
+def period_summary(dimension, date_from, date_to, step=None):
+    """
+    Rollups of ``dimension`` between two dates, summed per step (and per
+    officer or hospital). Percentiles cannot be merged across days, so the
+    worst daily p90 / p95 of the period is given instead.
+    """
+    rows = StepDwellRollup.objects.filter(dimension=dimension, day__gte=date_from, day__lte=date_to)
+    if step is not None:
+        rows = rows.filter(step=step)
+    summary = (
+        rows.values('step_id', 'step__name', 'step__order', 'officer__username', 'hospital__name')
+        .annotate(
+            samples_total=Sum('samples'),
+            seconds_total=Sum('total_seconds'),
+            worst_p90=Max('p90_seconds'),
+            worst_p95=Max('p95_seconds'),
+            longest=Max('max_seconds'),
+            breaches=Sum('sla_breaches'),
+        )
+        .order_by('step__order', '-seconds_total')
+    )
+    for row in summary:
+        row['mean_hours'] = row['seconds_total'] / row['samples_total'] / 3600
+        row['worst_p90_hours'] = row['worst_p90'] / 3600
+        row['worst_p95_hours'] = row['worst_p95'] / 3600
+        row['longest_hours'] = row['longest'] / 3600
+        row['breach_rate'] = 100.0 * row['breaches'] / row['samples_total']
+        yield row
+
+
+def default_period(days=30):
+    date_to = timezone.localdate()
+    return date_to - timedelta(days=days - 1), date_to
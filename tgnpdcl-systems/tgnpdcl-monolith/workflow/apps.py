@@ -5,3 +5,6 @@ class WorkflowConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'workflow'
     verbose_name = 'Workflow'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,222 @@
+"""
+Hot / cold archival of closed requests' history.
+
+ApprovalLog and hospitals.WorkflowHistory rows of requests closed longer
+than WORKFLOW_ARCHIVE_AFTER_DAYS are moved, a batch at a time, into
+compressed JSONL files in the default storage:
+
+    archive/workflow_history/<yyyy>/<mm>/<uuid>.jsonl.gz
+
+Each request is written as its own gzip member (one JSON line holding its
+approval log and its bill's workflow history) and the members are
+concatenated, which is still a valid .jsonl.gz file. ArchivedHistory
+records each request's member offset and length, so loading one request's
+history reads and decompresses only that member. The loaded history is
+cached.
+
+request_history() and bill_history() are what pages use: they return the
+hot rows, or unsaved ApprovalLog / WorkflowHistory instances rebuilt from
+the archive. Only logs already
+folded into the dwell rollups (workflow.analytics) are archived; rebuilding
+the rollups from scratch afterwards covers hot logs only.
+"""
+import gzip
+import io
+import json
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from hospitals.models import WorkflowHistory
+from .models import ApprovalLog, ArchivedHistory, DwellRollupState, SanctionRequest
+from .steps import get_step_graph
+from .transitions import CLOSED_STATUSES
+
+
+ARCHIVE_DIRECTORY = 'archive/workflow_history'
+CACHE_TIMEOUT = 60 * 60
+
+LOG_FIELDS = (
+    'id', 'request_id', 'step_id', 'user_id', 'user__username', 'user__first_name', 'user__last_name',
+    'action', 'comments', 'approved_amount_at_stage', 'timestamp',
+)
+HISTORY_FIELDS = ('id', 'bill_id', 'action_by_id', 'action_by__username', 'role', 'action', 'remarks', 'action_at')
+
+
+def archivable_requests(older_than_days=None):
+    """Closed requests old enough to archive whose logs the rollups have seen."""
+    if older_than_days is None:
+        older_than_days = settings.WORKFLOW_ARCHIVE_AFTER_DAYS
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    rolled_up = DwellRollupState.objects.values_list('last_log_id', flat=True).first() or 0
+    return (
+        SanctionRequest.objects.filter(
+            status__in=CLOSED_STATUSES,
+            updated_at__lt=cutoff,
+            archived_history__isnull=True,
+        )
+        .exclude(logs__pk__gt=rolled_up)
+    )
+
+
+def archive_batch(request_ids):
+    """
+    Move the history of ``request_ids`` into one archive file.
+
+    Returns the number of approval log entries archived.
+    """
+    from accounts.dashboard import invalidate_recent_actions
+
+    with transaction.atomic():
+        requests = list(
+            SanctionRequest.objects.select_for_update(of=('self',))
+            .filter(pk__in=request_ids, status__in=CLOSED_STATUSES, archived_history__isnull=True)
+            .order_by('pk')
+            .values_list('pk', 'bill_id')
+        )
+        if not requests:
+            return 0
+        ids = [pk for pk, _ in requests]
+        bill_ids = [bill_id for _, bill_id in requests]
+
+        logs = defaultdict(list)
+        for row in ApprovalLog.objects.filter(request_id__in=ids).order_by('timestamp', 'pk').values(*LOG_FIELDS):
+            logs[row['request_id']].append(row)
+        history = defaultdict(list)
+        for row in WorkflowHistory.objects.filter(bill_id__in=bill_ids).order_by('action_at', 'pk').values(*HISTORY_FIELDS):
+            history[row['bill_id']].append(row)
+
+        buffer = io.BytesIO()
+        index = []
+        for pk, bill_id in requests:
+            record = {
+                'request_id': pk,
+                'bill_id': bill_id,
+                'approval_logs': logs[pk],
+                'workflow_history': history[bill_id],
+            }
+            member = gzip.compress((json.dumps(record, cls=DjangoJSONEncoder) + '\n').encode())
+            index.append(ArchivedHistory(
+                request_id=pk,
+                offset=buffer.tell(),
+                length=len(member),
+                approval_logs=len(logs[pk]),
+                history_entries=len(history[bill_id]),
+            ))
+            buffer.write(member)
+
+        name = f'{ARCHIVE_DIRECTORY}/{timezone.now():%Y/%m}/{uuid.uuid4().hex}.jsonl.gz'
+        name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        try:
+            for entry in index:
+                entry.archive = name
+            ArchivedHistory.objects.bulk_create(index)
+            ApprovalLog.objects.filter(request_id__in=ids).delete()
+            WorkflowHistory.objects.filter(bill_id__in=bill_ids).delete()
+        except Exception:
+            default_storage.delete(name)
+            raise
+        officers = {row['user_id'] for entries in logs.values() for row in entries}
+        transaction.on_commit(lambda: invalidate_recent_actions(*officers))
+    return sum(entry.approval_logs for entry in index)
+
+
+def archive_closed_history(older_than_days=None, batch_size=500, limit=None):
+    """
+    Archive every eligible request, ``batch_size`` per file and transaction.
+    Returns ``(requests, approval_logs)`` archived.
+    """
+    candidates = archivable_requests(older_than_days).order_by('pk').values_list('pk', flat=True)
+    archived = entries = 0
+    last_pk = 0
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        batch = list(candidates.filter(pk__gt=last_pk)[:size])
+        if not batch:
+            break
+        last_pk = batch[-1]
+        entries += archive_batch(batch)
+        archived += len(batch)
+    return archived, entries
+
+
+def _cache_key(request_id):
+    return f'workflow:archived-history:{request_id}'
+
+
+def load_archived(archived):
+    """The stored record (a dict) for one ArchivedHistory entry."""
+    key = _cache_key(archived.request_id)
+    record = cache.get(key)
+    if record is None:
+        with default_storage.open(archived.archive, 'rb') as stored:
+            stored.seek(archived.offset)
+            member = stored.read(archived.length)
+        record = json.loads(gzip.decompress(member))
+        cache.set(key, record, CACHE_TIMEOUT)
+    return record
+
+
+def request_history(sanction_request):
+    """
+    ``sanction_request``'s approval log, newest first, whether it is still
+    in the hot table or has been archived.
+    """
+    archived = ArchivedHistory.objects.filter(request=sanction_request).first()
+    if archived is None:
+        return sanction_request.logs.select_related('user')
+
+    graph = get_step_graph()
+    entries = []
+    for row in reversed(load_archived(archived)['approval_logs']):
+        amount = row['approved_amount_at_stage']
+        entries.append(ApprovalLog(
+            id=row['id'],
+            request=sanction_request,
+            step=graph.step(row['step_id']),
+            user=User(
+                id=row['user_id'],
+                username=row['user__username'],
+                first_name=row['user__first_name'],
+                last_name=row['user__last_name'],
+            ),
+            action=row['action'],
+            comments=row['comments'],
+            approved_amount_at_stage=Decimal(amount) if amount is not None else None,
+            timestamp=parse_datetime(row['timestamp']),
+        ))
+    return entries
+
+
+def bill_history(bill):
+    """
+    ``bill``'s workflow history, oldest first, whether it is still in the
+    hot table or has been archived with its sanction request.
+    """
+    archived = ArchivedHistory.objects.filter(request__bill=bill).first()
+    if archived is None:
+        return bill.workflow_history.select_related('action_by').order_by('action_at', 'pk')
+
+    entries = []
+    for row in load_archived(archived)['workflow_history']:
+        entries.append(WorkflowHistory(
+            id=row['id'],
+            bill=bill,
+            action_by=User(id=row['action_by_id'], username=row['action_by__username']),
+            role=row['role'],
+            action=row['action'],
+            remarks=row['remarks'],
+            action_at=parse_datetime(row['action_at']),
+        ))
+    return entries
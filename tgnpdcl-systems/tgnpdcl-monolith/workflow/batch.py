@@ -0,0 +1,184 @@
+"""
+Batch processing of sanction requests.
+
+process_batch() applies one action (forward, approve, reject) to many
+requests in one transaction. Each request is checked on its own and the
+caller gets a per-item result; the accepted ones are then written with a
+fixed number of statements however many there are: one INSERT ... SELECT
+of ApprovalLog rows, one UPDATE of the requests and one UPDATE of their
+bills.
+"""
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+
+from hospitals.models import Bill
+from hospitals.stats import update_bills
+from .bulk import insert_events_from, insert_logs_from
+from .limits import reevaluate_limits
+from .models import SanctionRequest
+from .queue import OPEN_STATUSES, invalidate_counts
+from .steps import get_step_graph
+
+
+BATCH_ACTIONS = ('FORWARD', 'REJECT_RECOMMENDED', 'APPROVE', 'REJECT')
+
+# Most requests one batch may touch
+MAX_BATCH_SIZE = 200
+
+# Bill status a request's bill moves to for each action
+BILL_STATUS = {
+    'FORWARD': 'IN_PROCESS',
+    'REJECT_RECOMMENDED': 'IN_PROCESS',
+    'APPROVE': 'APPROVED',
+    'REJECT': 'REJECTED',
+}
+
+
+class BatchResult:
+    def __init__(self):
+        self.items = {}
+
+    def ok(self, request_id, status, **extra):
+        self.items[request_id] = {'id': request_id, 'ok': True, 'status': status, **extra}
+
+    def error(self, request_id, message):
+        self.items[request_id] = {'id': request_id, 'ok': False, 'error': message}
+
+    @property
+    def succeeded(self):
+        return [item for item in self.items.values() if item['ok']]
+
+    @property
+    def failed(self):
+        return [item for item in self.items.values() if not item['ok']]
+
+    def as_list(self):
+        return list(self.items.values())
+
+
+# Amounts are stored in SanctionRequest.sanctioned_amount
+AMOUNT_FIELD = SanctionRequest._meta.get_field('sanctioned_amount')
+MAX_AMOUNT = Decimal(10) ** (AMOUNT_FIELD.max_digits - AMOUNT_FIELD.decimal_places) - Decimal('0.01')
+
+
+def parse_amount(value):
+    """An amount entered by an officer, or None; ValueError if it cannot be stored."""
+    if value in (None, ''):
+        return None
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount: {value}')
+    if not amount.is_finite():
+        raise ValueError(f'Invalid amount: {value}')
+    if amount < 0:
+        raise ValueError('Amount cannot be negative.')
+    if amount > MAX_AMOUNT:
+        raise ValueError(f'Amount cannot exceed {MAX_AMOUNT}.')
+    try:
+        return amount.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount: {value}')
+
+
+def process_batch(user, action, request_ids, comments, amounts=None):
+    """
+    Apply ``action`` to ``request_ids`` on behalf of ``user``.
+
+    ``amounts`` optionally maps request id to the sanctioned amount for
+    APPROVE (default: the claimed amount). Requests the officer may not act
+    on are reported and left untouched; the rest are processed together.
+    """
+    result = BatchResult()
+    amounts = amounts or {}
+    if action not in BATCH_ACTIONS:
+        raise ValueError(f'Unsupported batch action: {action}')
+
+    request_ids = list(dict.fromkeys(request_ids))[:MAX_BATCH_SIZE]
+    role = user.profile.role
+    graph = get_step_graph()
+
+    with transaction.atomic():
+        rows = {
+            row['pk']: row
+            for row in SanctionRequest.objects.select_for_update()
+            .filter(pk__in=request_ids)
+            .values('pk', 'status', 'current_step_id', 'assigned_to_id', 'bill_id', 'claimed_amount')
+        }
+
+        accepted = []
+        for request_id in request_ids:
+            row = rows.get(request_id)
+            step = graph.step(row['current_step_id']) if row else None
+            if row is None:
+                result.error(request_id, 'Request not found.')
+            elif row['status'] not in OPEN_STATUSES:
+                result.error(request_id, f"Request is {row['status'].lower().replace('_', ' ')}.")
+            elif step is None or step.role_name != role:
+                result.error(request_id, 'Request is not at a step for your role.')
+            elif row['assigned_to_id'] not in (None, user.pk):
+                result.error(request_id, 'Request is assigned to another officer.')
+            elif action == 'APPROVE' and not step.can_approve_final:
+                result.error(request_id, f'{step.name} cannot give final approval.')
+            elif action == 'REJECT' and not step.can_reject:
+                result.error(request_id, f'{step.name} cannot reject.')
+            elif action in ('FORWARD', 'REJECT_RECOMMENDED') and graph.next_step(step.pk) is None:
+                result.error(request_id, 'No next step available. Use "Approve Final" or "Reject".')
+            else:
+                accepted.append(row)
+
+        if accepted:
+            _apply(user, action, accepted, comments, amounts, graph, result)
+
+    return result
+
+
+def _apply(user, action, rows, comments, amounts, graph, result):
+    ids = [row['pk'] for row in rows]
+    requests = SanctionRequest.objects.filter(pk__in=ids)
+    now = timezone.now()
+
+    sanctioned = None
+    if action == 'APPROVE':
+        by_amount = defaultdict(list)
+        for row in rows:
+            amount = amounts.get(row['pk'])
+            by_amount[amount if amount is not None else row['claimed_amount']].append(row['pk'])
+        sanctioned = Case(
+            *[When(pk__in=pks, then=amount) for amount, pks in by_amount.items()],
+            default=F('claimed_amount'),
+        )
+
+    # Logs first: they record the step the action was taken at
+    insert_logs_from(requests, actor=user, action=action, comments=comments, approved_amount=sanctioned)
+
+    if action in ('FORWARD', 'REJECT_RECOMMENDED'):
+        targets = defaultdict(list)
+        for row in rows:
+            targets[graph.next_step(row['current_step_id']).pk].append(row['pk'])
+        requests.update(
+            current_step=Case(*[When(pk__in=pks, then=step_id) for step_id, pks in targets.items()]),
+            status='IN_PROGRESS',
+            assigned_to=None,  # Clear for re-allocation at next stage
+            updated_at=now,
+        )
+        for row in rows:
+            result.ok(row['pk'], 'IN_PROGRESS', step=graph.next_step(row['current_step_id']).name)
+    elif action == 'APPROVE':
+        requests.update(status='APPROVED', sanctioned_amount=sanctioned, updated_at=now)
+        reevaluate_limits(requests)
+        for row in rows:
+            amount = amounts.get(row['pk'])
+            result.ok(row['pk'], 'APPROVED', sanctioned_amount=str(amount if amount is not None else row['claimed_amount']))
+    else:
+        requests.update(status='REJECTED', updated_at=now)
+        for row in rows:
+            result.ok(row['pk'], 'REJECTED')
+
+    insert_events_from(requests)
+    update_bills(Bill.objects.filter(pk__in=[row['bill_id'] for row in rows]), status=BILL_STATUS[action])
+    transaction.on_commit(invalidate_counts)
@@ -0,0 +1,72 @@
+"""
+Set-based helpers for workflow operations that touch many requests at once.
+"""
+from django.db import connections, transaction
+from django.db.models import DateTimeField, DecimalField, Expression, F, IntegerField, TextField, Value
+from django.utils import timezone
+
+from .models import ApprovalLog, QueueEvent
+
+
+def _insert_select(model, fields, rows):
+    """INSERT INTO ``model`` (``fields``) the rows of the values() queryset ``rows``."""
+    connection = connections[model.objects.db]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    select_sql, params = rows.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {quote(model._meta.db_table)} ({columns}) {select_sql}', params)
+        return cursor.rowcount
+
+
+def insert_logs_from(requests, actor, action, comments, approved_amount=None):
+    """
+    Add one ApprovalLog per request in ``requests`` (at its current step)
+    with a single INSERT ... SELECT. ``comments`` and ``approved_amount``
+    may be expressions evaluated per request.
+    """
+    from accounts.dashboard import invalidate_recent_actions
+    if not isinstance(comments, Expression):
+        comments = Value(comments, output_field=TextField())
+    if not isinstance(approved_amount, Expression):
+        approved_amount = Value(approved_amount, output_field=DecimalField(max_digits=12, decimal_places=2))
+
+    rows = requests.order_by().annotate(
+        log_request=F('pk'),
+        log_step=F('current_step'),
+        log_user=Value(actor.pk, output_field=IntegerField()),
+        log_action=Value(action, output_field=TextField()),
+        log_comments=comments,
+        log_amount=approved_amount,
+        log_timestamp=Value(timezone.now(), output_field=DateTimeField()),
+    ).values('log_request', 'log_step', 'log_user', 'log_action', 'log_comments', 'log_amount', 'log_timestamp')
+
+    inserted = _insert_select(
+        ApprovalLog,
+        ('request', 'step', 'user', 'action', 'comments', 'approved_amount_at_stage', 'timestamp'),
+        rows,
+    )
+    # No post_save signals for these rows: drop the actor's dashboard fragment here
+    transaction.on_commit(lambda: invalidate_recent_actions(actor.pk))
+    return inserted
+
+
+def insert_events_from(requests):
+    """
+    Add one QueueEvent per request in ``requests`` recording its current
+    step, assignee and status, with a single INSERT ... SELECT. Call it after
+    any queryset.update() that changes those fields.
+    """
+    rows = requests.order_by().annotate(
+        event_request=F('pk'),
+        event_step=F('current_step'),
+        event_assignee=F('assigned_to'),
+        event_status=F('status'),
+        event_created=Value(timezone.now(), output_field=DateTimeField()),
+    ).values('event_request', 'event_step', 'event_assignee', 'event_status', 'event_created')
+
+    return _insert_select(
+        QueueEvent,
+        ('request', 'step', 'assigned_to', 'status', 'created_at'),
+        rows,
+    )
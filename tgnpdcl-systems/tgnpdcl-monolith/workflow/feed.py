@@ -0,0 +1,292 @@
+"""
+Live work-queue updates over server-sent events.
+
+Every change to a request's step, assignee or status adds a QueueEvent row
+with an ever increasing id. SanctionRequest.save() writes it. Code that
+changes those fields with queryset.update() must call
+bulk.insert_events_from() itself.
+
+Each server process runs one FeedHub per event loop. The hub polls the
+table every WORKFLOW_FEED_POLL_SECONDS while at least one browser is
+connected, and fans the new events out to every open stream. The database
+therefore sees one cheap ``id > last`` query per process, however many
+queue pages are open.
+
+Ids are handed out when a row is inserted but become visible when its
+transaction commits, so event N+1 can show up before event N. The hub notes
+every id it skips as missing and keeps asking for it for
+WORKFLOW_FEED_GAP_SECONDS (after that it was rolled back, or is given up
+on). Streams therefore tell the browser only the settled position, below
+which nothing can still arrive, and drop events they have already sent.
+
+A stream sends only the events that matter to its officer: requests that
+are (or were) in their queue, or that the stream has shown before. Each
+event says whether the request is now in that officer's queue. A stream
+ends after STREAM_SECONDS; the browser reconnects with Last-Event-ID, and
+anything missed in between is replayed from the table. Streams need an
+ASGI server (project/asgi.py). Under WSGI each stream would hold a worker
+thread for STREAM_SECONDS with an event loop and poller of its own, so the
+view answers 204 instead and the page simply goes without live updates.
+"""
+import asyncio
+import json
+import weakref
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import QueueEvent, SanctionRequest
+from .queue import OPEN_STATUSES
+
+
+# SanctionRequest fields whose changes are published
+FEED_FIELDS = ('current_step_id', 'assigned_to_id', 'status')
+
+FETCH_SIZE = 500
+STREAM_SECONDS = 55
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+# Events buffered per stream before it is told to reload instead
+STREAM_BUFFER = 1000
+
+EVENT_FIELDS = (
+    'id', 'request_id', 'step_id', 'assigned_to_id', 'status',
+    'request__hospital_name', 'request__patient_name', 'request__claimed_amount', 'request__created_at',
+)
+STATUS_LABELS = dict(SanctionRequest.STATUS_CHOICES)
+
+
+def feed_state(sanction_request):
+    return tuple(getattr(sanction_request, field) for field in FEED_FIELDS)
+
+
+def fetch_events(after_id, limit=FETCH_SIZE, missing=()):
+    """
+    Up to ``limit`` events after ``after_id``, and any of the ``missing``
+    ids that have turned up, oldest first, as plain dicts.
+    """
+    condition = Q(pk__gt=after_id)
+    for first, last in _id_ranges(missing):
+        condition |= Q(pk__range=(first, last))
+    rows = QueueEvent.objects.filter(condition).order_by('pk').values_list(*EVENT_FIELDS)[:limit]
+    return [
+        {
+            'id': pk,
+            'request': request_id,
+            'step': step_id,
+            'assigned_to': assigned_to_id,
+            'status': status,
+            'status_display': STATUS_LABELS.get(status, status),
+            'hospital_name': hospital_name,
+            'patient_name': patient_name,
+            'claimed_amount': str(claimed_amount),
+            'created_at': timezone.localtime(created_at).strftime('%b %d, %Y'),
+        }
+        for pk, request_id, step_id, assigned_to_id, status, hospital_name, patient_name, claimed_amount, created_at in rows
+    ]
+
+
+def _id_ranges(ids):
+    """Collapse ``ids`` into sorted ``(first, last)`` runs of consecutive ids."""
+    ranges = []
+    for pk in sorted(ids):
+        if ranges and ranges[-1][1] == pk - 1:
+            ranges[-1][1] = pk
+        else:
+            ranges.append([pk, pk])
+    return ranges
+
+
+def latest_event_id():
+    return QueueEvent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def prune_events(hours=None):
+    """Delete events older than ``hours`` (WORKFLOW_FEED_RETENTION_HOURS)."""
+    if hours is None:
+        hours = settings.WORKFLOW_FEED_RETENTION_HOURS
+    deleted, _ = QueueEvent.objects.filter(created_at__lt=timezone.now() - timedelta(hours=hours)).delete()
+    return deleted
+
+
+class FeedHub:
+    """Polls the QueueEvent table for one event loop and fans events out."""
+
+    def __init__(self):
+        self.last_id = None
+        # Skipped ids that may still be committed -> loop time first missed
+        self.missing = {}
+        self._subscribers = set()
+        self._task = None
+
+    @property
+    def settled_id(self):
+        """Every event up to this id has been published or given up on."""
+        return min(self.missing) - 1 if self.missing else self.last_id
+
+    async def subscribe(self):
+        queue = asyncio.Queue(maxsize=STREAM_BUFFER)
+        queue.overflowed = False
+        if self._task is None or self._task.done():
+            # Not polling: start from the current end of the feed
+            latest = await sync_to_async(latest_event_id)()
+            if self._task is None or self._task.done():
+                self.last_id = latest
+                self.missing = {}
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def _publish(self, events, settled_id):
+        # Each item carries the settled position once it has been taken:
+        # queues are FIFO, so by then everything up to it has been seen
+        items = [(event, settled_id) for event in events] or [(None, settled_id)]
+        for queue in list(self._subscribers):
+            for item in items:
+                try:
+                    queue.put_nowait(item)
+                except asyncio.QueueFull:
+                    queue.overflowed = True
+                    self.unsubscribe(queue)
+                    break
+
+    def _track(self, events, now):
+        """Note the ids ``events`` skip over and the late ones they bring."""
+        for event in events:
+            pk = event['id']
+            if pk > self.last_id:
+                self.missing.update(dict.fromkeys(range(self.last_id + 1, pk), now))
+                self.last_id = pk
+            else:
+                self.missing.pop(pk, None)
+        cutoff = now - settings.WORKFLOW_FEED_GAP_SECONDS
+        self.missing = {pk: since for pk, since in self.missing.items() if since > cutoff}
+
+    async def _poll(self):
+        loop = asyncio.get_running_loop()
+        while self._subscribers:
+            settled_id = self.settled_id
+            events = await sync_to_async(fetch_events)(self.last_id, missing=list(self.missing))
+            self._track(events, loop.time())
+            if events or self.settled_id != settled_id:
+                self._publish(events, self.settled_id)
+            if len(events) < FETCH_SIZE:
+                await asyncio.sleep(settings.WORKFLOW_FEED_POLL_SECONDS)
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    """The FeedHub of the running event loop."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = FeedHub()
+    return hub
+
+
+class QueueStream:
+    """One officer's view of the feed."""
+
+    def __init__(self, user_id, step_ids, watched=()):
+        self.user_id = user_id
+        self.step_ids = frozenset(step_ids)
+        self.watched = set(watched)
+
+    def in_queue(self, event):
+        return (
+            event['step'] in self.step_ids
+            and event['status'] in OPEN_STATUSES
+            and event['assigned_to'] in (None, self.user_id)
+        )
+
+    def message(self, event, position):
+        """
+        The SSE message for ``event``, or None if this officer does not care.
+        Its id is the stream's settled ``position``, not the event's own id,
+        so that a reconnect still gets events that were committed late.
+        """
+        in_queue = self.in_queue(event)
+        if not in_queue and event['request'] not in self.watched:
+            return None
+        self.watched.add(event['request'])
+        data = json.dumps({**event, 'in_queue': in_queue})
+        return f'id: {position}\ndata: {data}\n\n'
+
+    async def events(self, last_event_id=None):
+        """The SSE body: missed events since ``last_event_id``, then live ones."""
+        hub = get_hub()
+        queue = await hub.subscribe()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STREAM_SECONDS
+        try:
+            # Position in the feed: every event up to here has been sent or
+            # did not concern this officer. Events above it may have been
+            # sent already too; their ids are kept in ``sent``.
+            position = hub.settled_id if last_event_id is None else last_event_id
+            sent = set()
+            yield f'retry: {RETRY_MILLISECONDS}\nid: {position}\n\n'
+            if last_event_id is not None and hub.last_id - last_event_id > STREAM_BUFFER:
+                queue.overflowed = True
+            elif last_event_id is not None:
+                # Replay what this page missed up to where the hub had got;
+                # newer events, and late ones the hub is still waiting for,
+                # arrive through the queue.
+                cursor, target, settled_id = last_event_id, hub.last_id, hub.settled_id
+                while cursor < target:
+                    missed = await sync_to_async(fetch_events)(cursor)
+                    if not missed:
+                        break
+                    for event in missed:
+                        if event['id'] > target:
+                            break
+                        sent.add(event['id'])
+                        message = self.message(event, position)
+                        if message:
+                            yield message
+                        cursor = event['id']
+                    if missed[-1]['id'] > target:
+                        break
+                # Everything the hub had settled is in the table, so it has
+                # been replayed
+                if settled_id > position:
+                    position = settled_id
+                    sent = {pk for pk in sent if pk > position}
+
+            while not queue.overflowed:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    event, settled_id = await asyncio.wait_for(
+                        queue.get(), timeout=min(HEARTBEAT_SECONDS, remaining),
+                    )
+                except asyncio.TimeoutError:
+                    if remaining > HEARTBEAT_SECONDS:
+                        yield ': keep-alive\n\n'
+                    continue
+                fresh = event is not None and event['id'] not in sent
+                if settled_id > position:
+                    position = settled_id
+                    sent = {pk for pk in sent if pk > position}
+                if not fresh:
+                    continue
+                if event['id'] > position:
+                    sent.add(event['id'])
+                message = self.message(event, position)
+                if message:
+                    yield message
+            if queue.overflowed:
+                yield 'event: reload\ndata: {}\n\n'
+            else:
+                yield f'id: {position}\nevent: end\ndata: {position}\n\n'
+        finally:
+            hub.unsubscribe(queue)
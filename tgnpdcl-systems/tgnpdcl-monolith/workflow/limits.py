@@ -0,0 +1,120 @@
+"""
+Sanction limit evaluation.
+
+A request exceeds its limit when the amount being sanctioned (the
+sanctioned amount once an officer has set one, else the claimed amount) is
+above the SanctionLimit for its bill's employee type and its limit type.
+Requests with no matching limit never exceed one.
+
+The limits are compiled once per process into an immutable LimitTable and
+kept until the SANCTION_LIMITS version in ConfigVersion changes (see
+workflow.versions). Saving or deleting a SanctionLimit bumps that version in
+the same transaction and queues reevaluate_open_requests() after commit
+(see workflow.signals). That re-flags every open
+request with a couple of set-based UPDATEs per limit, not a loop over rows.
+SanctionRequest.save() evaluates its own flag whenever an amount or the
+limit type changes. Code that changes amounts with queryset.update() must
+call reevaluate_limits() itself.
+"""
+import threading
+from types import MappingProxyType
+
+from django.db.models import Q
+
+from .models import SanctionLimit, SanctionRequest
+from .transitions import CLOSED_STATUSES
+from .versions import SANCTION_LIMITS, bump_version, current_version
+
+# SanctionRequest fields the flag depends on
+LIMIT_FIELDS = ('claimed_amount', 'sanctioned_amount', 'limit_type')
+
+
+class LimitTable:
+    """Read-only (category, limit_type) -> amount lookup."""
+
+    __slots__ = ('version', '_limits')
+
+    def __init__(self, version, rows):
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, '_limits', MappingProxyType({
+            (category, limit_type): amount for category, limit_type, amount in rows
+        }))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('LimitTable is immutable')
+
+    def __len__(self):
+        return len(self._limits)
+
+    def items(self):
+        return self._limits.items()
+
+    def limit_for(self, category, limit_type):
+        return self._limits.get((category, limit_type))
+
+
+_compiled = None
+_compile_lock = threading.Lock()
+
+
+def invalidate_limits():
+    bump_version(SANCTION_LIMITS)
+
+
+def get_limit_table():
+    """The compiled limits, rebuilt only if they changed since last time."""
+    global _compiled
+    version = current_version(SANCTION_LIMITS)
+    table = _compiled
+    if table is not None and table.version == version:
+        return table
+
+    with _compile_lock:
+        table = _compiled
+        if table is None or table.version != version:
+            rows = SanctionLimit.objects.values_list('category', 'limit_type', 'amount')
+            table = _compiled = LimitTable(version, rows)
+    return table
+
+
+def limit_exceeded(sanction_request):
+    """Whether ``sanction_request``'s amount is over its limit."""
+    limit = get_limit_table().limit_for(sanction_request.bill.employee_type, sanction_request.limit_type)
+    if limit is None:
+        return False
+    amount = sanction_request.sanctioned_amount
+    if amount is None:
+        amount = sanction_request.claimed_amount
+    return amount > limit
+
+
+def _over(limit):
+    return (
+        Q(sanctioned_amount__isnull=False, sanctioned_amount__gt=limit)
+        | Q(sanctioned_amount__isnull=True, claimed_amount__gt=limit)
+    )
+
+
+def reevaluate_limits(requests):
+    """
+    Bring ``is_limit_exceeded`` up to date on the ``requests`` queryset.
+
+    Two UPDATEs per configured limit (set / clear, touching only rows whose
+    flag changes) and one to clear requests no limit applies to. Returns the
+    number of requests whose flag changed.
+    """
+    table = get_limit_table()
+    changed = 0
+    covered = Q(pk__in=[])
+    for (category, limit_type), limit in table.items():
+        applies = Q(bill__employee_type=category, limit_type=limit_type)
+        covered |= applies
+        changed += requests.filter(applies, _over(limit), is_limit_exceeded=False).update(is_limit_exceeded=True)
+        changed += requests.filter(applies, ~_over(limit), is_limit_exceeded=True).update(is_limit_exceeded=False)
+    changed += requests.filter(is_limit_exceeded=True).exclude(covered).update(is_limit_exceeded=False)
+    return changed
+
+
+def reevaluate_open_requests():
+    """Re-flag every request still in the workflow, e.g. after a limit changed."""
+    return reevaluate_limits(SanctionRequest.objects.exclude(status__in=CLOSED_STATUSES))
@@ -0,0 +1,40 @@
+"""
+Distribute unassigned sanction requests across officers by open load.
+
+    python manage.py allocate_requests
+    python manage.py allocate_requests --cap 40 --dry-run
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from workflow.allocation import allocation_user, apply_allocation, plan_allocation
+
+
+class Command(BaseCommand):
+    help = 'Assign every unassigned open request to the least-loaded matching officer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cap', type=int, help='Default open-request cap per officer for this run.')
+        parser.add_argument('--dry-run', action='store_true', help='Show the plan without saving it.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = plan_allocation(default_cap=options['cap'])
+        planned = time.perf_counter() - started
+
+        for username, total in result.per_officer().items():
+            self.stdout.write(f'  {username:<30} +{total}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: {result.assigned} to assign, {result.skipped} without an available officer '
+                f'(planned in {planned:.3f}s).'
+            ))
+            return
+
+        applied = apply_allocation(result, allocation_user())
+        self.stdout.write(self.style.SUCCESS(
+            f'Assigned {applied} request(s), {result.skipped} left without an available officer '
+            f'in {time.perf_counter() - started:.3f}s (planning {planned:.3f}s).'
+        ))
@@ -0,0 +1,38 @@
+"""
+Move the approval history of long-closed requests to compressed archive files.
+
+    python manage.py archive_closed_history
+    python manage.py archive_closed_history --older-than-days 180 --batch-size 1000
+    python manage.py archive_closed_history --dry-run
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from workflow.archive import archivable_requests, archive_closed_history
+
+
+class Command(BaseCommand):
+    help = 'Archive ApprovalLog / WorkflowHistory rows of requests closed longer than the configured age.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, help='Override WORKFLOW_ARCHIVE_AFTER_DAYS.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Requests per archive file.')
+        parser.add_argument('--limit', type=int, help='Stop after this many requests.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived.')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable_requests(options['older_than_days']).count()
+            self.stdout.write(self.style.WARNING(f'Dry run: {count} request(s) would be archived.'))
+            return
+
+        started = time.perf_counter()
+        requests, logs = archive_closed_history(
+            older_than_days=options['older_than_days'],
+            batch_size=options['batch_size'],
+            limit=options['limit'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {logs} log entries of {requests} request(s) in {time.perf_counter() - started:.3f}s.'
+        ))
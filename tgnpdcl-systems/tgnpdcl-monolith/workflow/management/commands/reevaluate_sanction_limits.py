@@ -0,0 +1,29 @@
+"""
+Recompute is_limit_exceeded for sanction requests against the current limits.
+
+    python manage.py reevaluate_sanction_limits
+    python manage.py reevaluate_sanction_limits --all
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from workflow.limits import reevaluate_limits, reevaluate_open_requests
+from workflow.models import SanctionRequest
+
+
+class Command(BaseCommand):
+    help = 'Re-flag sanction requests that exceed their sanction limit, with set-based updates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Include approved and rejected requests.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['all']:
+            changed = reevaluate_limits(SanctionRequest.objects.all())
+        else:
+            changed = reevaluate_open_requests()
+        self.stdout.write(self.style.SUCCESS(
+            f'{changed} request(s) re-flagged in {time.perf_counter() - started:.3f}s.'
+        ))
@@ -0,0 +1,28 @@
+"""
+Refresh the per-step dwell-time rollups from the approval logs.
+
+    python manage.py refresh_dwell_rollups
+    python manage.py refresh_dwell_rollups --rebuild
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from workflow.analytics import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Fold new approval log entries into the daily dwell-time rollups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every rollup from the full log.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        days = refresh_rollups(rebuild=options['rebuild'])
+        if not days:
+            self.stdout.write('No new approval log entries.')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {days} day(s) of rollups in {time.perf_counter() - started:.3f}s.'
+        ))
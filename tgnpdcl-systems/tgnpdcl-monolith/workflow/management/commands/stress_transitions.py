@@ -0,0 +1,267 @@
+"""
+Fire concurrent transitions and line-item edits at a few sanction requests,
+then check that each request's ApprovalLog chain stayed linear and that the
+bills' totals and the claim statistics still match their line items.
+
+    python manage.py stress_transitions
+    python manage.py stress_transitions --requests 5 --attempts 1000 --workers 32
+
+Creates its own hospital, officers, bills and requests and deletes them
+afterwards (keep them with --keep). Officers use every action their step
+allows, so the last active step must be able to give final approval. Run it
+against the production database engine: SQLite serialises writers itself
+and reports lock timeouts instead of exercising the row locks.
+"""
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Sum
+
+from accounts.models import UserProfile
+from hospitals.line_items import LineItemBatchError, add_line_items
+from hospitals.models import Bill, ClaimStatistics, Hospital, Scheme
+from workflow.models import ApprovalLog, SanctionRequest
+from workflow.steps import get_step_graph
+from workflow.transitions import TransitionConflict, TransitionError, transition
+
+
+PREFIX = 'stress-transitions'
+
+
+class Command(BaseCommand):
+    help = 'Stress-test concurrent sanction request transitions and verify the approval log chains.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10, help='Sanction requests to fight over.')
+        parser.add_argument('--attempts', type=int, default=500, help='Transitions to fire in total.')
+        parser.add_argument('--workers', type=int, default=16, help='Concurrent threads.')
+        parser.add_argument(
+            '--line-items', type=float, default=0.2,
+            help='Share of attempts that add a line item to the bill instead of a transition.',
+        )
+        parser.add_argument('--seed', type=int, help='Random seed, to repeat a run.')
+        parser.add_argument('--keep', action='store_true', help='Leave the generated data in place.')
+
+    def handle(self, *args, **options):
+        graph = get_step_graph()
+        if not graph.active_steps:
+            raise CommandError('No active workflow steps configured.')
+        if not graph.active_steps[-1].can_approve_final:
+            raise CommandError(
+                f'The last active step, {graph.active_steps[-1].name}, cannot give final approval '
+                f'(WorkflowStep.can_approve_final), so no request could ever be decided.'
+            )
+
+        rng = random.Random(options['seed'])
+        hospital, officers, request_ids = self._create_fixtures(graph, options['requests'])
+        try:
+            started = time.perf_counter()
+            outcomes = self._fire(
+                graph, officers, request_ids, options['attempts'], options['workers'], options['line_items'], rng,
+            )
+            elapsed = time.perf_counter() - started
+
+            for outcome, total in sorted(outcomes.items()):
+                self.stdout.write(f'  {outcome:<12} {total}')
+            self.stdout.write(f'{sum(outcomes.values())} attempt(s) in {elapsed:.3f}s')
+
+            problems = self._verify(graph, request_ids)
+            problems += self._verify_totals(hospital, request_ids)
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(f'  {problem}'))
+            if problems:
+                raise CommandError(f'{len(problems)} problem(s) found.')
+            self.stdout.write(self.style.SUCCESS(
+                f'All {len(request_ids)} approval log chain(s) are linear and every total matches.'
+            ))
+        finally:
+            if not options['keep']:
+                self._delete_fixtures(hospital, officers)
+
+    def _create_fixtures(self, graph, count):
+        with transaction.atomic():
+            hospital, _ = Hospital.objects.get_or_create(
+                code=PREFIX.upper(),
+                defaults={'name': 'Stress Test Hospital', 'tier': 'TIER1', 'district': '-', 'address': '-'},
+            )
+            scheme, _ = Scheme.objects.get_or_create(code=PREFIX.upper(), defaults={'name': 'Stress Test Scheme'})
+
+            officers = {}
+            for role in {step.role_name for step in graph.steps}:
+                user, created = User.objects.get_or_create(username=f'{PREFIX}-{role.lower()}')
+                if created:
+                    user.set_unusable_password()
+                    user.save(update_fields=['password'])
+                    UserProfile.objects.create(user=user, role=role)
+                officers[role] = user
+
+            run = int(time.time())
+            request_ids = []
+            for index in range(count):
+                bill = Bill.objects.create(
+                    hospital=hospital,
+                    scheme=scheme,
+                    patient_name=f'Stress {index}',
+                    designation='-',
+                    employee_id=f'{PREFIX}-{run}-{index}',
+                    employee_type='EMPLOYEE',
+                    relationship='SELF',
+                    credit_card_number='-',
+                    ip_number=f'{run}-{index}',
+                    mobile_number='-',
+                    age=40,
+                    sex='Male',
+                    disease_details='-',
+                    admission_date=date.today(),
+                    discharge_date=date.today(),
+                    gross_claimed_amount=Decimal('1000.00'),
+                    status='SUBMITTED',
+                )
+                sanction_request = SanctionRequest.objects.create(
+                    bill=bill,
+                    hospital_name=hospital.name,
+                    patient_name=bill.patient_name,
+                    claimed_amount=bill.gross_claimed_amount,
+                    current_step=graph.first_step(),
+                    status='PENDING',
+                )
+                request_ids.append(sanction_request.pk)
+        return hospital, officers, request_ids
+
+    def _fire(self, graph, officers, request_ids, attempts, workers, line_item_share, rng):
+        outcomes = Counter()
+        lock = threading.Lock()
+        bill_ids = dict(SanctionRequest.objects.filter(pk__in=request_ids).values_list('pk', 'bill_id'))
+        # Pick every attempt up front so a seed gives a repeatable plan
+        plan = [
+            (rng.choice(request_ids), rng.random(), rng.random() < line_item_share)
+            for _ in range(attempts)
+        ]
+
+        def attempt(item):
+            request_id, roll, edit = item
+            try:
+                if edit:
+                    # The hospital adds a line item while officers act
+                    add_line_items(Bill.objects.get(pk=bill_ids[request_id]), [{
+                        'hospital_service_name': 'Stress item',
+                        'claimed_rate': f'{1 + roll * 100:.2f}',
+                        'claimed_quantity': '1',
+                    }])
+                    outcome = 'line-item'
+                else:
+                    self._act(graph, officers, request_id, roll)
+                    outcome = 'applied'
+            except TransitionConflict:
+                outcome = 'conflict'
+            except TransitionError:
+                outcome = 'refused'
+            except LineItemBatchError:
+                outcome = 'bill-locked'
+            except DatabaseError:
+                outcome = 'db-error'
+            finally:
+                connection.close()
+            with lock:
+                outcomes[outcome] += 1
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(attempt, plan))
+        return outcomes
+
+    def _act(self, graph, officers, request_id, roll):
+        # What the officer saw when they opened the page (no lock)
+        seen = SanctionRequest.objects.values('status', 'current_step_id').get(pk=request_id)
+        step = graph.step(seen['current_step_id'])
+        actions = graph.actions(step.pk)
+        if actions['can_approve_final'] and (roll < 0.5 or not actions['can_reject']):
+            action = 'APPROVE'
+        elif actions['can_reject'] and (roll >= 0.9 or not actions['can_forward']):
+            action = 'REJECT'
+        else:
+            action = 'FORWARD' if roll < 0.8 else 'REJECT_RECOMMENDED'
+        transition(
+            request_id,
+            officers[step.role_name],
+            action,
+            comments='stress test',
+            amount=Decimal('900.00') if action == 'APPROVE' else None,
+            expected_step_id=step.pk,
+        )
+
+    def _verify(self, graph, request_ids):
+        """Every log must follow on from the one before it; return what does not."""
+        logs = {request_id: [] for request_id in request_ids}
+        for log in ApprovalLog.objects.filter(request_id__in=request_ids).order_by('pk'):
+            logs[log.request_id].append(log)
+        requests = SanctionRequest.objects.in_bulk(request_ids)
+
+        problems = []
+        for request_id, chain in logs.items():
+            expected_step = graph.first_step()
+            closed = False
+            for log in chain:
+                if closed:
+                    problems.append(f'SR-{request_id}: {log.action} logged after the request was decided')
+                    break
+                if log.step_id != expected_step.pk:
+                    problems.append(
+                        f'SR-{request_id}: {log.action} logged at step {log.step_id}, expected {expected_step.pk}'
+                    )
+                    break
+                if log.action in ('FORWARD', 'REJECT_RECOMMENDED'):
+                    expected_step = graph.next_step(expected_step.pk)
+                elif log.action in ('APPROVE', 'REJECT'):
+                    closed = True
+
+            sanction_request = requests[request_id]
+            if sanction_request.current_step_id != expected_step.pk:
+                problems.append(f'SR-{request_id}: at step {sanction_request.current_step_id}, log says {expected_step.pk}')
+            if closed != (sanction_request.status in ('APPROVED', 'REJECTED')):
+                problems.append(f'SR-{request_id}: status {sanction_request.status} does not match its log')
+        return problems
+
+    def _verify_totals(self, hospital, request_ids):
+        """Bill totals must match their line items, statistics their bills."""
+        problems = []
+        bills = (
+            Bill.objects.filter(sanction_request__pk__in=request_ids)
+            .annotate(items=Count('line_items'), items_total=Sum('line_items__claimed_amount'))
+        )
+        for bill in bills:
+            if bill.items and bill.gross_claimed_amount != bill.items_total:
+                problems.append(
+                    f'{bill.claim_id}: claimed {bill.gross_claimed_amount}, line items add up to {bill.items_total}'
+                )
+
+        expected = {
+            (row['scheme_id'], row['status']): (row['bill_count'], row['claimed'] or 0)
+            for row in Bill.objects.filter(hospital=hospital).order_by()
+            .values('scheme_id', 'status')
+            .annotate(bill_count=Count('id'), claimed=Sum('gross_claimed_amount'))
+        }
+        recorded = {
+            (row.scheme_id, row.status): (row.bill_count, row.claimed_amount)
+            for row in ClaimStatistics.objects.filter(hospital=hospital)
+            if row.bill_count or row.claimed_amount
+        }
+        for key in sorted(set(expected) | set(recorded), key=str):
+            if expected.get(key) != recorded.get(key):
+                problems.append(
+                    f'Claim statistics for status {key[1]}: {recorded.get(key)}, bills say {expected.get(key)}'
+                )
+        return problems
+
+    def _delete_fixtures(self, hospital, officers):
+        with transaction.atomic():
+            Bill.objects.filter(hospital=hospital).delete()
+            hospital.delete()
+            User.objects.filter(pk__in=[user.pk for user in officers.values()]).delete()
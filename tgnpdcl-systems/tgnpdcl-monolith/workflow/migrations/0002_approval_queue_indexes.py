@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sanctionrequest',
+            index=models.Index(condition=models.Q(('status__in', ['PENDING', 'IN_PROGRESS'])), fields=['current_step', 'created_at', 'id'], name='sr_open_step_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sanctionrequest',
+            index=models.Index(condition=models.Q(('status__in', ['PENDING', 'IN_PROGRESS'])), fields=['assigned_to', 'current_step', 'created_at', 'id'], name='sr_open_assignee_queue_idx'),
+        ),
+    ]
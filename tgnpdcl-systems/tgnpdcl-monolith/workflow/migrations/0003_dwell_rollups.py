@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitals', '0009_document_processing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('workflow', '0002_approval_queue_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DwellRollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_log_id', models.PositiveBigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StepDwellRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('dimension', models.CharField(choices=[('STEP', 'Step'), ('OFFICER', 'Officer'), ('HOSPITAL', 'Hospital')], max_length=10)),
+                ('samples', models.PositiveIntegerField()),
+                ('total_seconds', models.FloatField()),
+                ('p50_seconds', models.FloatField()),
+                ('p90_seconds', models.FloatField()),
+                ('p95_seconds', models.FloatField()),
+                ('max_seconds', models.FloatField()),
+                ('sla_breaches', models.PositiveIntegerField(default=0)),
+                ('hospital', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hospitals.hospital')),
+                ('officer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('step', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dwell_rollups', to='workflow.workflowstep')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dimension', 'day', 'step'], name='dwell_rollup_lookup_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0003_dwell_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sanctionrequest',
+            name='limit_type',
+            field=models.CharField(choices=[('MINOR', 'Minor'), ('MAJOR', 'Major'), ('SELF_FUNDING', 'Self Funding')], default='MINOR', max_length=50),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+# The capabilities the action buttons used to derive from step order:
+# orders 6 and 7 may reject, order 7 gives the final approval
+REJECT_ORDERS = (6, 7)
+FINAL_APPROVAL_ORDERS = (7,)
+
+
+def set_step_capabilities(apps, schema_editor):
+    WorkflowStep = apps.get_model('workflow', 'WorkflowStep')
+    WorkflowStep.objects.filter(order__in=REJECT_ORDERS).update(can_reject=True)
+    WorkflowStep.objects.filter(order__in=FINAL_APPROVAL_ORDERS).update(can_approve_final=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0006_queue_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_step_capabilities, migrations.RunPython.noop),
+    ]
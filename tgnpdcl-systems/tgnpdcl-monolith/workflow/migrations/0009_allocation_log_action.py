@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:04
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+# Allocations used to be logged as FORWARD at the same step; the comments
+# they were written with tell them apart from officers' forwards
+ALLOCATION_COMMENTS = Q(comments__startswith='Task allocated to ') | Q(comments__startswith='Task auto-allocated to ')
+
+
+def mark_allocations(apps, schema_editor):
+    ApprovalLog = apps.get_model('workflow', 'ApprovalLog')
+    ApprovalLog.objects.filter(ALLOCATION_COMMENTS, action='FORWARD').update(action='ALLOCATE')
+
+
+def unmark_allocations(apps, schema_editor):
+    ApprovalLog = apps.get_model('workflow', 'ApprovalLog')
+    ApprovalLog.objects.filter(action='ALLOCATE').update(action='FORWARD')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0008_config_versions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='approvallog',
+            name='action',
+            field=models.CharField(choices=[('FORWARD', 'Forward'), ('REJECT', 'Reject'), ('REJECT_RECOMMENDED', 'Submitted for Rejection'), ('APPROVE', 'Approve (Final)'), ('CLARIFY', 'Seek Clarification'), ('RESPOND', 'Respond to Clarification'), ('ALLOCATE', 'Allocate to Officer')], max_length=20),
+        ),
+        migrations.RunPython(mark_allocations, unmark_allocations),
+    ]
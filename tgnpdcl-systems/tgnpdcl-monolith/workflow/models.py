@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
@@ -80,6 +81,9 @@ class SanctionRequest(models.Model):
         related_name='assigned_sanction_requests'
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    # Which SanctionLimit applies, together with the bill's employee_type;
+    # is_limit_exceeded is kept up to date by workflow.limits
+    limit_type = models.CharField(max_length=50, choices=SanctionLimit.TYPE_CHOICES, default='MINOR')
     is_limit_exceeded = models.BooleanField(default=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
@@ -87,6 +91,57 @@ class SanctionRequest(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Officer work queue: open requests at a step, oldest first
+            # (see workflow.queue); closed requests stay out of the index
+            models.Index(
+                fields=['current_step', 'created_at', 'id'],
+                condition=models.Q(status__in=['PENDING', 'IN_PROGRESS']),
+                name='sr_open_step_queue_idx'
+            ),
+            models.Index(
+                fields=['assigned_to', 'current_step', 'created_at', 'id'],
+                condition=models.Q(status__in=['PENDING', 'IN_PROGRESS']),
+                name='sr_open_assignee_queue_idx'
+            ),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the queue position so save() only emits a QueueEvent
+        # when it actually changes.
+        from .feed import FEED_FIELDS, feed_state
+        if all(field in instance.__dict__ for field in FEED_FIELDS):
+            instance._feed_state = feed_state(instance)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        from .feed import feed_state
+        from .limits import LIMIT_FIELDS, limit_exceeded
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(LIMIT_FIELDS):
+            self.is_limit_exceeded = limit_exceeded(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'is_limit_exceeded'}
+        
+        new_state = feed_state(self)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if new_state != getattr(self, '_feed_state', None):
+                QueueEvent.objects.create(
+                    request=self,
+                    step_id=self.current_step_id,
+                    assigned_to_id=self.assigned_to_id,
+                    status=self.status,
+                )
+        self._feed_state = new_state
+    
+    @property
+    def limit_amount(self):
+        from .limits import get_limit_table
+        return get_limit_table().limit_for(self.bill.employee_type, self.limit_type)
     
     def __str__(self):
         return f"SR-{self.id} - {self.hospital_name}"
@@ -102,6 +157,7 @@ class ApprovalLog(models.Model):
         ('APPROVE', 'Approve (Final)'),
         ('CLARIFY', 'Seek Clarification'),
         ('RESPOND', 'Respond to Clarification'),
+        ('ALLOCATE', 'Allocate to Officer'),
     )
     
     request = models.ForeignKey(
@@ -126,3 +182,120 @@ class ApprovalLog(models.Model):
     
     def __str__(self):
         return f"{self.get_action_display()} by {self.user.username}"
+
+
+class StepDwellRollup(models.Model):
+    """
+    Daily dwell-time figures for one workflow step, overall or for one
+    officer or hospital. Built from ApprovalLog by workflow.analytics.
+    """
+    
+    DIMENSION_CHOICES = (
+        ('STEP', 'Step'),
+        ('OFFICER', 'Officer'),
+        ('HOSPITAL', 'Hospital'),
+    )
+    
+    day = models.DateField()
+    step = models.ForeignKey(WorkflowStep, on_delete=models.CASCADE, related_name='dwell_rollups')
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    officer = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    hospital = models.ForeignKey('hospitals.Hospital', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    
+    samples = models.PositiveIntegerField()
+    total_seconds = models.FloatField()
+    p50_seconds = models.FloatField()
+    p90_seconds = models.FloatField()
+    p95_seconds = models.FloatField()
+    max_seconds = models.FloatField()
+    sla_breaches = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['dimension', 'day', 'step'], name='dwell_rollup_lookup_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.step} {self.dimension}"
+    
+    @property
+    def p50_hours(self):
+        return self.p50_seconds / 3600
+    
+    @property
+    def p90_hours(self):
+        return self.p90_seconds / 3600
+    
+    @property
+    def p95_hours(self):
+        return self.p95_seconds / 3600
+    
+    @property
+    def max_hours(self):
+        return self.max_seconds / 3600
+
+
+class DwellRollupState(models.Model):
+    """Single row: the last ApprovalLog id folded into StepDwellRollup."""
+    
+    last_log_id = models.PositiveBigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Dwell rollups up to log {self.last_log_id}"
+
+
+class ConfigVersion(models.Model):
+    """
+    One row per piece of data compiled or cached per process (the step
+    graph, the sanction limits, the queue counts), bumped when it changes.
+    Each process checks it with one cheap query to tell whether its copy is
+    stale, whatever cache backend is configured.
+    """
+
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class ArchivedHistory(models.Model):
+    """
+    Where a closed request's approval log and bill workflow history went
+    when workflow.archive moved them out of the hot tables: one gzip member
+    of ``archive``, ``length`` bytes from ``offset``.
+    """
+    
+    request = models.OneToOneField(SanctionRequest, on_delete=models.CASCADE, related_name='archived_history')
+    archive = models.CharField(max_length=255)
+    offset = models.PositiveBigIntegerField()
+    length = models.PositiveIntegerField()
+    approval_logs = models.PositiveIntegerField(default=0)
+    history_entries = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name_plural = 'archived histories'
+    
+    def __str__(self):
+        return f"SR-{self.request_id} history in {self.archive}"
+
+
+class QueueEvent(models.Model):
+    """
+    Change feed of the work queues: one row, with an ever increasing id,
+    each time a request's step, assignee or status changes. workflow.feed
+    streams these to open queue pages.
+    """
+    
+    id = models.BigAutoField(primary_key=True)
+    request = models.ForeignKey(SanctionRequest, on_delete=models.CASCADE, related_name='+')
+    step = models.ForeignKey(WorkflowStep, on_delete=models.SET_NULL, null=True, related_name='+')
+    assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    status = models.CharField(max_length=20, choices=SanctionRequest.STATUS_CHOICES)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"Event {self.id}: SR-{self.request_id} {self.status}"
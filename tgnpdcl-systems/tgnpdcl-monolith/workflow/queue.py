@@ -0,0 +1,99 @@
+"""
+Officer work queues and their open-request counters.
+
+An officer's queue is every open request at one of their role's steps that
+is assigned to them or to nobody, oldest first. The partial indexes on
+SanctionRequest cover exactly that predicate and order, and the queue page
+walks it with keyset pagination.
+
+Badge counts for every (step, assignee) pair come from a single GROUP BY
+that is cached under a version kept in ConfigVersion (see workflow.versions),
+so every process sees the bump whatever cache backend is configured. Any
+SanctionRequest save or delete bumps the version once its transaction has
+committed (see workflow.signals); code that changes requests with
+queryset.update() must call invalidate_counts() itself.
+"""
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import SanctionRequest
+from .versions import QUEUE_COUNTS, bump_version, current_version
+
+
+# Requests an officer still has to act on
+OPEN_STATUSES = ('PENDING', 'IN_PROGRESS')
+
+COUNTS_TIMEOUT = 10 * 60
+
+
+def open_requests():
+    return SanctionRequest.objects.filter(status__in=OPEN_STATUSES)
+
+
+def officer_queue(user, steps):
+    """Open requests at ``steps`` that ``user`` may pick up."""
+    return open_requests().filter(
+        Q(assigned_to=user) | Q(assigned_to__isnull=True),
+        current_step__in=steps,
+    )
+
+
+def invalidate_counts():
+    # Bumped after commit: inside the transaction the version row would
+    # serialise every request change behind it
+    bump_version(QUEUE_COUNTS)
+
+
+def queue_counts():
+    """
+    ``{(step_id, assignee_id): open_count}`` over all open requests, with
+    ``assignee_id`` None for unassigned requests.
+    """
+    version = current_version(QUEUE_COUNTS)
+    key = f'workflow:queue-counts:{version}'
+    counts = cache.get(key)
+    if counts is None:
+        rows = (
+            open_requests()
+            .order_by()
+            .values_list('current_step_id', 'assigned_to_id')
+            .annotate(total=Count('id'))
+        )
+        counts = {(step_id, assignee_id): total for step_id, assignee_id, total in rows}
+        cache.set(key, counts, COUNTS_TIMEOUT)
+    return counts
+
+
+def officer_counts(user, step_ids):
+    """Badge numbers for ``user``'s queue at ``step_ids``."""
+    step_ids = set(step_ids)
+    summary = {'assigned': 0, 'unassigned': 0, 'step_total': 0}
+    for (step_id, assignee_id), total in queue_counts().items():
+        if step_id not in step_ids:
+            continue
+        summary['step_total'] += total
+        if assignee_id is None:
+            summary['unassigned'] += total
+        elif assignee_id == user.pk:
+            summary['assigned'] += total
+    summary['queue'] = summary['assigned'] + summary['unassigned']
+    return summary
+
+
+def step_counts():
+    """``{step_id: open_count}`` for every step with open requests."""
+    totals = defaultdict(int)
+    for (step_id, _), total in queue_counts().items():
+        totals[step_id] += total
+    return dict(totals)
+
+
+def officer_loads():
+    """``{user_id: open_count}`` of requests assigned to each officer."""
+    totals = defaultdict(int)
+    for (_, assignee_id), total in queue_counts().items():
+        if assignee_id is not None:
+            totals[assignee_id] += total
+    return dict(totals)
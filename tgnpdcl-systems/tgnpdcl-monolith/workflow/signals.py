@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import limits, queue, steps
+from .models import SanctionLimit, SanctionRequest, WorkflowStep
+
+
+@receiver(post_save, sender=SanctionRequest)
+@receiver(post_delete, sender=SanctionRequest)
+def invalidate_queue_counts(sender, **kwargs):
+    # After commit, so nobody re-caches the counts from pre-commit data
+    transaction.on_commit(queue.invalidate_counts)
+
+
+@receiver(post_save, sender=WorkflowStep)
+@receiver(post_delete, sender=WorkflowStep)
+def invalidate_step_graph(sender, **kwargs):
+    # In the same transaction: the version is a row, visible with the change
+    steps.invalidate_step_graph()
+
+
+@receiver(post_save, sender=SanctionLimit)
+@receiver(post_delete, sender=SanctionLimit)
+def refresh_sanction_limits(sender, **kwargs):
+    from .tasks import reevaluate_sanction_limits
+    
+    limits.invalidate_limits()
+    transaction.on_commit(reevaluate_sanction_limits.delay)
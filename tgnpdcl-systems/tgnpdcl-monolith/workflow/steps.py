@@ -0,0 +1,101 @@
+"""
+Compiled workflow step graph.
+
+Workflow steps change a handful of times a year but are consulted on every
+transition. get_step_graph() compiles them once per process into an
+immutable StepGraph (next step, role -> steps, capabilities) and keeps it
+until the STEP_GRAPH version in ConfigVersion changes (see
+workflow.versions). Saving or deleting a WorkflowStep bumps that version
+in the same transaction (see workflow.signals), so looking a step up costs
+one single-row query. Code that changes steps with queryset.update() must
+call invalidate_step_graph() itself.
+
+The graph holds WorkflowStep instances so they can be assigned to foreign
+keys directly; treat them as read-only.
+"""
+import threading
+from types import MappingProxyType
+
+from .models import WorkflowStep
+from .versions import STEP_GRAPH, bump_version, current_version
+
+
+class StepGraph:
+    """Read-only view of the workflow steps, in order."""
+
+    __slots__ = ('version', 'steps', 'active_steps', '_by_id', '_next', '_by_role')
+
+    def __init__(self, version, steps):
+        steps = tuple(sorted(steps, key=lambda step: step.order))
+        active = tuple(step for step in steps if step.is_active)
+
+        by_role = {}
+        for step in steps:
+            by_role.setdefault(step.role_name, []).append(step)
+
+        # A step's successor is the next active step by order, so requests
+        # sitting at a deactivated step still move on
+        following = {}
+        for step in steps:
+            following[step.pk] = next((later for later in active if later.order > step.order), None)
+
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'steps', steps)
+        object.__setattr__(self, 'active_steps', active)
+        object.__setattr__(self, '_by_id', MappingProxyType({step.pk: step for step in steps}))
+        object.__setattr__(self, '_next', MappingProxyType(following))
+        object.__setattr__(self, '_by_role', MappingProxyType({role: tuple(group) for role, group in by_role.items()}))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('StepGraph is immutable')
+
+    def __len__(self):
+        return len(self.steps)
+
+    def step(self, step_id):
+        return self._by_id.get(step_id)
+
+    def first_step(self):
+        """Where new requests enter the workflow."""
+        return self.active_steps[0] if self.active_steps else None
+
+    def next_step(self, step_id):
+        """The step a forwarded request moves to, or None at the end."""
+        return self._next.get(step_id)
+
+    def steps_for_role(self, role):
+        return self._by_role.get(role, ())
+
+    def actions(self, step_id):
+        """What an officer may do with a request at ``step_id``."""
+        step = self.step(step_id)
+        if step is None:
+            return {'can_forward': False, 'can_reject': False, 'can_approve_final': False}
+        return {
+            'can_forward': self.next_step(step_id) is not None,
+            'can_reject': step.can_reject,
+            'can_approve_final': step.can_approve_final,
+        }
+
+
+_compiled = None
+_compile_lock = threading.Lock()
+
+
+def invalidate_step_graph():
+    bump_version(STEP_GRAPH)
+
+
+def get_step_graph():
+    """The compiled step graph, rebuilt only if the steps changed since last time."""
+    global _compiled
+    version = current_version(STEP_GRAPH)
+    graph = _compiled
+    if graph is not None and graph.version == version:
+        return graph
+
+    with _compile_lock:
+        graph = _compiled
+        if graph is None or graph.version != version:
+            graph = _compiled = StepGraph(version, WorkflowStep.objects.all())
+    return graph
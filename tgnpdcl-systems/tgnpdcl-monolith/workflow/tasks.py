@@ -0,0 +1,39 @@
+from celery import shared_task
+
+from .allocation import allocate_unassigned
+from .analytics import refresh_rollups
+from .archive import archive_closed_history as archive_history
+from .feed import prune_events
+from .limits import reevaluate_open_requests
+
+
+@shared_task
+def auto_allocate_requests():
+    """Periodic least-loaded allocation (scheduled in CELERY_BEAT_SCHEDULE)."""
+    result = allocate_unassigned()
+    return {'assigned': result.applied, 'skipped': result.skipped}
+
+
+@shared_task
+def refresh_dwell_rollups():
+    """Periodic incremental refresh of the dwell-time rollups."""
+    return {'days': refresh_rollups()}
+
+
+@shared_task
+def reevaluate_sanction_limits():
+    """Re-flag open requests against the limits (queued when a limit changes)."""
+    return {'changed': reevaluate_open_requests()}
+
+
+@shared_task
+def archive_closed_history():
+    """Nightly move of old closed requests' history to the archive."""
+    requests, logs = archive_history()
+    return {'requests': requests, 'approval_logs': logs}
+
+
+@shared_task
+def prune_queue_events():
+    """Hourly delete of queue events too old for a browser to replay."""
+    return {'deleted': prune_events()}
@@ -0,0 +1,110 @@
+"""
+Single-request workflow transitions.
+
+transition() is the one place a sanction request moves on its own (the
+batch path is workflow.batch). The request row and its bill are locked for
+the whole read-check-write, so two officers acting at once are serialised:
+the second sees the state the first left behind. Locking the bill also
+keeps line-item edits (hospitals.line_items) from changing its totals under
+the status change. Callers pass the step the officer was looking at; if
+the request has moved since, TransitionConflict is raised instead of
+applying the action a second time.
+"""
+from django.db import transaction
+
+from .models import ApprovalLog, SanctionRequest
+from .steps import get_step_graph
+
+
+CLOSED_STATUSES = ('APPROVED', 'REJECTED')
+
+TRANSITION_ACTIONS = ('FORWARD', 'REJECT_RECOMMENDED', 'APPROVE', 'REJECT', 'CLARIFY')
+
+# The only bill fields a transition writes; totals belong to line items
+BILL_STATUS_FIELDS = ['status', 'updated_at']
+
+
+class TransitionError(Exception):
+    """The action is not allowed at the request's current step."""
+
+
+class TransitionConflict(TransitionError):
+    """Someone else acted on the request first."""
+
+
+def transition(request_id, user, action, comments='', amount=None, expected_step_id=None, limit_type=None):
+    """
+    Apply ``action`` to sanction request ``request_id`` as ``user``.
+
+    ``limit_type`` reclassifies the request for sanction limits on the way.
+    Returns ``(sanction_request, next_step)``; ``next_step`` is None unless
+    the request was forwarded.
+    """
+    if action not in TRANSITION_ACTIONS:
+        raise TransitionError(f'Unsupported action: {action}')
+
+    graph = get_step_graph()
+    with transaction.atomic():
+        sanction_request = (
+            SanctionRequest.objects.select_for_update(of=('self', 'bill'))
+            .select_related('bill')
+            .get(pk=request_id)
+        )
+        if sanction_request.status in CLOSED_STATUSES:
+            raise TransitionConflict(
+                f'SR-{sanction_request.pk} has already been {sanction_request.status.lower()}.'
+            )
+        if expected_step_id is not None and sanction_request.current_step_id != expected_step_id:
+            current = graph.step(sanction_request.current_step_id)
+            raise TransitionConflict(
+                f'SR-{sanction_request.pk} has already moved on to {current.name if current else "another step"}.'
+            )
+
+        step = graph.step(sanction_request.current_step_id)
+        if action == 'APPROVE' and not step.can_approve_final:
+            raise TransitionError(f'{step.name} cannot give final approval.')
+        if action == 'REJECT' and not step.can_reject:
+            raise TransitionError(f'{step.name} cannot reject.')
+
+        next_step = None
+        if action in ('FORWARD', 'REJECT_RECOMMENDED'):
+            next_step = graph.next_step(sanction_request.current_step_id)
+            if next_step is None:
+                raise TransitionError('No next step available. Please use "Approve Final" or "Reject".')
+
+        ApprovalLog.objects.create(
+            request=sanction_request,
+            step=step,
+            user=user,
+            action=action,
+            comments=comments,
+            approved_amount_at_stage=amount,
+        )
+
+        if limit_type:
+            sanction_request.limit_type = limit_type
+        
+        bill = sanction_request.bill
+        if action == 'APPROVE':
+            sanction_request.status = 'APPROVED'
+            sanction_request.sanctioned_amount = amount
+            bill.status = 'APPROVED'
+            bill.save(update_fields=BILL_STATUS_FIELDS)
+        elif action == 'REJECT':
+            sanction_request.status = 'REJECTED'
+            bill.status = 'REJECTED'
+            bill.save(update_fields=BILL_STATUS_FIELDS)
+        elif action == 'CLARIFY':
+            sanction_request.status = 'CLARIFICATION'
+            bill.status = 'CLARIFICATION'
+            bill.save(update_fields=BILL_STATUS_FIELDS)
+        else:
+            sanction_request.current_step = next_step
+            sanction_request.status = 'IN_PROGRESS'
+            sanction_request.assigned_to = None  # Clear for re-allocation at next stage
+            if bill.status != 'IN_PROCESS':
+                bill.status = 'IN_PROCESS'
+                bill.save(update_fields=BILL_STATUS_FIELDS)
+
+        sanction_request.save()
+    return sanction_request, next_step
@@ -5,8 +5,14 @@ app_name = 'workflow'
 
 urlpatterns = [
     path('queue/', views.approval_queue, name='approval_queue'),
+    path('queue/events/', views.queue_events, name='queue_events'),
+    path('queue/batch/', views.batch_process, name='batch_process'),
     path('allocation/', views.customer_admin_allocation, name='customer_admin_allocation'),
+    path('allocate/auto/', views.auto_allocate, name='auto_allocate'),
+    path('allocate/bulk/', views.bulk_allocate, name='bulk_allocate'),
     path('allocate/<int:request_id>/', views.allocate_task, name='allocate_task'),
+    path('analytics/dwell/', views.dwell_analytics, name='dwell_analytics'),
     path('request/<int:request_id>/', views.request_detail, name='request_detail'),
     path('request/<int:request_id>/process/', views.process_request, name='process_request'),
+    path('request/<int:request_id>/apply-rate-card/', views.apply_rate_card, name='apply_rate_card'),
 ]
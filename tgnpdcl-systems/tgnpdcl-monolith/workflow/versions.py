@@ -0,0 +1,34 @@
+"""
+Version stamps of what each process compiles or caches for itself (the
+step graph, the sanction limits, the queue counts), held in ConfigVersion.
+
+The stamps live in the database rather than the cache: with the default
+per-process LocMemCache a bump made by one worker would never reach the
+others. Bump configuration in the transaction that changes it, so the new
+version becomes visible together with the change; the queue counts, which
+change with every request, are bumped right after commit instead.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import ConfigVersion
+
+
+STEP_GRAPH = 'step-graph'
+SANCTION_LIMITS = 'sanction-limits'
+QUEUE_COUNTS = 'queue-counts'
+
+
+def current_version(name):
+    return ConfigVersion.objects.filter(pk=name).values_list('version', flat=True).first() or 0
+
+
+def bump_version(name):
+    """Mark every compiled copy of ``name`` stale."""
+    if ConfigVersion.objects.filter(pk=name).update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            ConfigVersion.objects.create(name=name, version=1)
+    except IntegrityError:
+        ConfigVersion.objects.filter(pk=name).update(version=F('version') + 1)
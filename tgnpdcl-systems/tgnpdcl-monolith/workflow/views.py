@@ -1,11 +1,42 @@
+import json
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
 from django.contrib import messages
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.utils.http import url_has_allowed_host_and_scheme, urlencode
 
 from accounts.decorators import approver_required, role_required
-from .models import SanctionRequest, ApprovalLog, WorkflowStep
+from accounts.models import UserProfile
+from hospitals.pagination import paginate_keyset
+from hospitals.rates import price_claim
+from .allocation import allocate_unassigned
+from .analytics import default_period, period_summary
+from .archive import request_history
+from .batch import MAX_BATCH_SIZE, parse_amount, process_batch
+from .bulk import insert_events_from, insert_logs_from
+from .feed import QueueStream
+from .models import SanctionRequest, ApprovalLog, DwellRollupState, SanctionLimit, StepDwellRollup
+from .queue import invalidate_counts, officer_counts, officer_loads, officer_queue
+from .steps import get_step_graph
+from .transitions import CLOSED_STATUSES, TransitionConflict, TransitionError, transition
+
+
+APPROVAL_QUEUE_PAGE_SIZE = 25
+ALLOCATION_PAGE_SIZE = 50
+
+# Dwell analytics: selectable periods (days) and rows per breakdown table
+DWELL_PERIODS = ('7', '30', '90')
+DWELL_TABLE_ROWS = 50
+
+APPROVER_ROLES = ['JPO', 'APO', 'DPO', 'FA_CAO', 'DE', 'SE_CGM']
 
 
 @login_required
@@ -16,37 +47,161 @@ def approval_queue(request):
     role = profile.role
     
     # Find ALL steps that match this role
-    steps = WorkflowStep.objects.filter(role_name=role)
+    steps = list(get_step_graph().steps_for_role(role))
     
-    if not steps.exists():
+    if not steps:
         messages.warning(request, 'No workflow steps configured for your role.')
         return redirect('dashboard')
     
-    # Show requests at ANY of these steps assigned to this user OR unassigned
-    pending_requests = SanctionRequest.objects.filter(
-        Q(assigned_to=request.user) | Q(assigned_to__isnull=True),
-        current_step__in=steps,
-        status__in=['PENDING', 'IN_PROGRESS']
-    ).order_by('created_at')
+    # Show requests at ANY of these steps assigned to this user OR unassigned,
+    # oldest first, one keyset page at a time
+    cursor = request.GET.get('cursor')
+    page = paginate_keyset(
+        officer_queue(request.user, steps),
+        cursor=cursor,
+        page_size=APPROVAL_QUEUE_PAGE_SIZE,
+        descending=False,
+    )
     
     return render(request, 'workflow/approval_queue.html', {
-        'step': steps.first(),
-        'pending_requests': pending_requests,
+        'step': steps[0],
+        'pending_requests': page,
+        'has_more': page.has_more,
+        'next_query': urlencode({'cursor': page.next_cursor}) if page.has_more else '',
+        'is_first_page': not cursor,
+        'counts': officer_counts(request.user, [step.pk for step in steps]),
+        'can_approve_final': any(step.can_approve_final for step in steps),
+        'can_reject': any(step.can_reject for step in steps),
     })
 
 
+def _queue_stream(request):
+    """The QueueStream for an approver's queue page, or None."""
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    try:
+        role = user.profile.role
+    except AttributeError:
+        return None
+    if role not in APPROVER_ROLES:
+        return None
+    step_ids = [step.pk for step in get_step_graph().steps_for_role(role)]
+    watched = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk.isdigit()][:APPROVAL_QUEUE_PAGE_SIZE]
+    return QueueStream(user.pk, step_ids, watched)
+
+
+async def queue_events(request):
+    """Server-sent events keeping an open approval queue page up to date."""
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI every stream would pin a worker thread and run its own
+        # event loop and poller; 204 tells the browser not to reconnect
+        return HttpResponse(status=204)
+    stream = await sync_to_async(_queue_stream)(request)
+    if stream is None:
+        return HttpResponseForbidden()
+    last_event_id = request.headers.get('Last-Event-ID', request.GET.get('last_event_id', ''))
+    response = StreamingHttpResponse(
+        stream.events(int(last_event_id) if last_event_id.isdigit() else None),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 @role_required('CUSTOMER_ADMIN')
 def customer_admin_allocation(request):
-    """Dashboard for Customer Admin to allocate tasks."""
-    requests = SanctionRequest.objects.exclude(status__in=['APPROVED', 'REJECTED'])
+    """Dashboard for Customer Admin to allocate tasks, one workflow step at a time."""
+    steps = list(get_step_graph().active_steps)
+    active = SanctionRequest.objects.exclude(status__in=CLOSED_STATUSES)
+    
+    step_totals = dict(
+        active.order_by().values_list('current_step').annotate(total=Count('id'))
+    )
+    for step in steps:
+        step.active_count = step_totals.get(step.pk, 0)
+    
+    # Selected step: from the query string, else the first one with work
+    step = None
+    step_id = request.GET.get('step')
+    if step_id and step_id.isdigit():
+        step = next((candidate for candidate in steps if candidate.pk == int(step_id)), None)
+    if step is None:
+        step = next((candidate for candidate in steps if candidate.active_count), steps[0] if steps else None)
+    
+    # Role -> officers, built once instead of filtering every officer per row
+    loads = officer_loads()
+    officers_by_role = defaultdict(list)
+    assignees = User.objects.filter(
+        is_active=True,
+        profile__role__in=APPROVER_ROLES,
+    ).values_list('pk', 'username', 'profile__role').order_by('username')
+    for user_id, username, role in assignees:
+        officers_by_role[role].append({'id': user_id, 'username': username, 'load': loads.get(user_id, 0)})
     
-    # Get all potential assignees (officers)
-    assignees = User.objects.filter(profile__role__in=['JPO', 'APO', 'DPO', 'FA_CAO', 'DE', 'SE_CGM'])
+    unassigned_only = request.GET.get('unassigned') == '1'
+    requests = active.none()
+    if step is not None:
+        requests = active.filter(current_step=step).select_related('assigned_to')
+        if unassigned_only:
+            requests = requests.filter(assigned_to__isnull=True)
+    
+    cursor = request.GET.get('cursor')
+    page = paginate_keyset(requests, cursor=cursor, page_size=ALLOCATION_PAGE_SIZE, descending=False)
+    
+    base_query = {'step': step.pk} if step else {}
+    if unassigned_only:
+        base_query['unassigned'] = '1'
     
     return render(request, 'workflow/task_allocation.html', {
-        'requests': requests,
-        'assignees': assignees,
+        'steps': steps,
+        'step': step,
+        'requests': page,
+        'officers': officers_by_role.get(step.role_name, []) if step else [],
+        'unassigned_only': unassigned_only,
+        'has_more': page.has_more,
+        'is_first_page': not cursor,
+        'filter_query': urlencode(base_query),
+        'next_query': urlencode({**base_query, 'cursor': page.next_cursor}) if page.has_more else '',
+        'total_active': sum(step_totals.values()),
+    })
+
+
+@login_required
+@role_required('CUSTOMER_ADMIN')
+def dwell_analytics(request):
+    """How long claims sit at each workflow step, from the daily rollups."""
+    days = request.GET.get('days', '30')
+    days = int(days) if days in DWELL_PERIODS else 30
+    date_from, date_to = default_period(days)
+    
+    graph = get_step_graph()
+    step = None
+    step_id = request.GET.get('step')
+    if step_id and step_id.isdigit():
+        step = graph.step(int(step_id))
+    
+    daily = []
+    if step is not None:
+        daily = StepDwellRollup.objects.filter(
+            dimension='STEP', step=step, day__gte=date_from, day__lte=date_to,
+        ).order_by('-day')
+    
+    return render(request, 'workflow/dwell_analytics.html', {
+        'steps': graph.steps,
+        'step': step,
+        'days': days,
+        'periods': DWELL_PERIODS,
+        'date_from': date_from,
+        'date_to': date_to,
+        'step_summary': list(period_summary('STEP', date_from, date_to)),
+        'officer_summary': list(period_summary('OFFICER', date_from, date_to, step=step))[:DWELL_TABLE_ROWS],
+        'hospital_summary': list(period_summary('HOSPITAL', date_from, date_to, step=step))[:DWELL_TABLE_ROWS],
+        'daily': daily,
+        'sla_hours': settings.WORKFLOW_STEP_SLA_HOURS,
+        'refreshed': DwellRollupState.objects.first(),
     })
 
 
@@ -68,7 +223,7 @@ def allocate_task(request, request_id):
                 request=sanction_request,
                 step=sanction_request.current_step,
                 user=request.user,
-                action='FORWARD', # Re-using FORWARD as a generic "moved to next step/person"
+                action='ALLOCATE',
                 comments=f"Task allocated to {assignee.get_full_name() or assignee.username} by Customer Admin."
             )
             
@@ -76,19 +231,147 @@ def allocate_task(request, request_id):
         else:
             messages.error(request, 'No assignee selected.')
             
+    return _back_to_allocation(request)
+
+
+@login_required
+@role_required('CUSTOMER_ADMIN')
+def bulk_allocate(request):
+    """Assign every selected request to one officer with a fixed number of queries."""
+    if request.method != 'POST':
+        return _back_to_allocation(request)
+    
+    request_ids = [value for value in request.POST.getlist('request_ids') if value.isdigit()]
+    assignee_id = request.POST.get('assignee_id', '')
+    assignee = None
+    if assignee_id.isdigit():
+        assignee = User.objects.filter(pk=assignee_id, is_active=True).select_related('profile').first()
+    
+    if assignee is None or not request_ids:
+        messages.error(request, 'Select at least one request and an officer.')
+        return _back_to_allocation(request)
+    try:
+        role = assignee.profile.role
+    except UserProfile.DoesNotExist:
+        messages.error(request, f'{assignee.username} has no officer profile and cannot be allocated requests.')
+        return _back_to_allocation(request)
+    
+    with transaction.atomic():
+        # Only open requests at a step for the officer's role are taken; the
+        # lock is on the requests alone, not the workflow steps joined in
+        eligible = list(
+            SanctionRequest.objects.select_for_update(of=('self',))
+            .filter(pk__in=request_ids, current_step__role_name=role)
+            .exclude(status__in=CLOSED_STATUSES)
+            .values_list('pk', flat=True)
+        )
+        if eligible:
+            SanctionRequest.objects.filter(pk__in=eligible).update(assigned_to=assignee)
+            insert_logs_from(
+                SanctionRequest.objects.filter(pk__in=eligible),
+                actor=request.user,
+                action='ALLOCATE',
+                comments=f"Task allocated to {assignee.get_full_name() or assignee.username} by Customer Admin.",
+            )
+            insert_events_from(SanctionRequest.objects.filter(pk__in=eligible))
+            transaction.on_commit(invalidate_counts)
+    
+    skipped = len(request_ids) - len(eligible)
+    if eligible:
+        messages.success(request, f'{len(eligible)} request(s) allocated to {assignee.username}.')
+    if skipped:
+        messages.warning(request, f"{skipped} request(s) skipped: closed, or not at a {role} step.")
+    return _back_to_allocation(request)
+
+
+def _back_to_allocation(request):
+    """Return to the allocation page (and step / page) the admin came from."""
+    next_url = request.POST.get('next')
+    if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
     return redirect('workflow:customer_admin_allocation')
 
 
+@login_required
+@role_required('CUSTOMER_ADMIN')
+def auto_allocate(request):
+    """Assign all unassigned requests to the least-loaded matching officers."""
+    if request.method == 'POST':
+        result = allocate_unassigned(actor=request.user)
+        if result.applied:
+            messages.success(request, f'{result.applied} request(s) auto-allocated.')
+        else:
+            messages.info(request, 'No unassigned requests could be allocated.')
+        if result.skipped:
+            messages.warning(request, f'{result.skipped} request(s) have no available officer (check roles and caps).')
+
+    return _back_to_allocation(request)
+
+
+@login_required
+@approver_required
+def batch_process(request):
+    """
+    Apply one action to many requests at once.
+
+    Accepts the approval queue's form (checkboxes) or JSON:
+    ``{"action": "FORWARD", "comments": "...", "requests": [{"id": 1, "amount": "500.00"}, ...]}``
+    and answers JSON requests with a result per request.
+    """
+    if request.method != 'POST':
+        return redirect('workflow:approval_queue')
+
+    wants_json = request.content_type == 'application/json'
+    try:
+        if wants_json:
+            payload = json.loads(request.body or b'{}')
+            items = payload.get('requests') or []
+            request_ids = [int(item['id']) for item in items]
+            amounts = {int(item['id']): parse_amount(item.get('amount')) for item in items}
+            action = payload.get('action')
+            comments = payload.get('comments') or ''
+        else:
+            request_ids = [int(value) for value in request.POST.getlist('request_ids')]
+            amounts = {}
+            action = request.POST.get('action')
+            comments = request.POST.get('comments', '')
+        if not comments.strip():
+            raise ValueError('Comments are required.')
+        if len(request_ids) > MAX_BATCH_SIZE:
+            raise ValueError(f'At most {MAX_BATCH_SIZE} requests can be processed at once.')
+        result = process_batch(request.user, action, request_ids, comments, amounts)
+    except (ValueError, KeyError, TypeError, AttributeError) as exc:
+        if wants_json:
+            return JsonResponse({'error': str(exc)}, status=400)
+        messages.error(request, str(exc))
+        return redirect('workflow:approval_queue')
+
+    if wants_json:
+        return JsonResponse({
+            'processed': len(result.succeeded),
+            'failed': len(result.failed),
+            'results': result.as_list(),
+        })
+
+    if result.succeeded:
+        messages.success(request, f'{len(result.succeeded)} request(s) processed.')
+    for item in result.failed:
+        messages.warning(request, f"SR-{item['id']}: {item['error']}")
+    return redirect('workflow:approval_queue')
+
+
 @login_required
 @approver_required
 def request_detail(request, request_id):
     """View sanction request details."""
     sanction_request = get_object_or_404(SanctionRequest, id=request_id)
-    logs = sanction_request.logs.all()
+    logs = request_history(sanction_request)
+    graph = get_step_graph()
+    sanction_request.current_step = graph.step(sanction_request.current_step_id)
     
     # Get bill documents
     try:
-        bill_documents = sanction_request.bill.documents.all()
+        bill_documents = sanction_request.bill.documents.select_related('blob')
     except:
         bill_documents = []
     
@@ -96,9 +379,31 @@ def request_detail(request, request_id):
         'sanction_request': sanction_request,
         'logs': logs,
         'bill_documents': bill_documents,
+        'line_items': sanction_request.bill.line_items.select_related('service').order_by('id'),
+        'step_actions': graph.actions(sanction_request.current_step_id),
+        'limit_types': SanctionLimit.TYPE_CHOICES,
     })
 
 
+@login_required
+@approver_required
+def apply_rate_card(request, request_id):
+    """Pre-fill approved rates for the whole claim from the rate card."""
+    sanction_request = get_object_or_404(SanctionRequest.objects.select_related('bill__hospital'), id=request_id)
+
+    if request.method == 'POST':
+        if sanction_request.status in ['APPROVED', 'REJECTED']:
+            messages.error(request, 'This request has already been decided.')
+        else:
+            changed = price_claim(sanction_request.bill, overwrite=request.POST.get('overwrite') == '1')
+            if changed:
+                messages.success(request, f'{changed} line item(s) priced from the rate card.')
+            else:
+                messages.info(request, 'No line items needed pricing from the rate card.')
+
+    return redirect('workflow:request_detail', request_id=request_id)
+
+
 @login_required
 @approver_required
 def process_request(request, request_id):
@@ -108,60 +413,41 @@ def process_request(request, request_id):
     if request.method == 'POST':
         action = request.POST.get('action')
         comments = request.POST.get('comments', '')
-        amount = request.POST.get('approved_amount')
+        expected_step = request.POST.get('current_step')
+        limit_type = request.POST.get('limit_type')
         
-        # Create approval log
-        ApprovalLog.objects.create(
-            request=sanction_request,
-            step=sanction_request.current_step,
-            user=request.user,
-            action=action,
-            comments=comments,
-            approved_amount_at_stage=amount if amount else None,
-        )
+        try:
+            if limit_type and limit_type not in dict(SanctionLimit.TYPE_CHOICES):
+                raise ValueError(f'Unknown limit type: {limit_type}')
+            amount = parse_amount(request.POST.get('approved_amount'))
+            sanction_request, next_step = transition(
+                sanction_request.pk,
+                request.user,
+                action,
+                comments=comments,
+                amount=amount,
+                expected_step_id=int(expected_step) if expected_step and expected_step.isdigit() else None,
+                limit_type=limit_type,
+            )
+        except TransitionConflict as exc:
+            # Lost the race: show the request as the other officer left it
+            messages.warning(request, f'{exc} Your action was not applied.')
+            return redirect('workflow:request_detail', request_id=request_id)
+        except (TransitionError, ValueError) as exc:
+            messages.error(request, str(exc))
+            return redirect('workflow:request_detail', request_id=request_id)
         
-        # Update request and bill status based on action
         if action == 'APPROVE':
-            sanction_request.status = 'APPROVED'
-            sanction_request.sanctioned_amount = amount
-            # Update the linked bill as well
-            sanction_request.bill.status = 'APPROVED'
-            sanction_request.bill.save()
             messages.success(request, 'Request approved successfully.')
         elif action == 'REJECT':
-            # Actual rejection (Step 6 and 7)
-            sanction_request.status = 'REJECTED'
-            sanction_request.bill.status = 'REJECTED'
-            sanction_request.bill.save()
             messages.warning(request, 'Request rejected.')
-        elif action in ['FORWARD', 'REJECT_RECOMMENDED']:
-            # Move to next step
-            next_step = WorkflowStep.objects.filter(
-                order__gt=sanction_request.current_step.order
-            ).first()
-            if next_step:
-                sanction_request.current_step = next_step
-                sanction_request.status = 'IN_PROGRESS'
-                sanction_request.assigned_to = None # Clear for re-allocation at next stage
-                # Update bill to Under Review if it wasn't already
-                if sanction_request.bill.status != 'UNDER_REVIEW':
-                    sanction_request.bill.status = 'UNDER_REVIEW'
-                    sanction_request.bill.save()
-                
-                msg = f'Request forwarded to {next_step.name}.'
-                if action == 'REJECT_RECOMMENDED':
-                    msg = f'Request forwarded to {next_step.name} with recommendation for rejection.'
-                messages.success(request, msg)
-            else:
-                messages.error(request, 'No next step available. Please use "Approve Final" or "Reject".')
+        elif action == 'FORWARD':
+            messages.success(request, f'Request forwarded to {next_step.name}.')
+        elif action == 'REJECT_RECOMMENDED':
+            messages.success(request, f'Request forwarded to {next_step.name} with recommendation for rejection.')
         elif action == 'CLARIFY':
-            sanction_request.status = 'CLARIFICATION'
-            # Update the linked bill as well
-            sanction_request.bill.status = 'CLARIFICATION'
-            sanction_request.bill.save()
             messages.info(request, 'Clarification requested from hospital.')
         
-        sanction_request.save()
         return redirect('workflow:approval_queue')
     
     return redirect('workflow:request_detail', request_id=request_id)
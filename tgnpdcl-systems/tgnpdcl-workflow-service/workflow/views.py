@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -5,6 +7,14 @@ from django.db import transaction
 from .models import SanctionRequest, ApprovalLog, WorkflowStep, SanctionLimit
 from .serializers import SanctionRequestSerializer, ApprovalLogSerializer
 
+def check_limits(sanction_req, category, limit_type):
+    """Flag ``sanction_req`` if its sanctioned amount is over the applicable SanctionLimit."""
+    if not (category and limit_type):
+        return
+    limit = SanctionLimit.objects.filter(category=category, limit_type=limit_type).values_list('amount', flat=True).first()
+    sanction_req.is_limit_exceeded = limit is not None and Decimal(str(sanction_req.sanctioned_amount)) > limit
+
+
 class SanctionRequestViewSet(viewsets.ModelViewSet):
     queryset = SanctionRequest.objects.all()
     serializer_class = SanctionRequestSerializer
@@ -22,24 +32,46 @@ class SanctionRequestViewSet(viewsets.ModelViewSet):
         Payload: {
             "action": "FORWARD" | "REJECT" | "APPROVE",
             "comments": "...",
-            "approved_amount": 1000.00 (optional override)
+            "approved_amount": 1000.00 (optional override),
+            "expected_step": 3 (optional; id of the step the caller saw),
+            "category": "EMPLOYEE", "limit_type": "MINOR" (optional; for the limit check)
         }
+
+        Answers 409 if the request was decided, or has moved away from
+        ``expected_step``, before this call got its row lock.
         """
-        sanction_req = self.get_object()
+        self.get_object()  # 404 / permission checks
         action_type = request.data.get('action')
         comments = request.data.get('comments', '')
         approved_amount = request.data.get('approved_amount')
+        expected_step = request.data.get('expected_step')
         
         user = request.user
+        
+        with transaction.atomic():
+            # Lock the row so concurrent actions on one request run one after another
+            sanction_req = SanctionRequest.objects.select_for_update().get(pk=pk)
+            if sanction_req.status in ('APPROVED', 'REJECTED'):
+                return Response(
+                    {'error': f'Request has already been {sanction_req.status.lower()}.', 'status': sanction_req.status},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            if expected_step is not None and str(sanction_req.current_step_id) != str(expected_step):
+                return Response(
+                    {'error': 'Request has moved on since it was loaded.', 'current_step': sanction_req.current_step_id},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            return self._process(sanction_req, user, action_type, comments, approved_amount)
+
+    def _process(self, sanction_req, user, action_type, comments, approved_amount):
         current_step = sanction_req.current_step
         
         # TODO: Check if user belongs to the current_step role (simple check skipped for prototype)
         
         if approved_amount:
             sanction_req.sanctioned_amount = approved_amount
-            # Run Limit Check
-            # Assuming we know category/type from somewhere (maybe patient metadata passed in req)
-            # check_limits(sanction_req) # implementation detail
+            # Run Limit Check; category / type come with the request from the hospital service
+            check_limits(sanction_req, self.request.data.get('category'), self.request.data.get('limit_type'))
         
         if action_type == 'FORWARD':
             next_step = WorkflowStep.objects.filter(order__gt=current_step.order).order_by('order').first()